@@ -0,0 +1,270 @@
+import functools
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Product dict field -> column, in product dict order. id is not stored,
+# read products get item_<rowid>, which an upsert of the same article keeps
+STORE_COLUMNS = [
+    ('name', 'name'), ('article', 'article'), ('brand', 'brand'), ('category', 'category'),
+    ('price', 'price'), ('basePrice', 'base_price'), ('recommendedPrice', 'recommended_price'),
+    ('unit', 'unit'), ('package', 'package'), ('barcode', 'barcode'), ('image', 'image'),
+    ('inStock', 'in_stock'), ('hasSpecialPricing', 'has_special_pricing'), ('specialOffer', 'special_offer'),
+    ('discountPercent', 'discount_percent'), ('specialPrice', 'special_price'), ('description', 'description')
+]
+BOOLEAN_FIELDS = ('inStock', 'hasSpecialPricing')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS products (
+    product_key TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    article TEXT NOT NULL,
+    brand TEXT NOT NULL,
+    category TEXT NOT NULL,
+    price REAL NOT NULL,
+    base_price REAL NOT NULL,
+    recommended_price REAL NOT NULL,
+    unit TEXT NOT NULL,
+    package TEXT NOT NULL,
+    barcode TEXT NOT NULL,
+    image TEXT NOT NULL,
+    in_stock INTEGER NOT NULL,
+    has_special_pricing INTEGER NOT NULL,
+    special_offer TEXT NOT NULL,
+    discount_percent TEXT NOT NULL,
+    special_price REAL,
+    description TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    name_folded TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS products_category ON products (category, price);
+CREATE INDEX IF NOT EXISTS products_brand ON products (brand);
+CREATE INDEX IF NOT EXISTS products_barcode ON products (barcode);
+CREATE INDEX IF NOT EXISTS products_price ON products (price);
+'''
+
+# name_folded is the casefolded name searches match, SQLite LIKE only folds ASCII letters
+UPSERT_SQL = 'INSERT INTO products (product_key, {columns}, updated_at, name_folded) VALUES (?, {params}, ?, ?) ' \
+             'ON CONFLICT (product_key) DO UPDATE SET {updates}, updated_at = excluded.updated_at, ' \
+             'name_folded = excluded.name_folded'.format(
+                 columns=', '.join(column for _, column in STORE_COLUMNS),
+                 params=', '.join('?' for _ in STORE_COLUMNS),
+                 updates=', '.join(f'{column} = excluded.{column}' for _, column in STORE_COLUMNS)
+             )
+SELECT_COLUMNS = 'rowid, ' + ', '.join(column for _, column in STORE_COLUMNS)
+
+# Rows per executemany call of a bulk upsert
+UPSERT_BATCH_SIZE = 5000
+SORT_ORDERS = {
+    'default': 'rowid',
+    'price_asc': 'price, rowid',
+    'price_desc': 'price DESC, rowid',
+    'name': 'name, rowid'
+}
+MAX_PAGE_SIZE = 200
+
+
+class StoreUnavailable(Exception):
+    """Catalog store that is not configured or holds no products yet, answered with 503"""
+    
+    status_code = 503
+
+
+def store_key(product: Dict[str, Any]) -> Optional[str]:
+    """Upsert key: the article, or the barcode for products without one"""
+    if product.get('article'):
+        return product['article']
+    if product.get('barcode'):
+        return f"barcode:{product['barcode']}"
+    return None
+
+
+class CatalogStore:
+    """Products of every upload in one SQLite table, upserted by article
+    
+    Stand-in for a Postgres table with the same columns and indexes. One
+    connection per store, guarded by a lock, serves the handler thread and
+    background job threads alike.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+    
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            # WAL lets readers query while a bulk load is being written
+            connection.execute('PRAGMA journal_mode = WAL')
+            connection.execute('PRAGMA synchronous = NORMAL')
+            connection.executescript(SCHEMA)
+            columns = [row[1] for row in connection.execute('PRAGMA table_info(products)')]
+            if 'name_folded' not in columns:
+                # Databases written before the column existed are backfilled once
+                connection.create_function('casefold', 1, str.casefold, deterministic=True)
+                with connection:
+                    connection.execute("ALTER TABLE products ADD COLUMN name_folded TEXT NOT NULL DEFAULT ''")
+                    connection.execute('UPDATE products SET name_folded = casefold(name)')
+            self._connection = connection
+        return self._connection
+    
+    def upsert(self, products: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """Insert or update products in batches within one transaction"""
+        started = time.perf_counter()
+        now = time.time()
+        upserted = skipped = 0
+        with self._lock:
+            connection = self._connect()
+            before = connection.execute('SELECT COUNT(*) FROM products').fetchone()[0]
+            with connection:
+                batch: List[Tuple[Any, ...]] = []
+                for product in products:
+                    key = store_key(product)
+                    if key is None:
+                        skipped += 1
+                        continue
+                    batch.append((key, *[product[field] for field, _ in STORE_COLUMNS], now,
+                                  product['name'].casefold()))
+                    if len(batch) >= UPSERT_BATCH_SIZE:
+                        connection.executemany(UPSERT_SQL, batch)
+                        upserted += len(batch)
+                        batch = []
+                connection.executemany(UPSERT_SQL, batch)
+                upserted += len(batch)
+            total = connection.execute('SELECT COUNT(*) FROM products').fetchone()[0]
+        
+        inserted = total - before
+        return {
+            'inserted': inserted,
+            # Same article twice in one upload counts as an update too
+            'updated': upserted - inserted,
+            'skipped': skipped,
+            'total': total,
+            'took_ms': round((time.perf_counter() - started) * 1000, 3)
+        }
+    
+    def query(self, category: Optional[str] = None, brand: Optional[str] = None, barcode: Optional[str] = None,
+              article: Optional[str] = None, min_price: Optional[float] = None, max_price: Optional[float] = None,
+              query: str = '', sort: str = 'default', page: int = 1, page_size: int = 24) -> Dict[str, Any]:
+        """One page of stored products matching the filters, with category counts"""
+        page = max(page, 1)
+        page_size = min(max(page_size, 1), MAX_PAGE_SIZE)
+        
+        conditions = []
+        params: List[Any] = []
+        for column, value in (('brand', brand), ('barcode', barcode), ('article', article)):
+            if value:
+                conditions.append(f'{column} = ?')
+                params.append(value)
+        if min_price is not None:
+            conditions.append('price >= ?')
+            params.append(min_price)
+        if max_price is not None:
+            conditions.append('price <= ?')
+            params.append(max_price)
+        if query:
+            conditions.append("name_folded LIKE ? ESCAPE '\\'")
+            params.append('%' + query.casefold().replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+        
+        # Category counts ignore the category filter, so the other categories stay selectable
+        facet_where = ' AND '.join(conditions) or '1'
+        if category:
+            conditions.append('category = ?')
+            params.append(category)
+        where = ' AND '.join(conditions) or '1'
+        
+        with self._lock:
+            connection = self._connect()
+            total = connection.execute(f'SELECT COUNT(*) FROM products WHERE {where}', params).fetchone()[0]
+            rows = connection.execute(
+                f'SELECT {SELECT_COLUMNS} FROM products WHERE {where} ORDER BY {SORT_ORDERS[sort]} LIMIT ? OFFSET ?',
+                params + [page_size, (page - 1) * page_size]
+            ).fetchall()
+            facets = connection.execute(
+                f'SELECT category, COUNT(*) FROM products WHERE {facet_where} GROUP BY category ORDER BY category',
+                params[:len(params) - 1] if category else params
+            ).fetchall()
+        
+        return {
+            'products': [row_to_product(row) for row in rows],
+            'total': total,
+            'page': page,
+            'pageSize': page_size,
+            'pages': (total + page_size - 1) // page_size,
+            'categories': [{'name': name, 'count': count} for name, count in facets]
+        }
+    
+    def iter_products(self, category: Optional[str] = None,
+                      batch_size: int = UPSERT_BATCH_SIZE) -> Iterator[Dict[str, Any]]:
+        """Every stored product in rowid order, read a batch at a time so memory stays flat
+        
+        Batches continue after the last rowid read instead of holding a
+        cursor open, so writers are only blocked for one batch at a time.
+        """
+        where = 'rowid > ?' + (' AND category = ?' if category else '')
+        last_rowid = 0
+        while True:
+            with self._lock:
+                rows = self._connect().execute(
+                    f'SELECT {SELECT_COLUMNS} FROM products WHERE {where} ORDER BY rowid LIMIT ?',
+                    [last_rowid] + ([category] if category else []) + [batch_size]
+                ).fetchall()
+            if not rows:
+                return
+            for row in rows:
+                yield row_to_product(row)
+            last_rowid = rows[-1][0]
+    
+    def is_empty(self) -> bool:
+        with self._lock:
+            return self._connect().execute('SELECT 1 FROM products LIMIT 1').fetchone() is None
+    
+    def version(self) -> Tuple[int, int]:
+        """Changes with every commit to the database, from this connection or any other"""
+        with self._lock:
+            connection = self._connect()
+            return connection.execute('PRAGMA data_version').fetchone()[0], connection.total_changes
+    
+    def price_rows(self) -> List[Tuple[Any, ...]]:
+        """article, barcode, name, price, base price, special pricing flag, package and stock of every product"""
+        with self._lock:
+            return self._connect().execute(
+                'SELECT article, barcode, name, price, base_price, has_special_pricing, package, in_stock '
+                'FROM products ORDER BY rowid'
+            ).fetchall()
+    
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+def row_to_product(row: Tuple[Any, ...]) -> Dict[str, Any]:
+    product = {'id': f'item_{row[0]}'}
+    for (field, _), value in zip(STORE_COLUMNS, row[1:]):
+        product[field] = bool(value) if field in BOOLEAN_FIELDS else value
+    return product
+
+
+def create_catalog_store() -> CatalogStore:
+    """Store at CATALOG_STORE_PATH, which has to be storage every function mounts
+    
+    Functions are deployed separately and each container has its own /tmp,
+    a default path there would give every function a private empty catalog.
+    """
+    path = os.environ.get('CATALOG_STORE_PATH')
+    if not path:
+        raise StoreUnavailable('Хранилище каталога не настроено: не задан CATALOG_STORE_PATH')
+    return CatalogStore(path)
+
+
+@functools.lru_cache(maxsize=1)
+def default_catalog_store() -> CatalogStore:
+    """The configured store, opened once per instance"""
+    return create_catalog_store()
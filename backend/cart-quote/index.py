@@ -0,0 +1,78 @@
+import json
+import time
+from typing import Dict, Any
+
+from catalog_store import StoreUnavailable
+from price_table import QUOTE_MAX_LINES, PriceTableCache
+
+# Price table of the database catalog-parser writes to with persist: true
+TABLES = PriceTableCache()
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    '''
+    Business: Расчет стоимости корзины по сохраненному каталогу с учетом скидки дилера и кратности упаковки
+    Args: event - dict с httpMethod, body с items (article или barcode, quantity), dealerDiscount, roundToPackage
+          context - объект с request_id, function_name
+    Returns: JSON со строками заказа, ненайденными товарами и итогами
+    '''
+    method: str = event.get('httpMethod', 'POST')
+    
+    # Handle CORS OPTIONS request
+    if method == 'OPTIONS':
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Methods': 'POST, OPTIONS',
+                'Access-Control-Allow-Headers': 'Content-Type, X-User-Id, X-Auth-Token, X-Session-Id',
+                'Access-Control-Max-Age': '86400'
+            },
+            'body': '',
+            'isBase64Encoded': False
+        }
+    
+    if method != 'POST':
+        return json_response(405, {'success': False, 'error': 'Method not allowed'})
+    
+    try:
+        return quote_cart(json.loads(event.get('body') or '{}'))
+    except StoreUnavailable as e:
+        return json_response(e.status_code, {'success': False, 'error': str(e)})
+    except (TypeError, ValueError) as e:
+        return json_response(400, {'success': False, 'error': f'Некорректный запрос: {str(e)}'})
+    except Exception as e:
+        return json_response(500, {
+            'success': False,
+            'error': f'Внутренняя ошибка сервера: {str(e)}',
+            'request_id': context.request_id
+        })
+
+def quote_cart(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Authoritative prices and totals of a whole cart in one call"""
+    items = params.get('items')
+    if not isinstance(items, list) or not items:
+        return json_response(400, {'success': False, 'error': 'Корзина пуста'})
+    if len(items) > QUOTE_MAX_LINES:
+        return json_response(400, {'success': False, 'error': f'Слишком много строк в заказе, максимум {QUOTE_MAX_LINES}'})
+    
+    dealer_discount = float(params.get('dealerDiscount') or 0)
+    if not 0 <= dealer_discount <= 100:
+        return json_response(400, {'success': False, 'error': 'Скидка дилера должна быть от 0 до 100%'})
+    
+    started = time.perf_counter()
+    table = TABLES.get()
+    result = table.quote(items, dealer_discount, bool(params.get('roundToPackage', True)))
+    result['catalog_products'] = table.size
+    result['took_ms'] = round((time.perf_counter() - started) * 1000, 3)
+    return json_response(200, dict({'success': True}, **result))
+
+def json_response(status_code: int, body: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'statusCode': status_code,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': json.dumps(body, ensure_ascii=False),
+        'isBase64Encoded': False
+    }
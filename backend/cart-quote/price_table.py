@@ -0,0 +1,156 @@
+import functools
+import math
+import re
+import threading
+import time
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from catalog_store import CatalogStore, StoreUnavailable, default_catalog_store
+
+# Whole numbers of a package cell, decimals like '0,5 кг' are not box sizes
+PACKAGE_NUMBER_RE = re.compile(r'(?<![\d.,])\d+(?![.,]?\d)')
+# Lines accepted in one quote request
+QUOTE_MAX_LINES = 5000
+
+
+class PriceEntry(NamedTuple):
+    article: str
+    barcode: str
+    name: str
+    price: float
+    base_price: float
+    has_special_pricing: bool
+    package_quantity: int
+    in_stock: bool
+
+
+@functools.lru_cache(maxsize=4096)
+def package_quantity(package: str) -> int:
+    """Order multiple from a 'big/medium/small box' package cell: the smallest box, 1 without one"""
+    quantities = [int(number) for number in PACKAGE_NUMBER_RE.findall(package or '') if int(number) > 0]
+    return min(quantities) if quantities else 1
+
+
+def round_half_up(value: float) -> float:
+    """Whole rubles the way the cart page rounds, Math.round rather than banker's rounding"""
+    return float(math.floor(value + 0.5))
+
+
+class PriceTable:
+    """Article and barcode -> price entry of every stored product
+    
+    Prices are the ones catalog-parser stored: special price, promo and
+    discount columns are already applied by the shared pricing rules. Only
+    the dealer discount, which depends on the request, is applied per quote.
+    """
+    
+    def __init__(self, rows: List[Tuple[Any, ...]]):
+        started = time.perf_counter()
+        self.by_article: Dict[str, PriceEntry] = {}
+        self.by_barcode: Dict[str, PriceEntry] = {}
+        for article, barcode, name, price, base_price, has_special_pricing, package, in_stock in rows:
+            entry = PriceEntry(article, barcode, name, price, base_price, bool(has_special_pricing),
+                               package_quantity(package), bool(in_stock))
+            # Articles match regardless of case, like batch imports dedupe them
+            if article:
+                self.by_article.setdefault(article.casefold(), entry)
+            if barcode:
+                self.by_barcode.setdefault(barcode, entry)
+        self.size = len(rows)
+        self.build_ms = round((time.perf_counter() - started) * 1000, 3)
+    
+    def lookup(self, article: str, barcode: str) -> Optional[PriceEntry]:
+        entry = self.by_article.get(article.casefold()) if article else None
+        if entry is None and barcode:
+            entry = self.by_barcode.get(barcode)
+        return entry
+    
+    def quote(self, items: List[Dict[str, Any]], dealer_discount: float = 0.0,
+              round_to_package: bool = True) -> Dict[str, Any]:
+        """Price cart lines, quantities rounded up to whole packages
+        
+        The dealer discount only applies to products without special
+        pricing, same as adding to the cart on the catalog page.
+        """
+        multiplier = (100 - dealer_discount) / 100
+        lines = []
+        missing = []
+        subtotal = total = 0.0
+        quantity_total = 0
+        
+        for item in items:
+            if not isinstance(item, dict):
+                raise ValueError('Строка заказа должна быть объектом с article или barcode')
+            article = str(item.get('article') or '')
+            barcode = str(item.get('barcode') or '')
+            quantity = int(item.get('quantity', 1))
+            if quantity <= 0:
+                raise ValueError(f'Количество должно быть больше нуля: {article or barcode}')
+            
+            entry = self.lookup(article, barcode)
+            if entry is None:
+                missing.append({'article': article, 'barcode': barcode, 'quantity': quantity})
+                continue
+            
+            ordered = quantity
+            if round_to_package and entry.package_quantity > 1:
+                ordered = -(-quantity // entry.package_quantity) * entry.package_quantity
+            if entry.has_special_pricing:
+                final_price = entry.price
+            else:
+                # Rounded without a discount too, the cart page rounds every regular price
+                final_price = round_half_up(entry.price * multiplier)
+            line_total = round(final_price * ordered, 2)
+            
+            subtotal += entry.price * ordered
+            total += line_total
+            quantity_total += ordered
+            lines.append({
+                'article': entry.article,
+                'barcode': entry.barcode,
+                'name': entry.name,
+                'quantity': quantity,
+                'orderedQuantity': ordered,
+                'packageQuantity': entry.package_quantity,
+                'price': entry.price,
+                'finalPrice': final_price,
+                'lineTotal': line_total,
+                'hasSpecialPricing': entry.has_special_pricing,
+                'inStock': entry.in_stock
+            })
+        
+        return {
+            'lines': lines,
+            'missing': missing,
+            'totals': {
+                'lines': len(lines),
+                'quantity': quantity_total,
+                'subtotal': round(subtotal, 2),
+                'discount': round(subtotal - total, 2),
+                'total': round(total, 2)
+            }
+        }
+
+
+class PriceTableCache:
+    """Price table of the catalog store, rebuilt only after the store changes"""
+    
+    def __init__(self, store: Optional[CatalogStore] = None):
+        # The configured store is opened on the first quote, so a missing one is a 503, not an import error
+        self.store = store
+        self._table: Optional[PriceTable] = None
+        self._version: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+    
+    def get(self) -> PriceTable:
+        with self._lock:
+            if self.store is None:
+                self.store = default_catalog_store()
+            version = self.store.version()
+            if self._table is None or version != self._version:
+                self._table = PriceTable(self.store.price_rows())
+                self._version = version
+            if not self._table.size:
+                # Every line would come back as not found, which reads like a wrong order
+                raise StoreUnavailable('Каталог еще не загружен, расчет корзины недоступен')
+            return self._table
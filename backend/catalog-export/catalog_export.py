@@ -0,0 +1,171 @@
+import csv
+import io
+import re
+import zipfile
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Tuple, Union
+from xml.sax.saxutils import escape
+
+# Header of the supplier price list, the layout catalog-parser reads, then
+# the columns only a parsed catalog has. Dealer price is the base price:
+# the dealer price, or the recommended one where the file had none
+EXPORT_COLUMNS = [
+    ('Артикул', 'article'),
+    ('Бренд', 'brand'),
+    ('Наименование', 'name'),
+    ('Ед. (единицы измерения)', 'unit'),
+    ('Цена (Рекомендуемая)', 'recommendedPrice'),
+    ('Цена дилер (по которой идет рассчет)', 'basePrice'),
+    ('Акция!!!', 'specialOffer'),
+    ('% скидки', 'discountPercent'),
+    ('Специальная цена!!!', 'specialPrice'),
+    ('Упаковка (сколько единиц товара в большой коробке/средней коробки/малой коробки)', 'package'),
+    ('Штрих-код', 'barcode'),
+    ('Фото', 'image'),
+    ('Категория', 'category'),
+    ('Итоговая цена', 'price')
+]
+PRICE_FIELDS = ('recommendedPrice', 'basePrice', 'specialPrice', 'price')
+PRICE_COLUMNS = frozenset(index for index, (_, field) in enumerate(EXPORT_COLUMNS) if field in PRICE_FIELDS)
+EXPORT_FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'xlsx': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx')
+}
+# Excel opens UTF-8 CSV with Cyrillic correctly only with the BOM
+CSV_ENCODINGS = {'utf-8': 'utf-8-sig', 'cp1251': 'cp1251'}
+
+# Characters XML 1.0 does not allow even escaped, NUL is dropped with the cell separator
+XML_INVALID_RE = re.compile('[\x01-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+# Sheet XML is handed to the zip stream in pieces of about this many characters
+XML_FLUSH_SIZE = 64 * 1024
+# Rows handed to csv.writer per writerows call
+CSV_BATCH_ROWS = 1000
+
+Cell = Union[str, float]
+
+
+def iter_export_rows(products: Iterable[Dict[str, Any]]) -> Iterator[List[Cell]]:
+    """Header, then one row per product, prices as numbers and everything else as text"""
+    yield [header for header, _ in EXPORT_COLUMNS]
+    fields = [field for _, field in EXPORT_COLUMNS]
+    for product in products:
+        yield ['' if value is None else value for value in map(product.get, fields)]
+
+
+def iter_batches(rows: Iterable[List[Cell]]) -> Iterator[List[List[Cell]]]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= CSV_BATCH_ROWS:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def format_csv_price(value: Cell) -> str:
+    """Price the way 1C writes it: whole numbers bare, kopecks after a decimal comma"""
+    if isinstance(value, str):
+        return value
+    if value == int(value):
+        return str(int(value))
+    return f'{value:.2f}'.replace('.', ',')
+
+
+def write_csv(rows: Iterable[List[Cell]], file: BinaryIO, encoding: str = 'utf-8') -> int:
+    """Write rows as CSV into a binary file as they come, returns the data row count"""
+    text = io.TextIOWrapper(file, encoding=CSV_ENCODINGS[encoding], errors='replace', newline='')
+    writer = csv.writer(text, lineterminator='\r\n')
+    count = -1
+    for batch in iter_batches(rows):
+        for row in batch:
+            for index in PRICE_COLUMNS:
+                row[index] = format_csv_price(row[index])
+        writer.writerows(batch)
+        count += len(batch)
+    text.flush()
+    # The caller owns the file, do not let the wrapper close it
+    text.detach()
+    return max(count, 0)
+
+
+def xlsx_row(row: List[Cell]) -> str:
+    """Sheet XML of one row, text cells inline, prices as numbers"""
+    # Sanitized and escaped in one pass for the whole row, NUL separates the cells
+    texts = escape(XML_INVALID_RE.sub('', '\x00'.join([
+        cell if isinstance(cell, str) else '' for cell in row
+    ]))).split('\x00')
+    if len(texts) != len(row):
+        # A cell had a NUL of its own
+        texts = [escape(XML_INVALID_RE.sub('', cell.replace('\x00', ''))) if isinstance(cell, str) else ''
+                 for cell in row]
+    return '<row>' + ''.join([
+        f'<c t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>' if text
+        else f'<c><v>{cell!r}</v></c>' if isinstance(cell, float)
+        else '<c/>'
+        for cell, text in zip(row, texts)
+    ]) + '</row>'
+
+
+XLSX_PARTS: Tuple[Tuple[str, str], ...] = (
+    ('[Content_Types].xml',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+     '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+     '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+     '<Default Extension="xml" ContentType="application/xml"/>'
+     '<Override PartName="/xl/workbook.xml" '
+     'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+     '<Override PartName="/xl/worksheets/sheet1.xml" '
+     'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+     '</Types>'),
+    ('_rels/.rels',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+     '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+     '<Relationship Id="rId1" '
+     'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+     'Target="xl/workbook.xml"/>'
+     '</Relationships>'),
+    ('xl/workbook.xml',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+     '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+     'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+     '<sheets><sheet name="Каталог" sheetId="1" r:id="rId1"/></sheets>'
+     '</workbook>'),
+    ('xl/_rels/workbook.xml.rels',
+     '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+     '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+     '<Relationship Id="rId1" '
+     'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+     'Target="worksheets/sheet1.xml"/>'
+     '</Relationships>')
+)
+SHEET_HEAD = ('<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+              '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+SHEET_TAIL = '</sheetData></worksheet>'
+
+
+def write_xlsx(rows: Iterable[List[Cell]], file: BinaryIO) -> int:
+    """Write rows as a one-sheet workbook into a binary file, returns the data row count
+    
+    The sheet is compressed into the zip as it is generated, so only the
+    current piece of XML is held in memory. Strings are inline, a workbook
+    without shared strings or styles is still valid and opens in Excel.
+    """
+    count = -1
+    with zipfile.ZipFile(file, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_PARTS:
+            archive.writestr(name, content)
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            parts = [SHEET_HEAD]
+            size = 0
+            for row in rows:
+                piece = xlsx_row(row)
+                parts.append(piece)
+                size += len(piece)
+                count += 1
+                if size >= XML_FLUSH_SIZE:
+                    sheet.write(''.join(parts).encode('utf-8'))
+                    parts = []
+                    size = 0
+            parts.append(SHEET_TAIL)
+            sheet.write(''.join(parts).encode('utf-8'))
+    return max(count, 0)
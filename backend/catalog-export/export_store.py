@@ -0,0 +1,122 @@
+import functools
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+from typing import Any, BinaryIO, Dict
+
+EXPORT_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+
+class ExportError(Exception):
+    """Export request that can not be answered, reported with its status code"""
+    
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class ExportStore:
+    """Finished exports in shared storage, one directory per export
+    
+    data.bin is written by streaming writers and downloaded in parts of
+    part_size bytes, each small enough for one function response, so no
+    step holds the whole file in memory.
+    """
+    
+    def __init__(self, directory: str, ttl_seconds: int, part_size: int):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.part_size = part_size
+        os.makedirs(directory, exist_ok=True)
+    
+    def _export_dir(self, export_id: str) -> str:
+        if not EXPORT_ID_RE.match(export_id or ''):
+            raise ExportError('Некорректный идентификатор выгрузки')
+        return os.path.join(self.directory, export_id)
+    
+    def data_path(self, export_id: str) -> str:
+        return os.path.join(self._export_dir(export_id), 'data.bin')
+    
+    def create(self) -> str:
+        self.cleanup_expired()
+        
+        export_id = uuid.uuid4().hex
+        os.makedirs(self._export_dir(export_id))
+        return export_id
+    
+    def open_data(self, export_id: str) -> BinaryIO:
+        return open(self.data_path(export_id), 'wb')
+    
+    def finish(self, meta: Dict[str, Any]) -> Dict[str, Any]:
+        """Record size and part count of a written export, from then on it can be downloaded"""
+        size = os.path.getsize(self.data_path(meta['export_id']))
+        parts = max((size + self.part_size - 1) // self.part_size, 1)
+        meta.update(size=size, part_size=self.part_size, parts=parts)
+        export_dir = self._export_dir(meta['export_id'])
+        fd, tmp_path = tempfile.mkstemp(dir=export_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(export_dir, 'meta.json'))
+        return meta
+    
+    def load(self, export_id: str) -> Dict[str, Any]:
+        try:
+            with open(os.path.join(self._export_dir(export_id), 'meta.json'), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            raise ExportError('Выгрузка не найдена или устарела', 404)
+    
+    def read_part(self, meta: Dict[str, Any], part: int) -> bytes:
+        if not 0 <= part < meta['parts']:
+            raise ExportError(f"Нет части {part}, всего частей: {meta['parts']}")
+        with open(self.data_path(meta['export_id']), 'rb') as f:
+            f.seek(part * meta['part_size'])
+            return f.read(meta['part_size'])
+    
+    def remove(self, export_id: str) -> None:
+        shutil.rmtree(self._export_dir(export_id), ignore_errors=True)
+    
+    def cleanup_expired(self) -> None:
+        deadline = time.time() - self.ttl_seconds
+        for export_id in os.listdir(self.directory):
+            path = os.path.join(self.directory, export_id)
+            try:
+                if os.path.getmtime(path) < deadline:
+                    shutil.rmtree(path, ignore_errors=True)
+            except OSError:
+                continue
+
+
+def export_directory() -> str:
+    """CATALOG_EXPORT_DIR, or exports next to the shared catalog store
+    
+    Parts are downloaded by later invocations that can land on another
+    instance, so exports have to be on storage every instance mounts, the
+    container's own /tmp would answer 404 for exports that exist.
+    """
+    directory = os.environ.get('CATALOG_EXPORT_DIR')
+    if directory:
+        return directory
+    store_path = os.environ.get('CATALOG_STORE_PATH')
+    if store_path:
+        return os.path.join(os.path.dirname(os.path.abspath(store_path)), 'catalog-exports')
+    raise ExportError('Хранилище выгрузок не настроено: не заданы CATALOG_EXPORT_DIR и CATALOG_STORE_PATH', 503)
+
+
+def create_export_store() -> ExportStore:
+    return ExportStore(
+        export_directory(),
+        int(os.environ.get('CATALOG_EXPORT_TTL', str(3600))),
+        # Base64 of a part has to fit the response size limit of a function
+        int(os.environ.get('CATALOG_EXPORT_PART_SIZE', str(4 * 1024 * 1024)))
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def default_export_store() -> ExportStore:
+    """The configured export store, opened once per instance"""
+    return create_export_store()
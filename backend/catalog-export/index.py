@@ -0,0 +1,132 @@
+import base64
+import json
+import time
+from typing import Dict, Any
+from urllib.parse import quote
+
+from catalog_export import CSV_ENCODINGS, EXPORT_FORMATS, iter_export_rows, write_csv, write_xlsx
+from catalog_store import StoreUnavailable, default_catalog_store
+from export_store import ExportError, default_export_store
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    '''
+    Business: Выгрузка сохраненного каталога с рассчитанными ценами в CSV или XLSX
+    Args: event - dict с httpMethod, body с format (csv/xlsx), encoding, category или exportId и part для скачивания
+          context - объект с request_id, function_name
+    Returns: JSON с exportId и числом частей, либо часть файла в base64
+    '''
+    method: str = event.get('httpMethod', 'POST')
+    
+    # Handle CORS OPTIONS request
+    if method == 'OPTIONS':
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+                'Access-Control-Allow-Headers': 'Content-Type, X-User-Id, X-Auth-Token, X-Session-Id',
+                'Access-Control-Max-Age': '86400'
+            },
+            'body': '',
+            'isBase64Encoded': False
+        }
+    
+    try:
+        if method == 'GET':
+            params = event.get('queryStringParameters') or {}
+        elif method == 'POST':
+            params = json.loads(event.get('body') or '{}')
+        else:
+            return json_response(405, {'success': False, 'error': 'Method not allowed'})
+        
+        if params.get('exportId'):
+            return download_part(params)
+        return create_export(params)
+    except ExportError as e:
+        return json_response(e.status_code, {'success': False, 'error': str(e)})
+    except StoreUnavailable as e:
+        return json_response(e.status_code, {'success': False, 'error': str(e)})
+    except (TypeError, ValueError) as e:
+        return json_response(400, {'success': False, 'error': f'Некорректный запрос: {str(e)}'})
+    except Exception as e:
+        return json_response(500, {
+            'success': False,
+            'error': f'Внутренняя ошибка сервера: {str(e)}',
+            'request_id': context.request_id
+        })
+
+def create_export(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Stream stored products into an export file, download follows in parts"""
+    export_format = params.get('format') or 'csv'
+    if export_format not in EXPORT_FORMATS:
+        return json_response(400, {'success': False, 'error': f'Неизвестный формат выгрузки: {export_format}'})
+    encoding = params.get('encoding') or 'utf-8'
+    if encoding not in CSV_ENCODINGS:
+        return json_response(400, {'success': False, 'error': f'Неподдерживаемая кодировка: {encoding}'})
+    
+    # Same database catalog-parser writes to with persist: true
+    store = default_catalog_store()
+    if store.is_empty():
+        raise StoreUnavailable('Каталог еще не загружен, выгружать нечего')
+    
+    exports = default_export_store()
+    started = time.perf_counter()
+    export_id = exports.create()
+    rows = iter_export_rows(store.iter_products(category=params.get('category') or None))
+    try:
+        with exports.open_data(export_id) as file:
+            if export_format == 'xlsx':
+                rows_count = write_xlsx(rows, file)
+            else:
+                rows_count = write_csv(rows, file, encoding)
+    except Exception:
+        exports.remove(export_id)
+        raise
+    
+    meta = exports.finish({
+        'export_id': export_id,
+        'format': export_format,
+        'filename': f"catalog.{EXPORT_FORMATS[export_format][1]}",
+        'rows': rows_count
+    })
+    return json_response(200, {
+        'success': True,
+        'exportId': export_id,
+        'filename': meta['filename'],
+        'format': export_format,
+        'rows': rows_count,
+        'size': meta['size'],
+        'parts': meta['parts'],
+        'took_ms': round((time.perf_counter() - started) * 1000, 3)
+    })
+
+def download_part(params: Dict[str, Any]) -> Dict[str, Any]:
+    """One part of a finished export as a binary response"""
+    exports = default_export_store()
+    meta = exports.load(params['exportId'])
+    part = int(params.get('part') or 0)
+    data = exports.read_part(meta, part)
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Content-Type': EXPORT_FORMATS[meta['format']][0],
+            'Content-Disposition': f"attachment; filename*=UTF-8''{quote(meta['filename'])}",
+            'X-Export-Part': str(part),
+            'X-Export-Parts': str(meta['parts']),
+            'Access-Control-Allow-Origin': '*',
+            'Access-Control-Expose-Headers': 'X-Export-Part, X-Export-Parts'
+        },
+        'body': base64.b64encode(data).decode('ascii'),
+        'isBase64Encoded': True
+    }
+
+def json_response(status_code: int, body: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'statusCode': status_code,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': json.dumps(body, ensure_ascii=False),
+        'isBase64Encoded': False
+    }
@@ -0,0 +1,69 @@
+from typing import Any, Dict, List, Set
+
+from catalog_delta import iter_products_json
+from catalog_integrity import STABLE_ID_PREFIX
+from response_encoding import JSON_ENCODER
+
+# Files accepted in one batch request
+BATCH_MAX_FILES = 20
+
+
+def merge_catalogs(parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merge parsed catalogs of several files into one, dropping duplicate products
+    
+    Precedence: files in request order, rows in file order. A product whose
+    article or barcode was already taken by an earlier product is left out,
+    so the file listed first wins. Row ids are renumbered across the batch,
+    stable ids of files parsed with stableIds are kept.
+    Parts are dicts with filename and parsed, parsed is None for files that
+    failed, those only count in the per-file stats.
+    """
+    articles: Set[str] = set()
+    barcodes: Set[str] = set()
+    categories: Set[str] = set()
+    product_parts: List[str] = []
+    files = []
+    
+    for part in parts:
+        parsed = part['parsed']
+        stats = {'filename': part['filename'], 'success': parsed is not None}
+        files.append(stats)
+        if parsed is None:
+            stats.update(error=part['error'], debug_info=part['debug_info'])
+            continue
+        
+        kept = duplicates = 0
+        for product in iter_products_json(parsed['products_json']):
+            article = product['article'].casefold()
+            barcode = product['barcode']
+            if (article and article in articles) or (barcode and barcode in barcodes):
+                duplicates += 1
+                continue
+            if article:
+                articles.add(article)
+            if barcode:
+                barcodes.add(barcode)
+            
+            if not product['id'].startswith(STABLE_ID_PREFIX):
+                product['id'] = f'item_{len(product_parts)}'
+            product_parts.append(JSON_ENCODER.encode(product))
+            categories.add(product['category'])
+            kept += 1
+        
+        debug_info = parsed['debug_info']
+        stats.update(
+            total_products=kept,
+            duplicates=duplicates,
+            rows_count=debug_info['rows_count'],
+            cache_hit=part['cache_hit'],
+            encoding=debug_info.get('encoding'),
+            price_errors=debug_info['price_errors']['cells']
+        )
+    
+    return {
+        'products_json': ', '.join(product_parts),
+        'categories': sorted(categories),
+        'total_products': len(product_parts),
+        'files': files,
+        'duplicates': sum(stats.get('duplicates', 0) for stats in files)
+    }
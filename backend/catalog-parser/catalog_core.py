@@ -0,0 +1,297 @@
+import binascii
+import io
+import json
+import re
+import time
+from math import isfinite
+from typing import Any, Dict, List, Optional, Tuple
+
+from pricing import compute_prices, is_offer_active
+
+# Base64 characters per decoded slice (kept a multiple of 4)
+DECODE_CHUNK_SIZE = 64 * 1024
+
+DEFAULT_CATEGORY = 'Канцтовары'
+DEFAULT_IMAGE = '/img/dc9855aa-d3ba-40f6-91a6-c00afab470de.jpg'
+# Cell values spreadsheet exports leave in empty cells
+EMPTY_CELL_VALUES = ('', 'nan', 'None')
+
+# Currency and percent signs, spaces of every kind (NBSP, thin) grouping thousands
+PRICE_NOISE_RE = re.compile(r'[₽$€%\s]+')
+CURRENCY_SUFFIX_RE = re.compile(r'(?:руб|р|rub|usd|eur)\.?$', re.IGNORECASE)
+# Failed cells kept as examples in debug_info
+PRICE_ERROR_SAMPLES = 20
+
+# One encoder for every product, json.dumps with options builds a new one per call
+PRODUCT_ENCODER = json.JSONEncoder(ensure_ascii=False)
+
+
+class ProductRecord:
+    """One catalog product, turned into the product JSON shape only when written out"""
+    
+    __slots__ = (
+        'idx', 'name', 'article', 'brand', 'category', 'unit', 'package', 'barcode', 'image',
+        'recommended_price', 'dealer_price', 'special_price', 'special_offer', 'discount_percent',
+        'price', 'base_price', 'has_special_pricing', 'price_errors', 'product_id', 'line'
+    )
+    
+    def __init__(self, idx: int, name: str, article: str, brand: str, unit: str, package: str, barcode: str,
+                 photo: str, recommended_price: float, dealer_price: float, special_price: float,
+                 special_offer: str, discount_percent: str,
+                 price_errors: Optional[List[Tuple[str, str]]] = None):
+        self.idx = idx
+        self.name = name
+        self.article = article
+        self.brand = brand
+        self.category = brand or DEFAULT_CATEGORY
+        self.unit = unit
+        self.package = package
+        self.barcode = barcode
+        self.image = process_image_path(photo)
+        self.recommended_price = recommended_price
+        self.dealer_price = dealer_price
+        self.special_price = special_price
+        self.special_offer = special_offer
+        self.discount_percent = discount_percent
+        # Filled in for the whole batch by price_records
+        self.price = 0.0
+        self.base_price = 0.0
+        self.has_special_pricing = False
+        # (field, cell) pairs of price cells that are not numbers
+        self.price_errors = price_errors
+        # Stable id from article or barcode, set by the integrity stage, row id otherwise
+        self.product_id: Optional[str] = None
+        # Line of the file (row of the sheet) the record starts on, set by the parser
+        self.line: Optional[int] = None
+    
+    @property
+    def id(self) -> str:
+        return self.product_id or f'item_{self.idx}'
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'name': self.name,
+            'article': self.article,
+            'brand': self.brand,
+            'category': self.category,
+            'price': round(self.price, 2),
+            'basePrice': round(self.base_price, 2),
+            'recommendedPrice': round(self.recommended_price, 2),
+            'unit': self.unit,
+            'package': self.package,
+            'barcode': self.barcode,
+            'image': self.image,
+            'inStock': True,
+            'hasSpecialPricing': self.has_special_pricing,
+            'specialOffer': self.special_offer,
+            'discountPercent': self.discount_percent,
+            'specialPrice': self.special_price if self.special_price > 0 else None,
+            'description': f'{self.brand} {self.name}'.strip()
+        }
+    
+    def to_json(self) -> str:
+        return PRODUCT_ENCODER.encode(self.to_dict())
+
+
+def make_record(idx: int, name: Optional[str], article: Optional[str], brand: Optional[str],
+                unit: Optional[str], recommended_price: Optional[str], dealer_price: Optional[str],
+                special_offer: Optional[str], discount_percent: Optional[str], special_price: Optional[str],
+                package: Optional[str], barcode: Optional[str], photo: Optional[str]) -> Optional[ProductRecord]:
+    """Build a record from raw cells of one row, None for rows without a product name"""
+    name = clean_text(name)
+    if not name:
+        return None
+    
+    price_errors = None
+    prices = []
+    for field, cell in (('recommended_price', recommended_price), ('dealer_price', dealer_price),
+                        ('special_price', special_price)):
+        price = try_parse_price(cell)
+        if price is None:
+            price_errors = (price_errors or []) + [(field, cell)]
+            price = 0.0
+        prices.append(price)
+    
+    return ProductRecord(
+        idx, name, clean_text(article), clean_text(brand), clean_text(unit), clean_text(package),
+        clean_text(barcode), clean_text(photo), prices[0], prices[1], prices[2],
+        clean_text(special_offer), clean_text(discount_percent), price_errors
+    )
+
+
+def price_records(records: List[ProductRecord]) -> None:
+    """Apply the pricing rules to a batch of records as columns"""
+    if not records:
+        return
+    offer_active = [is_offer_active(record.special_offer) for record in records]
+    discount_active = [bool(record.discount_percent) for record in records]
+    discounts = []
+    for record, active in zip(records, discount_active):
+        discount = try_parse_price(record.discount_percent) if active else 0.0
+        if discount is None:
+            record.price_errors = (record.price_errors or []) + [('discount_percent', record.discount_percent)]
+            discount = 0.0
+        discounts.append(discount)
+    
+    # Offer cells often hold promo text, so only a number there counts
+    prices, base_prices, special_flags = compute_prices((
+        [record.recommended_price for record in records],
+        [record.dealer_price for record in records],
+        [record.special_price for record in records],
+        [parse_price(record.special_offer) if active else 0.0 for record, active in zip(records, offer_active)],
+        offer_active,
+        discounts,
+        discount_active
+    ))
+    for record, price, base_price, has_special_pricing in zip(records, prices, base_prices, special_flags):
+        record.price = price
+        record.base_price = base_price
+        record.has_special_pricing = has_special_pricing
+
+
+def clean_text(value: Optional[str]) -> str:
+    """Strip cell text, spreadsheet placeholders of empty cells become ''"""
+    if not value:
+        return ''
+    value = str(value).strip()
+    return '' if value in EMPTY_CELL_VALUES else value
+
+
+def parse_price(price_value: Optional[str]) -> float:
+    """Parse price from string, 0.0 for empty and malformed cells"""
+    price = try_parse_price(price_value)
+    return 0.0 if price is None else price
+
+
+def try_parse_price(price_value: Optional[str]) -> Optional[float]:
+    """Parse price from string, 0.0 for empty cells, None when the cell is not a number
+    
+    Accepts ru and en notation: '1 234,56 ₽', '1.234,56', '1,234.56', '$12.99',
+    '15%', 'руб.' suffixes, NBSP and thin spaces. The last of ',' and '.' is
+    the decimal separator when both occur, a single comma alone is decimal
+    too, repeated separators group thousands.
+    """
+    price_str = str(price_value).strip() if price_value else ''
+    # Plain numbers, most cells of most price lists, need no cleanup
+    if price_str.replace('.', '', 1).isdecimal():
+        return float(price_str)
+    if price_str in EMPTY_CELL_VALUES:
+        return 0.0
+    
+    price_str = PRICE_NOISE_RE.sub('', price_str)
+    if not price_str[-1:].isdigit():
+        price_str = CURRENCY_SUFFIX_RE.sub('', price_str)
+    
+    comma = price_str.rfind(',')
+    if comma >= 0:
+        dot = price_str.rfind('.')
+        if dot > comma:
+            # 1,234.56
+            price_str = price_str.replace(',', '')
+        elif dot >= 0:
+            # 1.234,56
+            price_str = price_str.replace('.', '').replace(',', '.')
+        elif price_str.find(',') == comma:
+            # 12,5
+            price_str = price_str.replace(',', '.')
+        else:
+            # 1,234,567
+            price_str = price_str.replace(',', '')
+    elif price_str.count('.') > 1:
+        # 1.234.567
+        price_str = price_str.replace('.', '')
+    
+    try:
+        price = float(price_str)
+    except ValueError:
+        return None
+    return price if isfinite(price) else None
+
+
+class PriceErrorLog:
+    """Counts price cells that are not numbers, with a few examples for debug_info"""
+    
+    def __init__(self):
+        self.rows = 0
+        self.cells = 0
+        self.samples: List[Dict[str, Any]] = []
+    
+    def add(self, record: ProductRecord) -> None:
+        if not record.price_errors:
+            return
+        self.rows += 1
+        self.cells += len(record.price_errors)
+        for field, cell in record.price_errors:
+            if len(self.samples) < PRICE_ERROR_SAMPLES:
+                self.samples.append({'id': record.id, 'row': record.line, 'field': field, 'value': cell})
+    
+    def merge(self, report: Dict[str, Any]) -> None:
+        """Add counts of a report made by another log, for batches parsed apart"""
+        self.rows += report['rows']
+        self.cells += report['cells']
+        self.samples.extend(report['samples'][:PRICE_ERROR_SAMPLES - len(self.samples)])
+    
+    def report(self) -> Dict[str, Any]:
+        return {'rows': self.rows, 'cells': self.cells, 'samples': self.samples}
+
+
+def process_image_path(photo_path: str) -> str:
+    """Process image path from file"""
+    if not photo_path or not photo_path.strip():
+        return DEFAULT_IMAGE
+    
+    photo_path = photo_path.strip()
+    
+    # If it's a URL or an absolute path, return as is
+    if photo_path.startswith(('http://', 'https://', '/')):
+        return photo_path
+    
+    # If it's just a filename, assume it's in images folder
+    if '.' in photo_path:
+        return f'/images/{photo_path}'
+    
+    # Default fallback
+    return DEFAULT_IMAGE
+
+
+class Base64Reader(io.RawIOBase):
+    """Raw stream that decodes a base64 string slice by slice"""
+    
+    def __init__(self, data: str, offset: int = 0, chunk_size: int = DECODE_CHUNK_SIZE):
+        self._data = data
+        self._pos = offset
+        self._chunk_size = chunk_size - chunk_size % 4
+        self._pending = memoryview(b'')
+        # Time spent in a2b_base64, for the per-stage timings of the parsers
+        self.decode_seconds = 0.0
+    
+    @property
+    def consumed(self) -> int:
+        """Base64 characters decoded so far, read-ahead included"""
+        return min(self._pos, len(self._data))
+    
+    def readable(self) -> bool:
+        return True
+    
+    def readinto(self, buffer) -> int:
+        while not self._pending and self._pos < len(self._data):
+            chunk = self._data[self._pos:self._pos + self._chunk_size]
+            self._pos += self._chunk_size
+            started = time.perf_counter()
+            try:
+                self._pending = memoryview(binascii.a2b_base64(chunk))
+            except ValueError as e:
+                raise binascii.Error(str(e))
+            self.decode_seconds += time.perf_counter() - started
+        
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+def open_text_stream(file_data: str, offset: int, encoding: str, errors: str) -> io.TextIOWrapper:
+    """Incrementally decode base64 payload into text"""
+    raw = io.BufferedReader(Base64Reader(file_data, offset), DECODE_CHUNK_SIZE)
+    return io.TextIOWrapper(raw, encoding=encoding, errors=errors, newline='')
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional
+
+# Product fields compared between uploads, in product dict order. Not the id:
+# row ids shift for every product below an inserted or removed row
+DELTA_FIELDS = [
+    'name', 'article', 'brand', 'category', 'price', 'basePrice', 'recommendedPrice',
+    'unit', 'package', 'barcode', 'image', 'inStock', 'hasSpecialPricing', 'specialOffer',
+    'discountPercent', 'specialPrice', 'description'
+]
+# One crc32 per field packed together, compared as a whole row hash
+FIELD_HASHES = struct.Struct(f'<{len(DELTA_FIELDS)}I')
+
+# Snapshot: product key -> packed field hashes
+Snapshot = Dict[str, bytes]
+
+
+def iter_products_json(products_json: str) -> Iterator[Dict[str, Any]]:
+    """Decode serialized products one at a time without building the whole list"""
+    decoder = json.JSONDecoder()
+    pos = 0
+    end = len(products_json)
+    while pos < end:
+        product, pos = decoder.raw_decode(products_json, pos)
+        yield product
+        # Skip the ', ' separator
+        pos += 2
+
+
+def product_key(product: Dict[str, Any]) -> str:
+    """Identify a product across uploads by article, then barcode, then row id"""
+    if product['article']:
+        return f"article:{product['article']}"
+    if product['barcode']:
+        return f"barcode:{product['barcode']}"
+    return f"id:{product['id']}"
+
+
+def hash_product(product: Dict[str, Any]) -> bytes:
+    return FIELD_HASHES.pack(*[
+        zlib.crc32(repr(product[field]).encode('utf-8')) for field in DELTA_FIELDS
+    ])
+
+
+class CatalogDelta:
+    """Collect added/changed/removed products against a previous snapshot"""
+    
+    def __init__(self, base: Optional[Snapshot]):
+        self.base = base
+        self.snapshot: Snapshot = {}
+        self.added: List[Dict[str, Any]] = []
+        self.changed: List[Dict[str, Any]] = []
+        self._digest = hashlib.sha256()
+    
+    def add(self, product: Dict[str, Any]) -> None:
+        key = product_key(product)
+        # Repeated keys within one file are told apart by occurrence
+        if key in self.snapshot:
+            occurrence = 2
+            while f'{key}#{occurrence}' in self.snapshot:
+                occurrence += 1
+            key = f'{key}#{occurrence}'
+        
+        row_hash = hash_product(product)
+        self.snapshot[key] = row_hash
+        self._digest.update(key.encode('utf-8'))
+        self._digest.update(row_hash)
+        
+        if self.base is None:
+            return
+        
+        previous = self.base.get(key)
+        if previous is None:
+            self.added.append({'key': key, 'product': product})
+        elif previous != row_hash:
+            old_hashes = FIELD_HASHES.unpack(previous)
+            new_hashes = FIELD_HASHES.unpack(row_hash)
+            self.changed.append({
+                'key': key,
+                'id': product['id'],
+                'fields': {
+                    field: product[field]
+                    for field, old, new in zip(DELTA_FIELDS, old_hashes, new_hashes)
+                    if old != new
+                }
+            })
+    
+    @property
+    def fingerprint(self) -> str:
+        return self._digest.hexdigest()
+    
+    def removed(self) -> List[str]:
+        if self.base is None:
+            return []
+        return [key for key in self.base if key not in self.snapshot]
+
+
+class SnapshotStore:
+    """In-process LRU of catalog snapshots, lives as long as the warm instance"""
+    
+    def __init__(self, max_snapshots: int):
+        self.max_snapshots = max_snapshots
+        self._snapshots: 'OrderedDict[str, Snapshot]' = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, fingerprint: str) -> Optional[Snapshot]:
+        with self._lock:
+            snapshot = self._snapshots.get(fingerprint)
+            if snapshot is not None:
+                self._snapshots.move_to_end(fingerprint)
+            return snapshot
+    
+    def set(self, fingerprint: str, snapshot: Snapshot) -> None:
+        with self._lock:
+            self._snapshots[fingerprint] = snapshot
+            self._snapshots.move_to_end(fingerprint)
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+
+
+def create_snapshot_store() -> SnapshotStore:
+    return SnapshotStore(int(os.environ.get('CATALOG_SNAPSHOT_LIMIT', '8')))
+
+
+def build_delta(products_json: str, previous_fingerprint: Optional[str],
+                store: SnapshotStore) -> Dict[str, Any]:
+    """Diff parsed products against the snapshot the client already has"""
+    base = store.get(previous_fingerprint) if previous_fingerprint else None
+    delta = CatalogDelta(base)
+    for product in iter_products_json(products_json):
+        delta.add(product)
+    store.set(delta.fingerprint, delta.snapshot)
+    
+    return {
+        'fingerprint': delta.fingerprint,
+        'base_fingerprint': previous_fingerprint,
+        'base_found': base is not None,
+        'added': delta.added,
+        'changed': delta.changed,
+        'removed': delta.removed()
+    }
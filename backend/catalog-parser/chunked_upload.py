@@ -0,0 +1,121 @@
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+from typing import Any, BinaryIO, Dict, Optional
+
+UPLOAD_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+
+class UploadError(Exception):
+    """Chunked upload request that can not be applied, reported with its status code"""
+    
+    def __init__(self, message: str, status_code: int = 400, details: Optional[Dict[str, Any]] = None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.details = details or {}
+
+
+class ChunkedUploadStore:
+    """Stages chunked uploads in local temp storage, one directory per upload
+    
+    meta.json tracks the next expected chunk and checksums of acknowledged
+    chunks; data.bin holds the decoded bytes in chunk order.
+    """
+    
+    def __init__(self, directory: str, ttl_seconds: int):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(directory, exist_ok=True)
+    
+    def _upload_dir(self, upload_id: str) -> str:
+        if not UPLOAD_ID_RE.match(upload_id or ''):
+            raise UploadError('Некорректный идентификатор загрузки')
+        return os.path.join(self.directory, upload_id)
+    
+    def data_path(self, upload_id: str) -> str:
+        return os.path.join(self._upload_dir(upload_id), 'data.bin')
+    
+    def create(self, filename: str, total_chunks: Optional[int],
+               column_mapping: Optional[Dict[str, str]] = None,
+               integrity_options: Optional[Dict[str, bool]] = None) -> Dict[str, Any]:
+        self.cleanup_expired()
+        
+        upload_id = uuid.uuid4().hex
+        os.makedirs(self._upload_dir(upload_id))
+        open(self.data_path(upload_id), 'wb').close()
+        
+        meta = {
+            'upload_id': upload_id,
+            'filename': filename,
+            'total_chunks': total_chunks,
+            'next_chunk': 0,
+            'bytes_received': 0,
+            'checksums': [],
+            # Parser setup fixed at init, rows are parsed as the chunks arrive
+            'column_mapping': column_mapping,
+            'integrity_options': integrity_options,
+            'created_at': time.time()
+        }
+        self._save_meta(meta)
+        return meta
+    
+    def load(self, upload_id: str) -> Dict[str, Any]:
+        try:
+            with open(os.path.join(self._upload_dir(upload_id), 'meta.json'), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            raise UploadError('Загрузка не найдена или устарела', 404)
+    
+    def append(self, meta: Dict[str, Any], data: bytes, checksum: str) -> Dict[str, Any]:
+        """Append the next chunk, dropping bytes of a write that never got acknowledged"""
+        with open(self.data_path(meta['upload_id']), 'r+b') as f:
+            f.truncate(meta['bytes_received'])
+            f.seek(meta['bytes_received'])
+            f.write(data)
+        
+        meta['next_chunk'] += 1
+        meta['bytes_received'] += len(data)
+        meta['checksums'].append(checksum)
+        self._save_meta(meta)
+        return meta
+    
+    def open_data(self, upload_id: str) -> BinaryIO:
+        return open(self.data_path(upload_id), 'rb')
+    
+    def remove(self, upload_id: str) -> None:
+        shutil.rmtree(self._upload_dir(upload_id), ignore_errors=True)
+    
+    def is_expired(self, upload_id: str) -> bool:
+        """Whether the upload was not touched for the TTL or its directory is already gone"""
+        try:
+            return os.path.getmtime(self._upload_dir(upload_id)) < time.time() - self.ttl_seconds
+        except OSError:
+            return True
+    
+    def cleanup_expired(self) -> None:
+        deadline = time.time() - self.ttl_seconds
+        for upload_id in os.listdir(self.directory):
+            path = os.path.join(self.directory, upload_id)
+            try:
+                if os.path.getmtime(path) < deadline:
+                    shutil.rmtree(path, ignore_errors=True)
+            except OSError:
+                continue
+    
+    def _save_meta(self, meta: Dict[str, Any]) -> None:
+        upload_dir = self._upload_dir(meta['upload_id'])
+        fd, tmp_path = tempfile.mkstemp(dir=upload_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(upload_dir, 'meta.json'))
+
+
+def create_upload_store() -> ChunkedUploadStore:
+    directory = os.environ.get(
+        'CHUNKED_UPLOAD_DIR', os.path.join(tempfile.gettempdir(), 'catalog-parser-uploads')
+    )
+    return ChunkedUploadStore(directory, int(os.environ.get('CHUNKED_UPLOAD_TTL', str(24 * 3600))))
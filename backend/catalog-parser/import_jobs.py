@@ -0,0 +1,170 @@
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+JOB_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+# Job states, a running job whose meta stops changing is reported as lost
+JOB_STATES = ('queued', 'running', 'done', 'failed')
+
+
+class JobError(Exception):
+    """Job request that can not be answered, reported with its status code"""
+    
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class ImportJobStore:
+    """Background import jobs in local storage, one directory per job
+    
+    meta.json holds state and progress counters, page-NNNNN.json hold the
+    products parsed so far as JSON arrays of page_size products, written as
+    soon as a page fills up so clients can read them while the job runs.
+    """
+    
+    def __init__(self, directory: str, ttl_seconds: int, page_size: int, stale_seconds: int):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.page_size = page_size
+        self.stale_seconds = stale_seconds
+        os.makedirs(directory, exist_ok=True)
+    
+    def _job_dir(self, job_id: str) -> str:
+        if not JOB_ID_RE.match(job_id or ''):
+            raise JobError('Некорректный идентификатор задания')
+        return os.path.join(self.directory, job_id)
+    
+    def _page_path(self, job_id: str, page: int) -> str:
+        return os.path.join(self._job_dir(job_id), f'page-{page:05d}.json')
+    
+    def create(self, filename: str, total_bytes: int) -> Dict[str, Any]:
+        self.cleanup_expired()
+        
+        job_id = uuid.uuid4().hex
+        os.makedirs(self._job_dir(job_id))
+        now = time.time()
+        meta = {
+            'job_id': job_id,
+            'filename': filename,
+            'state': 'queued',
+            'total_bytes': total_bytes,
+            'bytes_processed': 0,
+            'rows_processed': 0,
+            'products_ready': 0,
+            'pages_ready': 0,
+            'created_at': now,
+            'started_at': None,
+            'updated_at': now,
+            'result': None,
+            'error': None
+        }
+        self.save(meta)
+        return meta
+    
+    def load(self, job_id: str) -> Dict[str, Any]:
+        try:
+            with open(os.path.join(self._job_dir(job_id), 'meta.json'), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            raise JobError('Задание не найдено или устарело', 404)
+    
+    def save(self, meta: Dict[str, Any]) -> None:
+        meta['updated_at'] = time.time()
+        job_dir = self._job_dir(meta['job_id'])
+        fd, tmp_path = tempfile.mkstemp(dir=job_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(tmp_path, os.path.join(job_dir, 'meta.json'))
+    
+    def is_lost(self, meta: Dict[str, Any]) -> bool:
+        """Running job nobody has updated for a while, its instance is gone"""
+        return meta['state'] == 'running' and time.time() - meta['updated_at'] > self.stale_seconds
+    
+    def write_page(self, job_id: str, page: int, products: List[str]) -> None:
+        path = self._page_path(job_id, page)
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write('[')
+            f.write(', '.join(products))
+            f.write(']')
+        os.replace(path + '.tmp', path)
+    
+    def read_page(self, job_id: str, page: int) -> Optional[str]:
+        """Page as a JSON array string, None when it is not written yet"""
+        try:
+            with open(self._page_path(job_id, page), 'r', encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+    
+    def remove(self, job_id: str) -> None:
+        shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+    
+    def cleanup_expired(self) -> None:
+        deadline = time.time() - self.ttl_seconds
+        for job_id in os.listdir(self.directory):
+            path = os.path.join(self.directory, job_id)
+            try:
+                if os.path.getmtime(path) < deadline:
+                    shutil.rmtree(path, ignore_errors=True)
+            except OSError:
+                continue
+
+
+class JobPages:
+    """Groups products of a running job into pages and writes each page once it is full"""
+    
+    def __init__(self, store: ImportJobStore, job_id: str):
+        self.store = store
+        self.job_id = job_id
+        self.pages = 0
+        self.products = 0
+        self._pending: List[str] = []
+    
+    def add(self, products: List[str]) -> None:
+        self._pending.extend(products)
+        self.products += len(products)
+        page_size = self.store.page_size
+        while len(self._pending) >= page_size:
+            self.store.write_page(self.job_id, self.pages, self._pending[:page_size])
+            self._pending = self._pending[page_size:]
+            self.pages += 1
+    
+    def close(self) -> None:
+        """Write the last, partly filled page"""
+        if self._pending:
+            self.store.write_page(self.job_id, self.pages, self._pending)
+            self._pending = []
+            self.pages += 1
+
+
+def job_progress(meta: Dict[str, Any]) -> Dict[str, Any]:
+    """Share of input parsed, throughput and remaining time estimated from it"""
+    fraction = meta['bytes_processed'] / meta['total_bytes'] if meta['total_bytes'] else 0.0
+    if meta['state'] == 'done':
+        fraction = 1.0
+    elapsed = (meta['updated_at'] - meta['started_at']) if meta['started_at'] else 0.0
+    rows_per_second = meta['rows_processed'] / elapsed if elapsed > 0 else None
+    eta_seconds = None
+    if meta['state'] == 'running' and 0 < fraction < 1:
+        eta_seconds = round(elapsed * (1 - fraction) / fraction, 1)
+    return {
+        'progress': round(fraction, 4),
+        'rowsPerSecond': round(rows_per_second) if rows_per_second is not None else None,
+        'etaSeconds': eta_seconds
+    }
+
+
+def create_job_store() -> ImportJobStore:
+    directory = os.environ.get('IMPORT_JOB_DIR', os.path.join(tempfile.gettempdir(), 'catalog-parser-jobs'))
+    return ImportJobStore(
+        directory,
+        int(os.environ.get('IMPORT_JOB_TTL', str(24 * 3600))),
+        int(os.environ.get('IMPORT_JOB_PAGE_SIZE', '5000')),
+        int(os.environ.get('IMPORT_JOB_STALE_SECONDS', '120'))
+    )
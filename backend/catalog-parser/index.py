@@ -1,9 +1,146 @@
 import json
-import base64
-from typing import Dict, Any, List
+import binascii
+import codecs
+import hashlib
+from typing import Dict, Any, Callable, List, Optional, Tuple, Iterator, Iterable, Set, BinaryIO, TYPE_CHECKING
 import csv
-from io import StringIO
+import io
+import itertools
+import os
 import re
+import time
+
+from catalog_core import (
+    DECODE_CHUNK_SIZE, Base64Reader, PriceErrorLog, ProductRecord, make_record, open_text_stream, price_records
+)
+from catalog_batch import BATCH_MAX_FILES, merge_catalogs
+from catalog_delta import build_delta, create_snapshot_store, iter_products_json
+from catalog_integrity import IntegrityIndex
+from chunked_upload import UploadError, create_upload_store
+from import_jobs import JobError, JobPages, create_job_store, job_progress
+from instrumentation import (
+    PROFILE_MODES, PROFILE_TOP, add_time, attach_debug_info, count, instrumented, log_timings, run_profiled, stage
+)
+from parse_cache import create_parse_cache
+from pricing import PRICE_BATCH_SIZE
+from response_encoding import JSON_ENCODER, catalog_body, encode_response, negotiate
+from text_encoding import ENCODING_SAMPLE_SIZE, candidate_encodings, detect_encoding, encoding_report
+
+if TYPE_CHECKING:
+    # multiprocessing is imported with the first parallel parse, not on cold start
+    from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# Bump when parsing output changes so cached results are not reused
+PARSER_VERSION = '9'
+
+# Characters of decoded text inspected to pick the delimiter
+SNIFF_SIZE = 64 * 1024
+NON_BASE64_RE = re.compile(r'[^A-Za-z0-9+/=]')
+
+# Parsed catalogs keyed by content hash, kept while the instance is warm
+PARSE_CACHE = create_parse_cache()
+# Per-product row hashes of recent catalogs, for delta responses
+SNAPSHOTS = create_snapshot_store()
+
+# Chunked uploads staged on local disk and their in-progress parsers
+UPLOADS = create_upload_store()
+UPLOAD_SESSIONS: Dict[str, 'UploadSession'] = {}
+
+# Background import jobs: progress and result pages in local storage,
+# parsed by threads of this instance, IMPORT_JOB_WORKERS at a time
+JOBS = create_job_store()
+JOB_WORKERS = int(os.environ.get('IMPORT_JOB_WORKERS', '1'))
+JOB_EXECUTOR: Optional['ThreadPoolExecutor'] = None
+
+# Opt-in multi-process parsing: worker count (0 = streaming serial parse)
+# and the smallest slice of decoded text handed to one worker
+PARSE_WORKERS = int(os.environ.get('CATALOG_PARSE_WORKERS', '0'))
+PARALLEL_BATCH_SIZE = 1024 * 1024
+# Opt-in pool for batch requests, files are parsed one per worker (0 = one by one),
+# and the smallest total of uncached files worth starting the workers for
+BATCH_WORKERS = int(os.environ.get('CATALOG_BATCH_WORKERS', '0'))
+BATCH_PARALLEL_MIN_BYTES = 4 * PARALLEL_BATCH_SIZE
+PARSE_POOLS: Dict[int, 'ProcessPoolExecutor'] = {}
+
+# Column aliases per product field, in matching priority order
+FIELD_ALIASES: Dict[str, List[str]] = {
+    'article': [
+        'Артикул', 'артикул', 'Article', 'Код', 'код', 'ID', 'id', 'SKU', 'sku',
+        'Арт', 'арт', 'Артикул товара', 'Код товара'
+    ],
+    'brand': [
+        'Бренд', 'бренд', 'Brand', 'Производитель', 'производитель', 'Марка', 'марка',
+        'Торговая марка', 'торговая марка', 'Изготовитель', 'изготовитель'
+    ],
+    'name': [
+        'Наименование', 'наименование', 'Name', 'Название', 'название', 'Товар', 'товар',
+        'Описание', 'описание', 'Наименование товара', 'название товара'
+    ],
+    'unit': [
+        'Ед.', 'Ед. (единицы измерения)', 'единицы измерения', 'Unit', 'Ед.изм',
+        'Единица', 'единица', 'Упаковка', 'упаковка', 'шт', 'Шт', 'уп', 'Уп'
+    ],
+    'recommended_price': [
+        'Цена (Рекомендуемая)', 'рекомендуемая цена', 'Recommended Price',
+        'Розничная цена', 'розничная цена', 'Цена розница', 'цена розница',
+        'РРЦ', 'ррц', 'Цена', 'цена', 'Price', 'price'
+    ],
+    'dealer_price': [
+        'Цена дилер (по которой идет рассчет)', 'цена дилер', 'Dealer Price',
+        'Оптовая цена', 'оптовая цена', 'Цена опт', 'цена опт',
+        'Базовая цена', 'базовая цена', 'Себестоимость', 'себестоимость'
+    ],
+    'special_offer': [
+        'Акция!!!', 'акция', 'Special Offer', 'Промо', 'промо',
+        'Спецпредложение', 'спецпредложение', 'Акция', 'Новинка', 'новинка'
+    ],
+    'discount_percent': [
+        '% скидки', 'скидка', 'Discount', 'Скидка %', 'скидка %',
+        'Процент скидки', 'процент скидки', 'Дисконт', 'дисконт'
+    ],
+    'special_price': [
+        'Специальная цена!!!', 'специальная цена', 'Special Price',
+        'Акционная цена', 'акционная цена', 'Цена со скидкой', 'цена со скидкой',
+        'Промо цена', 'промо цена', 'Sale Price', 'sale price'
+    ],
+    'package': [
+        'Упаковка (сколько единиц товара в большой коробке/средней коробки/малой коробки)',
+        'упаковка', 'Package', 'Кратность', 'кратность', 'В упаковке', 'в упаковке',
+        'Количество в упаковке', 'количество в упаковке', 'Коробка', 'коробка'
+    ],
+    'barcode': [
+        'Штрих-код', 'штрих-код', 'Barcode', 'ШК', 'шк', 'EAN', 'ean',
+        'Штрихкод', 'штрихкод', 'Код EAN', 'код ean'
+    ],
+    'photo': [
+        'Фото', 'фото', 'Photo', 'Image', 'Изображение', 'изображение',
+        'Картинка', 'картинка', 'Фотография', 'фотография', 'URL фото', 'url фото'
+    ]
+}
+
+# Field names of the column mapping dialog that differ from product fields
+MAPPING_FIELD_NAMES = {
+    'recommendedPrice': 'recommended_price',
+    'dealerPrice': 'dealer_price',
+    'specialPrice': 'special_price',
+    'discount': 'discount_percent',
+    'promo': 'special_offer'
+}
+
+# Preview mode: data rows returned, and the most bytes decoded to find them
+PREVIEW_ROWS = 5
+PREVIEW_MAX_BYTES = 1024 * 1024
+
+# Aliases with their case-folded form, built once per instance instead of per header cell
+NORMALIZED_ALIASES: Dict[str, List[Tuple[str, str]]] = {
+    field: [(name, name.lower().strip()) for name in aliases]
+    for field, aliases in FIELD_ALIASES.items()
+}
+
+# Parser version and column mapping start every cache key, hashed once per instance
+CACHE_KEY_SEED = hashlib.sha256()
+CACHE_KEY_SEED.update(PARSER_VERSION.encode('utf-8'))
+CACHE_KEY_SEED.update(json.dumps(FIELD_ALIASES, ensure_ascii=False, sort_keys=True).encode('utf-8'))
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
@@ -21,7 +158,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'headers': {
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Methods': 'POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-User-Id, X-Auth-Token, X-Session-Id',
+                'Access-Control-Allow-Headers': 'Content-Type, Accept, X-User-Id, X-Auth-Token, X-Session-Id',
                 'Access-Control-Max-Age': '86400'
             },
             'body': '',
@@ -38,337 +175,1308 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     
     try:
         body_data = json.loads(event.get('body', '{}'))
-        file_data = body_data.get('fileData', '')
-        filename = body_data.get('filename', '')
-        
-        if not file_data:
-            return {
-                'statusCode': 400,
-                'headers': {'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'success': False, 'error': 'No file data provided'}),
-                'isBase64Encoded': False
-            }
+        media_type, content_encoding = negotiate(event.get('headers'))
+        profile = body_data.get('profile')
         
-        # Decode base64 file
-        try:
-            # Remove data URL prefix if present
-            if ',' in file_data:
-                file_data = file_data.split(',', 1)[1]
+        with instrumented() as timings:
+            if profile in PROFILE_MODES:
+                response, profile_report = run_profiled(
+                    profile, int(body_data.get('profileTop') or PROFILE_TOP),
+                    lambda: process_request(body_data, context, media_type)
+                )
+            else:
+                response, profile_report = process_request(body_data, context, media_type), None
             
-            file_bytes = base64.b64decode(file_data)
-        except Exception as e:
-            return {
-                'statusCode': 400,
-                'headers': {'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({
-                    'success': False, 
-                    'error': f'Ошибка декодирования файла: {str(e)}'
-                }),
-                'isBase64Encoded': False
-            }
+            # Opt-in: stage timings (and the profile) in debug_info of the response
+            if body_data.get('timings') or profile_report is not None:
+                response = attach_debug_info(response, timings=timings.report(), profile=profile_report)
+            with stage('compress'):
+                response = encode_response(response, content_encoding)
+            count('response_bytes', len(response['body']))
+        log_timings(timings.report(), context)
+        return response
         
-        # Try different encodings
-        content = None
-        for encoding in ['utf-8', 'cp1251', 'windows-1251', 'utf-16']:
-            try:
-                content = file_bytes.decode(encoding)
-                break
-            except UnicodeDecodeError:
-                continue
+    except Exception as e:
+        return {
+            'statusCode': 500,
+            'headers': {'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({
+                'success': False,
+                'error': f'Внутренняя ошибка сервера: {str(e)}',
+                'request_id': context.request_id
+            }, ensure_ascii=False),
+            'isBase64Encoded': False
+        }
+
+def process_request(body_data: Dict[str, Any], context: Any, media_type: str) -> Dict[str, Any]:
+    """Parse the uploaded file, or serve it from the cache, into an uncompressed response"""
+    # Chunked upload protocol: init, append, status, finalize
+    if body_data.get('uploadAction'):
+        return handle_upload_action(body_data, context, media_type)
+    
+    # Job mode: submit returns at once, status reports progress and result pages
+    if body_data.get('jobAction'):
+        return handle_job_action(body_data)
+    
+    # Batch mode: several supplier files merged into one catalog
+    if body_data.get('files') is not None:
+        return handle_batch(body_data, context, media_type)
+    
+    file_data = body_data.get('fileData', '')
+    filename = body_data.get('filename', '')
+    
+    if not file_data:
+        return {
+            'statusCode': 400,
+            'headers': {'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'success': False, 'error': 'No file data provided'}),
+            'isBase64Encoded': False
+        }
+    
+    # Skip data URL prefix if present without copying the payload
+    offset = file_data.find(',') + 1
+    if body_data.get('preview'):
+        # Only the start is decoded, so only the start is cleaned up, cut at a whole base64 quantum
+        file_data = NON_BASE64_RE.sub('', file_data[offset:offset + PREVIEW_MAX_BYTES * 2])
+        file_data = file_data[:len(file_data) - len(file_data) % 4]
+        offset = 0
+    if NON_BASE64_RE.search(file_data, offset):
+        file_data = NON_BASE64_RE.sub('', file_data[offset:])
+        offset = 0
+    count('input_bytes', (len(file_data) - offset) * 3 // 4)
+    
+    try:
+        # Column bindings confirmed by the admin replace alias matching
+        column_mapping = normalize_column_mapping(body_data.get('columnMapping'))
+        integrity_options = integrity_request_options(body_data)
+        if body_data.get('preview'):
+            with stage('preview'):
+                return preview_response(preview_catalog(file_data, offset), filename)
         
-        if not content:
-            content = file_bytes.decode('utf-8', errors='ignore')
+        # Same file with the same parser setup gives the same result
+        with stage('cache_key'):
+            cache_key = compute_cache_key(Base64Reader(file_data, offset), column_mapping, integrity_options)
+        parsed = None if body_data.get('bypassCache') else PARSE_CACHE.get(cache_key)
+        cache_hit = parsed is not None
         
-        # Detect delimiter (tab or comma)
-        delimiter = '\t' if '\t' in content else ','
+        if parsed is None:
+            workers = int(body_data.get('parallelWorkers') or PARSE_WORKERS)
+            if integrity_options:
+                # Ids and dropped rows depend on every earlier row, only the serial parse sees them in order
+                workers = 0
+            parsed = decode_and_parse(file_data, offset, workers, column_mapping=column_mapping,
+                                      integrity_options=integrity_options)
+            PARSE_CACHE.set(cache_key, parsed)
+    except binascii.Error as e:
+        return {
+            'statusCode': 400,
+            'headers': {'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({
+                'success': False, 
+                'error': f'Ошибка декодирования файла: {str(e)}'
+            }),
+            'isBase64Encoded': False
+        }
+    except CatalogParseError as e:
+        return parse_error_response(e)
+    except ValueError as e:
+        return {
+            'statusCode': 400,
+            'headers': {'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'success': False, 'error': str(e)}, ensure_ascii=False),
+            'isBase64Encoded': False
+        }
+    
+    with stage('render'):
+        return catalog_response(parsed, body_data, filename, context, cache_key, cache_hit, media_type)
+
+def catalog_response(parsed: Dict[str, Any], body_data: Dict[str, Any], filename: str,
+                     context: Any, cache_key: Optional[str], cache_hit: bool, media_type: str,
+                     extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Render parsed catalog as full or delta response, products in the negotiated media type"""
+    total_products = parsed['total_products']
+    categories_list = parsed['categories']
+    result = {
+        'categories': categories_list,
+        'total_products': total_products,
+        'filename': filename,
+        'processed_at': context.request_id,
+        'message': f'Обработано {total_products} товаров из {len(categories_list)} категорий',
+        'debug_info': parsed['debug_info'],
+        'cache': dict(PARSE_CACHE.stats(), hit=cache_hit, key=cache_key)
+    }
+    result.update(extra or {})
+    
+    # Persist mode: products go to the catalog store, the response only summarizes the load
+    if body_data.get('persist'):
+        # sqlite3 is imported with the first persist request, not on cold start
+        from catalog_store import StoreUnavailable, default_catalog_store
         
-        # Parse CSV/TSV
         try:
-            csv_reader = csv.DictReader(StringIO(content), delimiter=delimiter)
-            rows = list(csv_reader)
-            
-            # Get column names for debugging
-            column_names = list(csv_reader.fieldnames) if csv_reader.fieldnames else []
-            
-        except Exception as e:
-            # Include first few lines of content for debugging
-            preview = content[:500] if len(content) > 500 else content
+            store = default_catalog_store()
+        except StoreUnavailable as e:
             return {
-                'statusCode': 400,
+                'statusCode': e.status_code,
                 'headers': {'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({
-                    'success': False,
-                    'error': f'Ошибка парсинга файла: {str(e)}',
-                    'debug_info': {
-                        'delimiter': delimiter,
-                        'content_preview': preview,
-                        'content_length': len(content)
-                    }
-                }, ensure_ascii=False),
+                'body': json.dumps({'success': False, 'error': str(e)}, ensure_ascii=False),
                 'isBase64Encoded': False
             }
+        with stage('persist'):
+            result['stored'] = store.upsert(iter_products_json(parsed['products_json']))
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Content-Type': 'application/json',
+                'Access-Control-Allow-Origin': '*'
+            },
+            'body': JSON_ENCODER.encode(dict({'success': True}, **result)),
+            'isBase64Encoded': False
+        }
+    
+    # Delta mode: send only what changed since the catalog the client has
+    previous_fingerprint = body_data.get('previousFingerprint')
+    if body_data.get('delta') or previous_fingerprint:
+        delta = build_delta(parsed['products_json'], previous_fingerprint, SNAPSHOTS)
+        result['fingerprint'] = delta.pop('fingerprint')
+        result['delta'] = delta
         
-        if not rows:
+        if delta['base_found']:
             return {
-                'statusCode': 400,
-                'headers': {'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({
-                    'success': False,
-                    'error': 'Файл пустой или не содержит данных',
-                    'debug_info': {
-                        'column_names': column_names,
-                        'rows_count': len(rows),
-                        'delimiter': delimiter
-                    }
-                }, ensure_ascii=False),
+                'statusCode': 200,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': JSON_ENCODER.encode(dict({'success': True}, **result)),
                 'isBase64Encoded': False
             }
+    
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Content-Type': media_type,
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': catalog_body(parsed['products_json'], result, media_type),
+        'isBase64Encoded': False
+    }
+
+def handle_batch(body_data: Dict[str, Any], context: Any, media_type: str) -> Dict[str, Any]:
+    """Parse several files, cache misses side by side in the process pool, into one catalog"""
+    files = body_data.get('files')
+    if not isinstance(files, list) or not files or len(files) > BATCH_MAX_FILES:
+        return {
+            'statusCode': 400,
+            'headers': {'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({
+                'success': False,
+                'error': f'Ожидается список files от 1 до {BATCH_MAX_FILES} файлов'
+            }, ensure_ascii=False),
+            'isBase64Encoded': False
+        }
+    
+    parts = []
+    misses = []
+    for index, file in enumerate(files):
+        file = file if isinstance(file, dict) else {}
+        file_data = file.get('fileData') or ''
+        part = {'filename': file.get('filename') or f'file_{index + 1}', 'parsed': None, 'cache_hit': False,
+                'error': 'No file data provided', 'debug_info': None}
+        parts.append(part)
+        if not file_data:
+            continue
         
-        # Process products
-        products = []
-        categories = set()
+        offset = file_data.find(',') + 1
+        if NON_BASE64_RE.search(file_data, offset):
+            file_data = NON_BASE64_RE.sub('', file_data[offset:])
+            offset = 0
+        count('input_bytes', (len(file_data) - offset) * 3 // 4)
+        # Per-file options, the batch-level ones apply to files without their own
+        options = {key: file.get(key, body_data.get(key)) for key in ('columnMapping', 'stableIds', 'dropDuplicates')}
+        try:
+            column_mapping = normalize_column_mapping(options['columnMapping'])
+            integrity_options = integrity_request_options(options)
+            with stage('cache_key'):
+                part['cache_key'] = compute_cache_key(Base64Reader(file_data, offset), column_mapping,
+                                                      integrity_options)
+        except binascii.Error as e:
+            part['error'] = f'Ошибка декодирования файла: {str(e)}'
+            continue
+        except ValueError as e:
+            part['error'] = str(e)
+            continue
         
-        for idx, row in enumerate(rows):
-            if not row or not any(row.values()):
-                continue
-                
-            # Get values with very flexible column matching
-            article = get_column_value(row, [
-                'Артикул', 'артикул', 'Article', 'Код', 'код', 'ID', 'id', 'SKU', 'sku',
-                'Арт', 'арт', 'Артикул товара', 'Код товара'
-            ])
-            
-            brand = get_column_value(row, [
-                'Бренд', 'бренд', 'Brand', 'Производитель', 'производитель', 'Марка', 'марка',
-                'Торговая марка', 'торговая марка', 'Изготовитель', 'изготовитель'
-            ])
+        part['parsed'] = None if body_data.get('bypassCache') else PARSE_CACHE.get(part['cache_key'])
+        part['cache_hit'] = part['parsed'] is not None
+        if part['parsed'] is None:
+            misses.append((part, (file_data, offset, column_mapping, integrity_options)))
+    
+    # Files go to the pool only when asked for and big enough to repay the worker start-up
+    workers = min(int(body_data.get('parallelWorkers') or BATCH_WORKERS), len(misses))
+    if sum(len(payload[0]) - payload[1] for _, payload in misses) * 3 // 4 < BATCH_PARALLEL_MIN_BYTES:
+        workers = 0
+    with stage('parse'):
+        results = parse_batch_files([payload for _, payload in misses], workers)
+    for (part, _), result in zip(misses, results):
+        part.update(result)
+        if part['parsed'] is not None:
+            PARSE_CACHE.set(part['cache_key'], part['parsed'])
+    
+    with stage('merge'):
+        merged = merge_catalogs(parts)
+    if not any(part['parsed'] is not None for part in parts):
+        return {
+            'statusCode': 400,
+            'headers': {'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({
+                'success': False,
+                'error': 'Не удалось обработать ни один файл',
+                'files': merged['files']
+            }, ensure_ascii=False),
+            'isBase64Encoded': False
+        }
+    
+    parsed = {
+        'products_json': merged['products_json'],
+        'categories': merged['categories'],
+        'total_products': merged['total_products'],
+        'debug_info': {'duplicates': merged['duplicates']}
+    }
+    filename = ', '.join(part['filename'] for part in parts)
+    with stage('render'):
+        return catalog_response(parsed, body_data, filename, context, None, not misses, media_type,
+                                {'files': merged['files']})
+
+# Base64 text, data offset, column mapping and id options of one batch file
+BatchPayload = Tuple[str, int, Optional[Dict[str, str]], Optional[Dict[str, bool]]]
+
+def parse_batch_files(payloads: List[BatchPayload], workers: int) -> List[Dict[str, Any]]:
+    """parse_batch_file over every payload, in a process pool when there is more than one"""
+    from concurrent.futures.process import BrokenProcessPool
+    
+    if workers > 1:
+        try:
+            return list(get_parse_pool(workers).map(parse_batch_file, *zip(*payloads)))
+        except (OSError, NotImplementedError, BrokenProcessPool):
+            # No usable process pool on this instance, parse the files one by one
+            PARSE_POOLS.pop(workers, None)
+    return [parse_batch_file(*payload) for payload in payloads]
+
+def parse_batch_file(file_data: str, offset: int, column_mapping: Optional[Dict[str, str]] = None,
+                     integrity_options: Optional[Dict[str, bool]] = None) -> Dict[str, Any]:
+    """Parse one file of a batch, errors returned as values so they cross process boundaries"""
+    try:
+        return {'parsed': decode_and_parse(file_data, offset, column_mapping=column_mapping,
+                                           integrity_options=integrity_options)}
+    except binascii.Error as e:
+        return {'error': f'Ошибка декодирования файла: {str(e)}', 'debug_info': None}
+    except CatalogParseError as e:
+        return {'error': str(e), 'debug_info': e.debug_info}
+
+def preview_response(preview: Dict[str, Any], filename: str) -> Dict[str, Any]:
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': JSON_ENCODER.encode(dict({'success': True, 'preview': True, 'filename': filename}, **preview)),
+        'isBase64Encoded': False
+    }
+
+def parse_error_response(error: 'CatalogParseError') -> Dict[str, Any]:
+    return {
+        'statusCode': 400,
+        'headers': {'Access-Control-Allow-Origin': '*'},
+        'body': json.dumps({
+            'success': False,
+            'error': str(error),
+            'debug_info': error.debug_info
+        }, ensure_ascii=False),
+        'isBase64Encoded': False
+    }
+
+def handle_upload_action(body_data: Dict[str, Any], context: Any, media_type: str) -> Dict[str, Any]:
+    """Stage a large file chunk by chunk, parsing rows as the chunks arrive"""
+    action = body_data.get('uploadAction')
+    # Rows parsed for abandoned uploads leave memory on the TTL of their staged files
+    for upload_id in [upload_id for upload_id in UPLOAD_SESSIONS if UPLOADS.is_expired(upload_id)]:
+        del UPLOAD_SESSIONS[upload_id]
+    
+    try:
+        if action == 'init':
+            total_chunks = body_data.get('totalChunks')
+            if total_chunks is not None and not (type(total_chunks) is int and total_chunks > 0):
+                raise UploadError('Число фрагментов должно быть положительным целым')
+            try:
+                column_mapping = normalize_column_mapping(body_data.get('columnMapping'))
+            except ValueError as e:
+                raise UploadError(str(e))
+            meta = UPLOADS.create(body_data.get('filename', ''), total_chunks, column_mapping,
+                                  integrity_request_options(body_data))
+            UPLOAD_SESSIONS[meta['upload_id']] = UploadSession(meta)
+            return upload_response(meta)
+        
+        meta = UPLOADS.load(body_data.get('uploadId', ''))
+        upload_id = meta['upload_id']
+        
+        if action == 'status':
+            return upload_response(meta)
+        
+        if action == 'append':
+            chunk_index = body_data.get('chunkIndex')
+            chunk_data = body_data.get('chunkData', '')
+            if type(chunk_index) is not int or chunk_index < 0:
+                raise UploadError('Номер фрагмента должен быть неотрицательным целым', 400, {'nextChunk': meta['next_chunk']})
+            if not isinstance(chunk_data, str):
+                raise UploadError('Фрагмент должен быть строкой base64')
+            try:
+                chunk_bytes = binascii.a2b_base64(NON_BASE64_RE.sub('', chunk_data[chunk_data.find(',') + 1:]))
+            except (binascii.Error, ValueError) as e:
+                raise UploadError(f'Ошибка декодирования фрагмента: {str(e)}')
             
-            name = get_column_value(row, [
-                'Наименование', 'наименование', 'Name', 'Название', 'название', 'Товар', 'товар',
-                'Описание', 'описание', 'Наименование товара', 'название товара'
-            ])
+            checksum = hashlib.sha256(chunk_bytes).hexdigest()
+            expected_checksum = body_data.get('chunkChecksum')
+            if expected_checksum is not None and not isinstance(expected_checksum, str):
+                raise UploadError('Контрольная сумма фрагмента должна быть строкой')
+            if expected_checksum and expected_checksum.lower() != checksum:
+                raise UploadError('Контрольная сумма фрагмента не совпадает', 400, {'nextChunk': meta['next_chunk']})
             
-            unit = get_column_value(row, [
-                'Ед.', 'Ед. (единицы измерения)', 'единицы измерения', 'Unit', 'Ед.изм',
-                'Единица', 'единица', 'Упаковка', 'упаковка', 'шт', 'Шт', 'уп', 'Уп'
-            ])
-            # Price columns with very flexible matching
-            recommended_price = parse_price(get_column_value(row, [
-                'Цена (Рекомендуемая)', 'рекомендуемая цена', 'Recommended Price',
-                'Розничная цена', 'розничная цена', 'Цена розница', 'цена розница',
-                'РРЦ', 'ррц', 'Цена', 'цена', 'Price', 'price'
-            ]))
+            # Retried chunk that was already stored is acknowledged again
+            if chunk_index < meta['next_chunk']:
+                if meta['checksums'][chunk_index] != checksum:
+                    raise UploadError('Фрагмент уже принят с другим содержимым', 409, {'nextChunk': meta['next_chunk']})
+                return upload_response(meta)
             
-            dealer_price = parse_price(get_column_value(row, [
-                'Цена дилер (по которой идет рассчет)', 'цена дилер', 'Dealer Price',
-                'Оптовая цена', 'оптовая цена', 'Цена опт', 'цена опт',
-                'Базовая цена', 'базовая цена', 'Себестоимость', 'себестоимость'
-            ]))
+            if chunk_index != meta['next_chunk']:
+                raise UploadError('Ожидается другой номер фрагмента', 409, {'nextChunk': meta['next_chunk']})
             
-            special_offer = get_column_value(row, [
-                'Акция!!!', 'акция', 'Special Offer', 'Промо', 'промо',
-                'Спецпредложение', 'спецпредложение', 'Акция', 'Новинка', 'новинка'
-            ])
+            meta = UPLOADS.append(meta, chunk_bytes, checksum)
+            session = UPLOAD_SESSIONS.get(upload_id)
+            if session is not None and session.next_chunk == chunk_index:
+                session.feed(chunk_bytes)
+            else:
+                # Session lost (cold start) or out of sync, finalize replays staged bytes
+                UPLOAD_SESSIONS.pop(upload_id, None)
+            return upload_response(meta)
+        
+        if action == 'finalize':
+            if meta['total_chunks'] is not None and meta['next_chunk'] != meta['total_chunks']:
+                raise UploadError('Загружены не все фрагменты', 409, {'nextChunk': meta['next_chunk']})
             
-            discount_percent = get_column_value(row, [
-                '% скидки', 'скидка', 'Discount', 'Скидка %', 'скидка %',
-                'Процент скидки', 'процент скидки', 'Дисконт', 'дисконт'
-            ])
+            session = UPLOAD_SESSIONS.pop(upload_id, None)
+            if session is None or session.next_chunk != meta['next_chunk']:
+                session = UploadSession(meta)
+                session.replay()
             
-            special_price = parse_price(get_column_value(row, [
-                'Специальная цена!!!', 'специальная цена', 'Special Price',
-                'Акционная цена', 'акционная цена', 'Цена со скидкой', 'цена со скидкой',
-                'Промо цена', 'промо цена', 'Sale Price', 'sale price'
-            ]))
+            try:
+                parsed = session.finish()
+            except CatalogParseError as e:
+                UPLOADS.remove(upload_id)
+                return parse_error_response(e)
             
-            # Additional fields with flexible matching
-            package = get_column_value(row, [
-                'Упаковка (сколько единиц товара в большой коробке/средней коробки/малой коробки)',
-                'упаковка', 'Package', 'Кратность', 'кратность', 'В упаковке', 'в упаковке',
-                'Количество в упаковке', 'количество в упаковке', 'Коробка', 'коробка'
-            ])
+            with UPLOADS.open_data(upload_id) as data:
+                cache_key = compute_cache_key(data, session.column_mapping, session.integrity_options)
+            PARSE_CACHE.set(cache_key, parsed)
+            UPLOADS.remove(upload_id)
             
-            barcode = get_column_value(row, [
-                'Штрих-код', 'штрих-код', 'Barcode', 'ШК', 'шк', 'EAN', 'ean',
-                'Штрихкод', 'штрихкод', 'Код EAN', 'код ean'
-            ])
+            filename = body_data.get('filename') or meta['filename']
+            return catalog_response(parsed, body_data, filename, context, cache_key, False, media_type)
+        
+        raise UploadError(f'Неизвестное действие загрузки: {action}')
+    except UploadError as e:
+        return {
+            'statusCode': e.status_code,
+            'headers': {'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps(dict({'success': False, 'error': str(e)}, **e.details), ensure_ascii=False),
+            'isBase64Encoded': False
+        }
+
+def upload_response(meta: Dict[str, Any]) -> Dict[str, Any]:
+    session = UPLOAD_SESSIONS.get(meta['upload_id'])
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': json.dumps({
+            'success': True,
+            'uploadId': meta['upload_id'],
+            'nextChunk': meta['next_chunk'],
+            'lastAcknowledgedChunk': meta['next_chunk'] - 1,
+            'bytesReceived': meta['bytes_received'],
+            'rowsParsed': session.rows_parsed if session is not None else None
+        }),
+        'isBase64Encoded': False
+    }
+
+def handle_job_action(body_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Start a background import of the uploaded file, or report how far one has got"""
+    action = body_data.get('jobAction')
+    
+    try:
+        if action == 'submit':
+            file_data = body_data.get('fileData', '')
+            if not file_data:
+                raise JobError('No file data provided')
+            offset = file_data.find(',') + 1
+            if NON_BASE64_RE.search(file_data, offset):
+                file_data = NON_BASE64_RE.sub('', file_data[offset:])
+                offset = 0
             
-            photo = get_column_value(row, [
-                'Фото', 'фото', 'Photo', 'Image', 'Изображение', 'изображение',
-                'Картинка', 'картинка', 'Фотография', 'фотография', 'URL фото', 'url фото'
-            ])
+            # Same parser setup as a direct upload, checked before the job is accepted
+            try:
+                column_mapping = normalize_column_mapping(body_data.get('columnMapping'))
+            except ValueError as e:
+                raise JobError(str(e))
+            integrity_options = integrity_request_options(body_data)
             
-            if not name:
+            meta = JOBS.create(body_data.get('filename', ''), (len(file_data) - offset) * 3 // 4)
+            get_job_executor().submit(run_import_job, meta['job_id'], file_data, offset,
+                                      bool(body_data.get('bypassCache')), column_mapping, integrity_options)
+            return job_response(meta, 202)
+        
+        if action == 'status':
+            meta = JOBS.load(body_data.get('jobId', ''))
+            page = body_data.get('page')
+            if page is None:
+                return job_response(meta)
+            if not isinstance(page, int) or page < 0:
+                raise JobError('Номер страницы должен быть целым числом от 0')
+            products = JOBS.read_page(meta['job_id'], page) if page < meta['pages_ready'] else None
+            return job_response(meta, page=page, products=products)
+        
+        raise JobError(f'Неизвестное действие задания: {action}')
+    except JobError as e:
+        return {
+            'statusCode': e.status_code,
+            'headers': {'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'success': False, 'error': str(e)}, ensure_ascii=False),
+            'isBase64Encoded': False
+        }
+
+def job_response(meta: Dict[str, Any], status_code: int = 200, page: Optional[int] = None,
+                 products: Optional[str] = None) -> Dict[str, Any]:
+    """Job state and progress, with the requested page of products once it is written"""
+    state = meta['state']
+    error = meta['error']
+    if JOBS.is_lost(meta):
+        state, error = 'failed', 'Задание прервано: экземпляр функции остановлен, отправьте файл заново'
+    
+    result = dict({
+        'success': True,
+        'jobId': meta['job_id'],
+        'status': state,
+        'filename': meta['filename'],
+        'rowsProcessed': meta['rows_processed'],
+        'productsReady': meta['products_ready'],
+        'pagesReady': meta['pages_ready'],
+        'pageSize': JOBS.page_size,
+        'bytesProcessed': meta['bytes_processed'],
+        'totalBytes': meta['total_bytes'],
+        'error': error
+    }, **job_progress(meta))
+    # Finished job: categories, totals and debug_info of the whole catalog
+    result.update(meta['result'] or {})
+    
+    body = JSON_ENCODER.encode(result)
+    if page is not None:
+        # Written pages are JSON arrays already, spliced in without decoding
+        body = ''.join([body[:-1], ', "page": ', str(page), ', "products": ', products or 'null', '}'])
+    return {
+        'statusCode': status_code,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': body,
+        'isBase64Encoded': False
+    }
+
+def get_job_executor() -> 'ThreadPoolExecutor':
+    """Threads of background jobs, started with the first job of the instance"""
+    global JOB_EXECUTOR
+    if JOB_EXECUTOR is None:
+        from concurrent.futures import ThreadPoolExecutor
+        JOB_EXECUTOR = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix='import-job')
+    return JOB_EXECUTOR
+
+def run_import_job(job_id: str, file_data: str, offset: int, bypass_cache: bool,
+                   column_mapping: Optional[Dict[str, str]] = None,
+                   integrity_options: Optional[Dict[str, bool]] = None) -> None:
+    """Parse a submitted file, writing result pages and progress as batches are priced"""
+    meta = JOBS.load(job_id)
+    meta['state'] = 'running'
+    meta['started_at'] = time.time()
+    JOBS.save(meta)
+    
+    pages = JobPages(JOBS, job_id)
+    current: List[Optional[CatalogBuilder]] = [None]
+    
+    def on_flush(builder: CatalogBuilder, products: List[str]) -> None:
+        nonlocal pages
+        if builder is not current[0]:
+            # Decoding restarted with another encoding, pages are written again from the start
+            current[0] = builder
+            pages = JobPages(JOBS, job_id)
+        pages.add(products)
+        meta['rows_processed'] = builder.stats['rows_count']
+        meta['bytes_processed'] = builder.reader.consumed * 3 // 4 if builder.reader is not None else 0
+        meta['products_ready'] = pages.pages * JOBS.page_size
+        meta['pages_ready'] = pages.pages
+        JOBS.save(meta)
+    
+    try:
+        cache_key = compute_cache_key(Base64Reader(file_data, offset), column_mapping, integrity_options)
+        parsed = None if bypass_cache else PARSE_CACHE.get(cache_key)
+        if parsed is None:
+            parsed = decode_and_parse(file_data, offset, on_flush=on_flush, column_mapping=column_mapping,
+                                      integrity_options=integrity_options)
+            PARSE_CACHE.set(cache_key, parsed)
+        else:
+            pages.add([JSON_ENCODER.encode(product) for product in iter_products_json(parsed['products_json'])])
+        pages.close()
+        
+        total_products = parsed['total_products']
+        meta.update(
+            state='done',
+            rows_processed=parsed['debug_info']['rows_count'],
+            bytes_processed=meta['total_bytes'],
+            products_ready=pages.products,
+            pages_ready=pages.pages,
+            result={
+                'categories': parsed['categories'],
+                'total_products': total_products,
+                'message': f'Обработано {total_products} товаров из {len(parsed["categories"])} категорий',
+                'debug_info': parsed['debug_info']
+            }
+        )
+    except binascii.Error as e:
+        meta.update(state='failed', error=f'Ошибка декодирования файла: {str(e)}')
+    except CatalogParseError as e:
+        meta.update(state='failed', error=str(e), result={'debug_info': e.debug_info})
+    except Exception as e:
+        meta.update(state='failed', error=f'Внутренняя ошибка сервера: {str(e)}')
+    JOBS.save(meta)
+
+class CatalogParseError(Exception):
+    """Uploaded file can not be turned into a catalog, reported as HTTP 400"""
+    
+    def __init__(self, message: str, debug_info: Dict[str, Any]):
+        super().__init__(message)
+        self.debug_info = debug_info
+
+def compute_cache_key(stream: BinaryIO, column_mapping: Optional[Dict[str, str]] = None,
+                      integrity_options: Optional[Dict[str, bool]] = None) -> str:
+    """Hash decoded file bytes together with parser version, column mapping and id options"""
+    digest = CACHE_KEY_SEED.copy()
+    if column_mapping is not None:
+        digest.update(json.dumps(column_mapping, ensure_ascii=False, sort_keys=True).encode('utf-8'))
+    if integrity_options:
+        digest.update(json.dumps(integrity_options, sort_keys=True).encode('utf-8'))
+    for chunk in iter(lambda: stream.read(DECODE_CHUNK_SIZE), b''):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+def decode_and_parse(file_data: str, offset: int, workers: int = 0, on_flush: Optional['FlushCallback'] = None,
+                     column_mapping: Optional[Dict[str, str]] = None,
+                     integrity_options: Optional[Dict[str, bool]] = None) -> Dict[str, Any]:
+    """Decode once with the encoding detected from the file start
+    
+    The stream is restarted with a fallback encoding only if decoding
+    fails further into the file than the detection sample reached.
+    """
+    with stage('detect_encoding'):
+        sample = io.BufferedReader(Base64Reader(file_data, offset), DECODE_CHUNK_SIZE).read(ENCODING_SAMPLE_SIZE)
+        detection = detect_encoding(sample)
+    
+    candidates = candidate_encodings(detection['encoding'])
+    for attempt, (encoding, errors) in enumerate(candidates, 1):
+        try:
+            with stage('parse'):
+                parsed = parse_catalog(file_data, offset, encoding, errors, workers, on_flush, column_mapping,
+                                       integrity_options)
+        except UnicodeDecodeError:
+            if attempt < len(candidates):
+                continue
+            raise
+        parsed['debug_info']['encoding'] = encoding_report(detection, encoding, errors, attempt)
+        return parsed
+
+def parse_catalog(file_data: str, offset: int, encoding: str, errors: str, workers: int = 0,
+                  on_flush: Optional['FlushCallback'] = None,
+                  column_mapping: Optional[Dict[str, str]] = None,
+                  integrity_options: Optional[Dict[str, bool]] = None) -> Dict[str, Any]:
+    """Run the streaming pipeline: base64 -> text -> rows -> products -> JSON
+    
+    on_flush is only called by the serial parse, the parallel one merges
+    whole batches at the end.
+    """
+    text_stream = open_text_stream(file_data, offset, encoding, errors)
+    if workers > 0:
+        return parse_catalog_parallel(text_stream, workers, column_mapping)
+    
+    started = time.perf_counter()
+    builder = CatalogBuilder(text_stream.read(SNIFF_SIZE), on_flush, column_mapping,
+                             IntegrityIndex(**(integrity_options or {})))
+    builder.reader = text_stream.buffer.raw
+    
+    # Parse CSV/TSV
+    csv_reader = csv.reader(iter_lines(builder.head, text_stream, builder.stats), delimiter=builder.delimiter)
+    try:
+        builder.add_rows(csv_reader)
+    except csv.Error as e:
+        raise builder.parse_error(e)
+    
+    # Text decoding and CSV tokenizing run interleaved with mapping, they get the rest
+    base64_seconds = text_stream.buffer.raw.decode_seconds
+    builder.stage_seconds['base64_decode'] = base64_seconds
+    builder.stage_seconds['text_csv'] = time.perf_counter() - started - sum(builder.stage_seconds.values())
+    return builder.finish()
+
+def parse_catalog_parallel(text_stream: io.TextIOWrapper, workers: int,
+                           column_mapping: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Map record batches to products in a process pool, merging them in file order"""
+    from concurrent.futures.process import BrokenProcessPool
+    
+    text = text_stream.read()
+    builder = CatalogBuilder(text[:SNIFF_SIZE], column_mapping=column_mapping)
+    builder.stats['content_length'] = len(text)
+    builder.stage_seconds['base64_decode'] = text_stream.buffer.raw.decode_seconds
+    try:
+        builder.column_names, batches = split_record_batches(
+            text, builder.delimiter, max(PARALLEL_BATCH_SIZE, len(text) // (workers * 4))
+        )
+        if builder.column_names is not None:
+            builder.column_plan = builder.plan_columns(builder.column_names)
+        
+        jobs = (
+            [text[start:end] for start, end, _, _ in batches],
+            itertools.repeat(builder.delimiter),
+            itertools.repeat(builder.column_plan),
+            [first_idx for _, _, first_idx, _ in batches],
+            [first_line for _, _, _, first_line in batches]
+        )
+        try:
+            results = list(get_parse_pool(workers).map(map_record_batch, *jobs))
+        except (OSError, NotImplementedError, BrokenProcessPool):
+            # No usable process pool on this instance, map the same batches in-process
+            PARSE_POOLS.pop(workers, None)
+            workers = 0
+            results = list(map(map_record_batch, *jobs))
+    except csv.Error as e:
+        raise builder.parse_error(e)
+    
+    for batch in results:
+        builder.merge(batch)
+    
+    parsed = builder.finish()
+    parsed['debug_info']['parallel'] = {'workers': workers, 'batches': len(batches)}
+    return parsed
+
+def get_parse_pool(workers: int) -> 'ProcessPoolExecutor':
+    """Process pool reused across invocations while the instance is warm"""
+    pool = PARSE_POOLS.get(workers)
+    if pool is None:
+        from concurrent.futures import ProcessPoolExecutor
+        pool = PARSE_POOLS[workers] = ProcessPoolExecutor(max_workers=workers)
+    return pool
+
+def split_record_batches(text: str, delimiter: str,
+                         batch_size: int) -> Tuple[Optional[List[str]], List[Tuple[int, int, int, int]]]:
+    """Read the header and cut the remaining records into (start, end, first_idx, first_line) batches
+    
+    Batches end only between records, so a quoted field with line breaks
+    never straddles two workers. first_idx counts non-blank rows before the
+    batch, which keeps item ids the same as in the serial parse, first_line
+    the file lines before it, which keeps reported rows the same.
+    """
+    lines = io.StringIO(text, newline='')
+    position = 0
+    lines_read = 0
+    
+    def pull() -> Iterator[str]:
+        nonlocal position, lines_read
+        for line in lines:
+            position += len(line)
+            lines_read += 1
+            yield line
+    
+    source = pull()
+    header: Optional[List[str]] = None
+    batches: List[Tuple[int, int, int, int]] = []
+    start = 0
+    first_idx = 0
+    first_line = 0
+    idx = 0
+    for line in source:
+        if '"' in line:
+            # A quoted field may continue on the next lines, let csv find the record end
+            row = next(csv.reader(itertools.chain([line], source), delimiter=delimiter))
+        elif header is None:
+            row = next(csv.reader([line], delimiter=delimiter))
+        else:
+            row = [] if line in ('\n', '\r\n', '\r') else None
+        
+        if header is None:
+            header = row
+            start = position
+            first_line = lines_read
+            continue
+        
+        if row != []:
+            idx += 1
+        if position - start >= batch_size:
+            batches.append((start, position, first_idx, first_line))
+            start = position
+            first_idx = idx
+            first_line = lines_read
+    
+    if position > start:
+        batches.append((start, position, first_idx, first_line))
+    return header, batches
+
+def map_record_batch(text: str, delimiter: str, column_plan: Dict[str, Tuple[Optional[int], Optional[str]]],
+                     first_idx: int, first_line: int) -> Dict[str, Any]:
+    """Worker side of the parallel mode: turn one batch of records into serialized products"""
+    builder = CatalogBuilder('')
+    builder.column_names = []
+    builder.column_plan = column_plan
+    # Duplicates can span batches, the parent checks the keys in file order
+    builder.integrity_keys = []
+    builder.stats['rows_count'] = first_idx
+    builder.lines_read = first_line
+    builder.add_rows(csv.reader(io.StringIO(text, newline=''), delimiter=delimiter))
+    return {
+        'products_json': ''.join(builder.product_parts),
+        'total_products': builder.total_products,
+        'categories': builder.categories,
+        'rows_count': builder.stats['rows_count'] - first_idx,
+        'first_row': builder.first_row,
+        'price_errors': builder.price_errors.report(),
+        'integrity_keys': builder.integrity_keys,
+        'stage_seconds': builder.stage_seconds
+    }
+
+class CatalogBuilder:
+    """Maps parsed CSV rows to serialized products, header row first"""
+    
+    def __init__(self, head: str, on_flush: Optional['FlushCallback'] = None,
+                 column_mapping: Optional[Dict[str, str]] = None, integrity: Optional[IntegrityIndex] = None):
+        self.head = head
+        # Detect delimiter (tab or comma) from the beginning of the file
+        self.delimiter = '\t' if '\t' in head else ','
+        self.stats = {'content_length': 0, 'rows_count': 0}
+        self.column_names: Optional[List[str]] = None
+        self.column_plan: Dict[str, Tuple[Optional[int], Optional[str]]] = {}
+        self.first_row: Optional[List[str]] = None
+        self.categories: Set[str] = set()
+        self.product_parts: List[str] = []
+        self.total_products = 0
+        # Rows waiting to be priced as one batch
+        self.pending: List[ProductRecord] = []
+        self.price_errors = PriceErrorLog()
+        # Seconds per parse stage, summed over batches and reported as parse.<stage>
+        self.stage_seconds = {
+            'column_plan': 0.0, 'map_rows': 0.0, 'integrity': 0.0, 'pricing': 0.0, 'serialize': 0.0
+        }
+        # Called with the products of every priced batch, and the stream they come from
+        self.on_flush = on_flush
+        self.reader: Optional[Base64Reader] = None
+        # Product field -> header cell, used instead of the alias tables when given
+        self.column_mapping = column_mapping
+        # Duplicate and barcode checks, or (line, article, barcode) collected for them in a worker
+        self.integrity = integrity if integrity is not None else IntegrityIndex()
+        self.integrity_keys: Optional[List[Tuple[int, str, str]]] = None
+        # File lines consumed so far, records are reported by the line they start on
+        self.lines_read = 0
+    
+    def add_rows(self, rows: Iterable[List[str]], line_ends: Optional[List[int]] = None) -> None:
+        """Map rows in file order, read from a csv reader or given with the line each one ends on"""
+        clock = time.perf_counter
+        map_seconds = 0.0
+        first_line = self.lines_read
+        ends = iter(line_ends) if line_ends is not None else None
+        for row in rows:
+            line = self.lines_read + 1
+            self.lines_read = first_line + (next(ends) if ends is not None else rows.line_num)
+            if self.column_names is None:
+                self.column_names = row
+                # Match the header against the alias tables once
+                started = clock()
+                self.column_plan = self.plan_columns(row)
+                self.stage_seconds['column_plan'] += clock() - started
                 continue
             
-            # Determine pricing logic
-            has_special_pricing = bool(
-                (special_offer and special_offer.strip() and special_offer.strip() not in ['', 'Новинка!!!']) or
-                (discount_percent and discount_percent.strip()) or
-                special_price > 0
-            )
-            
-            # Calculate final price
-            if special_price > 0:
-                final_price = special_price
-                base_price = dealer_price or recommended_price
-            elif special_offer and special_offer.strip() and special_offer.strip() not in ['', 'Новинка!!!']:
-                final_price = parse_price(special_offer) or dealer_price or recommended_price
-                base_price = dealer_price or recommended_price
-            elif discount_percent and discount_percent.strip():
-                discount_val = parse_price(discount_percent)
-                if discount_val > 0:
-                    base = dealer_price or recommended_price
-                    if discount_val > 100:  # Assume it's a fixed price
-                        final_price = discount_val
-                    else:  # It's a percentage
-                        final_price = base * (1 - discount_val / 100)
-                    base_price = base
-                else:
-                    final_price = dealer_price or recommended_price
-                    base_price = final_price
-            else:
-                final_price = dealer_price or recommended_price
-                base_price = final_price
-            
-            # Category from brand or default
-            category = brand.strip() if brand and brand.strip() else 'Канцтовары'
-            categories.add(category)
+            # Skip blank lines the same way csv.DictReader does
+            if row == []:
+                continue
             
-            product = {
-                'id': f"item_{idx}",
-                'name': name.strip(),
-                'article': article.strip() if article else '',
-                'brand': brand.strip() if brand else '',
-                'category': category,
-                'price': round(final_price, 2),
-                'basePrice': round(base_price, 2),
-                'recommendedPrice': round(recommended_price, 2),
-                'unit': unit.strip() if unit else '',
-                'package': package.strip() if package else '',
-                'barcode': barcode.strip() if barcode else '',
-                'image': process_image_path(photo),
-                'inStock': True,
-                'hasSpecialPricing': has_special_pricing,
-                'specialOffer': special_offer.strip() if special_offer else '',
-                'discountPercent': discount_percent.strip() if discount_percent else '',
-                'specialPrice': special_price if special_price > 0 else None,
-                'description': f"{brand} {name}".strip() if brand else name.strip()
-            }
+            idx = self.stats['rows_count']
+            self.stats['rows_count'] += 1
+            if self.first_row is None:
+                self.first_row = row
             
-            products.append(product)
-        
-        categories_list = sorted(list(categories))
+            started = clock()
+            record = read_record(idx, row, self.column_plan)
+            map_seconds += clock() - started
+            if record is not None:
+                record.line = line
+                self.pending.append(record)
+                if len(self.pending) >= PRICE_BATCH_SIZE:
+                    self.flush()
+        self.stage_seconds['map_rows'] += map_seconds
+        self.flush()
+    
+    def flush(self) -> None:
+        """Price pending rows together and serialize their products one by one"""
+        if not self.pending:
+            return
+        started = time.perf_counter()
+        records = self.check_integrity(self.pending)
+        checked = time.perf_counter()
+        price_records(records)
+        priced = time.perf_counter()
+        flushed = [] if self.on_flush is not None else None
+        for record in records:
+            self.categories.add(record.category)
+            self.price_errors.add(record)
+            if self.total_products:
+                self.product_parts.append(', ')
+            product_json = record.to_json()
+            self.product_parts.append(product_json)
+            if flushed is not None:
+                flushed.append(product_json)
+            self.total_products += 1
+        self.pending = []
+        self.stage_seconds['integrity'] += checked - started
+        self.stage_seconds['pricing'] += priced - checked
+        self.stage_seconds['serialize'] += time.perf_counter() - priced
+        if flushed is not None:
+            self.on_flush(self, flushed)
+    
+    def check_integrity(self, records: List[ProductRecord]) -> List[ProductRecord]:
+        """Index articles and barcodes of a batch, returns the records to keep"""
+        if self.integrity_keys is not None:
+            self.integrity_keys.extend((record.line, record.article, record.barcode) for record in records)
+            return records
+        check = self.integrity.check
+        kept = []
+        for record in records:
+            keep, record.product_id = check(record.line, record.article, record.barcode)
+            if keep:
+                kept.append(record)
+        return kept
+    
+    def merge(self, batch: Dict[str, Any]) -> None:
+        """Append products mapped from a batch of later rows"""
+        if batch['total_products']:
+            if self.total_products:
+                self.product_parts.append(', ')
+            self.product_parts.append(batch['products_json'])
+            self.total_products += batch['total_products']
+        self.categories.update(batch['categories'])
+        self.stats['rows_count'] += batch['rows_count']
+        self.price_errors.merge(batch['price_errors'])
+        started = time.perf_counter()
+        for line, article, barcode in batch['integrity_keys']:
+            self.integrity.check(line, article, barcode)
+        self.stage_seconds['integrity'] += time.perf_counter() - started
+        # Worker seconds add up across processes, more than the wall time of the pool
+        for name, seconds in batch['stage_seconds'].items():
+            self.stage_seconds[name] += seconds
+        if self.first_row is None:
+            self.first_row = batch['first_row']
+    
+    def plan_columns(self, column_names: List[str]) -> Dict[str, Tuple[Optional[int], Optional[str]]]:
+        if self.column_mapping is None:
+            return resolve_column_plan(column_names)
+        plan, missing = mapped_column_plan(column_names, self.column_mapping)
+        if missing:
+            raise CatalogParseError(f'Колонки не найдены в файле: {", ".join(missing)}', {
+                'column_names': column_names,
+                'missing_columns': missing,
+                'delimiter': self.delimiter
+            })
+        return plan
+    
+    def parse_error(self, error: Exception) -> CatalogParseError:
+        """Wrap malformed CSV error with a preview of the content"""
+        # Include first few lines of content for debugging
+        preview = self.head[:500] if len(self.head) > 500 else self.head
+        return CatalogParseError(f'Ошибка парсинга файла: {str(error)}', {
+            'delimiter': self.delimiter,
+            'content_preview': preview,
+            'content_length': self.stats['content_length']
+        })
+    
+    def finish(self) -> Dict[str, Any]:
+        column_names = self.column_names or []
+        for name, seconds in self.stage_seconds.items():
+            add_time(f'parse.{name}', seconds)
+        count('rows', self.stats['rows_count'])
+        count('products', self.total_products)
+        if self.first_row is None:
+            raise CatalogParseError('Файл пустой или не содержит данных', {
+                'column_names': column_names,
+                'rows_count': 0,
+                'delimiter': self.delimiter
+            })
         
         # Include debug info about found columns and mapping
         debug_info = {
             'column_names': column_names,
-            'delimiter': delimiter,
-            'content_length': len(content),
-            'rows_count': len(rows),
+            'delimiter': self.delimiter,
+            'content_length': self.stats['content_length'],
+            'rows_count': self.stats['rows_count'],
             'sample_mapping': {
                 'detected_columns': column_names[:10] if column_names else [],  # First 10 columns
-                'sample_row': dict(list(rows[0].items())[:5]) if rows else {}  # First 5 fields of first row
-            }
+                'sample_row': dict(list(zip(column_names, self.first_row))[:5])  # First 5 fields of first row
+            },
+            'column_plan': describe_column_plan(column_names, self.column_plan),
+            # Price cells that are not numbers, priced as 0
+            'price_errors': self.price_errors.report(),
+            # Repeated articles and barcodes, barcodes failing the EAN check
+            'integrity': self.integrity.report()
         }
         
-        result = {
-            'success': True,
-            'products': products,
-            'categories': categories_list,
-            'total_products': len(products),
-            'filename': filename,
-            'processed_at': context.request_id,
-            'message': f'Обработано {len(products)} товаров из {len(categories_list)} категорий',
+        products_json = ''.join(self.product_parts)
+        self.product_parts = []
+        return {
+            'products_json': products_json,
+            'categories': sorted(list(self.categories)),
+            'total_products': self.total_products,
             'debug_info': debug_info
         }
+
+# Receives the builder and the product JSON strings of one priced batch
+FlushCallback = Callable[[CatalogBuilder, List[str]], None]
+
+class IncrementalCatalogParser:
+    """Push-style counterpart of parse_catalog, fed with raw bytes as they arrive"""
+    
+    def __init__(self, encoding: str, errors: str, column_mapping: Optional[Dict[str, str]] = None,
+                 integrity_options: Optional[Dict[str, bool]] = None):
+        self.encoding = encoding
+        self.errors = errors
+        self.column_mapping = column_mapping
+        self.integrity_options = integrity_options
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors)
+        self._pending = ''
+        self.builder: Optional[CatalogBuilder] = None
+    
+    def feed(self, data: bytes, final: bool = False) -> None:
+        self._pending += self._decoder.decode(data, final)
         
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps(result, ensure_ascii=False),
-            'isBase64Encoded': False
-        }
+        # Wait for enough text to detect the delimiter
+        if self.builder is None:
+            if len(self._pending) < SNIFF_SIZE and not final:
+                return
+            self.builder = CatalogBuilder(self._pending[:SNIFF_SIZE], column_mapping=self.column_mapping,
+                                          integrity=IntegrityIndex(**(self.integrity_options or {})))
         
-    except Exception as e:
-        return {
-            'statusCode': 500,
-            'headers': {'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({
-                'success': False,
-                'error': f'Внутренняя ошибка сервера: {str(e)}',
-                'request_id': context.request_id
-            }, ensure_ascii=False),
-            'isBase64Encoded': False
-        }
+        try:
+            rows, consumed, line_ends = split_complete_records(self._pending, self.builder.delimiter, final)
+        except csv.Error as e:
+            raise self.builder.parse_error(e)
+        
+        self.builder.stats['content_length'] += consumed
+        self._pending = self._pending[consumed:]
+        self.builder.add_rows(rows, line_ends)
+    
+    def finish(self) -> Dict[str, Any]:
+        self.feed(b'', final=True)
+        return self.builder.finish()
+
+def split_complete_records(text: str, delimiter: str, final: bool) -> Tuple[List[List[str]], int, List[int]]:
+    """Parse records that are fully present in text, return them, the length consumed and their end lines
+    
+    A record cut off by the end of text (open quoted field or missing line
+    break) is left for the next call unless this is the final piece.
+    """
+    state = {'pulled': 0, 'exhausted': False}
+    
+    def lines() -> Iterator[str]:
+        for line in io.StringIO(text, newline=''):
+            # csv.reader ends a record at the end of every line it gets
+            if not final and not line.endswith(('\n', '\r')):
+                break
+            state['pulled'] += len(line)
+            yield line
+        state['exhausted'] = True
+    
+    rows = []
+    line_ends = []
+    consumed = 0
+    reader = csv.reader(lines(), delimiter=delimiter)
+    for row in reader:
+        if state['exhausted'] and not final:
+            break
+        rows.append(row)
+        line_ends.append(reader.line_num)
+        consumed = state['pulled']
+    
+    if final:
+        consumed = len(text)
+    return rows, consumed, line_ends
+
+class UploadSession:
+    """Incremental parse of one chunked upload, kept while the instance is warm"""
+    
+    def __init__(self, meta: Dict[str, Any]):
+        self.upload_id = meta['upload_id']
+        self.column_mapping = meta.get('column_mapping')
+        self.integrity_options = meta.get('integrity_options')
+        self.next_chunk = 0
+        self._error: Optional[CatalogParseError] = None
+        # Created once the first bytes show which encoding to start with
+        self.parser: Optional[IncrementalCatalogParser] = None
+        self.detection: Optional[Dict[str, Any]] = None
+        self._encodings: Iterator[Tuple[str, str]] = iter([])
+        self._attempts = 0
+    
+    @property
+    def rows_parsed(self) -> int:
+        if self.parser is None or self.parser.builder is None:
+            return 0
+        return self.parser.builder.stats['rows_count']
+    
+    def start(self, sample: bytes) -> None:
+        """Detect the encoding from the start of the upload and create the parser"""
+        self.detection = detect_encoding(sample)
+        self._encodings = iter(candidate_encodings(self.detection['encoding']))
+        self._next_parser()
+    
+    def _next_parser(self) -> None:
+        self._attempts += 1
+        self.parser = IncrementalCatalogParser(*next(self._encodings), self.column_mapping, self.integrity_options)
+    
+    def feed(self, chunk: bytes) -> None:
+        self.next_chunk += 1
+        if self._error is not None:
+            return
+        if self.parser is None:
+            self.start(chunk)
+        try:
+            self.parser.feed(chunk)
+        except UnicodeDecodeError:
+            self.replay(next_encoding=True)
+        except CatalogParseError as e:
+            # Reported once the client finalizes the upload
+            self._error = e
+    
+    def replay(self, next_encoding: bool = False) -> None:
+        """Parse all staged bytes again, switching encoding while decoding fails"""
+        meta = UPLOADS.load(self.upload_id)
+        if self.parser is None:
+            with UPLOADS.open_data(self.upload_id) as data:
+                self.start(data.read(ENCODING_SAMPLE_SIZE))
+            next_encoding = False
+        while True:
+            if next_encoding:
+                self._next_parser()
+            next_encoding = True
+            try:
+                with UPLOADS.open_data(self.upload_id) as data:
+                    for chunk in iter(lambda: data.read(DECODE_CHUNK_SIZE), b''):
+                        self.parser.feed(chunk)
+                break
+            except UnicodeDecodeError:
+                continue
+            except CatalogParseError as e:
+                self._error = e
+                break
+        self.next_chunk = meta['next_chunk']
+    
+    def finish(self) -> Dict[str, Any]:
+        if self.parser is None:
+            self.start(b'')
+        while self._error is None:
+            try:
+                parsed = self.parser.finish()
+                parsed['debug_info']['encoding'] = encoding_report(
+                    self.detection, self.parser.encoding, self.parser.errors, self._attempts
+                )
+                return parsed
+            except UnicodeDecodeError:
+                self.replay(next_encoding=True)
+            except CatalogParseError as e:
+                self._error = e
+        raise self._error
+
+def iter_lines(head: str, text_stream: io.TextIOWrapper, stats: Dict[str, int]) -> Iterator[str]:
+    """Yield complete lines from the sniffed head and the rest of the stream"""
+    lines = io.StringIO(head, newline='').readlines()
+    if lines and not lines[-1].endswith(('\n', '\r')):
+        lines[-1] += text_stream.readline()
+    
+    for line in itertools.chain(lines, text_stream):
+        stats['content_length'] += len(line)
+        yield line
+
+def read_record(idx: int, row: List[str],
+                column_plan: Dict[str, Tuple[Optional[int], Optional[str]]]) -> Optional[ProductRecord]:
+    """Map CSV row to product record, None for rows without a product"""
+    if not row or not any(row):
+        return None
+    
+    # Read values by position using the resolved column plan
+    return make_record(
+        idx,
+        name=get_plan_value(row, column_plan['name']),
+        article=get_plan_value(row, column_plan['article']),
+        brand=get_plan_value(row, column_plan['brand']),
+        unit=get_plan_value(row, column_plan['unit']),
+        recommended_price=get_plan_value(row, column_plan['recommended_price']),
+        dealer_price=get_plan_value(row, column_plan['dealer_price']),
+        special_offer=get_plan_value(row, column_plan['special_offer']),
+        discount_percent=get_plan_value(row, column_plan['discount_percent']),
+        special_price=get_plan_value(row, column_plan['special_price']),
+        package=get_plan_value(row, column_plan['package']),
+        barcode=get_plan_value(row, column_plan['barcode']),
+        photo=get_plan_value(row, column_plan['photo'])
+    )
 
-def get_column_value(row: Dict[str, str], possible_names: List[str]) -> str:
-    """Get value from row by trying different column names with smart matching"""
-    for name in possible_names:
+def resolve_column_plan(column_names: List[str]) -> Dict[str, Tuple[Optional[int], Optional[str]]]:
+    """Bind every product field to a column index once per file"""
+    # Duplicate headers keep their first position but read the last value, like csv.DictReader
+    positions: Dict[str, int] = {}
+    for index, key in enumerate(column_names):
+        positions[key] = index
+    # Header cells case-folded once, not again for every alias they are compared with
+    keys = [(key, key.lower().strip()) for key in positions]
+    return {
+        field: resolve_column(positions, keys, aliases)
+        for field, aliases in NORMALIZED_ALIASES.items()
+    }
+
+def resolve_column(positions: Dict[str, int], keys: List[Tuple[str, str]],
+                   possible_names: List[Tuple[str, str]]) -> Tuple[Optional[int], Optional[str]]:
+    """Find column index by trying different column names with smart matching"""
+    for name, name_lower in possible_names:
         # Exact match
-        if name in row:
-            return str(row[name] or '').strip()
+        if name in positions:
+            return positions[name], 'exact'
         
         # Case insensitive match
-        for key in row.keys():
-            if key.lower().strip() == name.lower().strip():
-                return str(row[key] or '').strip()
+        for key, key_lower in keys:
+            if key_lower == name_lower:
+                return positions[key], 'case_insensitive'
     
     # Partial match - check if any pattern is contained in column names
-    for name in possible_names:
-        name_lower = name.lower().strip()
-        for key in row.keys():
-            key_lower = key.lower().strip()
+    for _, name_lower in possible_names:
+        for key, key_lower in keys:
             # Check if name is contained in key or vice versa
             if (name_lower in key_lower and len(name_lower) > 2) or (key_lower in name_lower and len(key_lower) > 2):
-                return str(row[key] or '').strip()
-    
-    return ''
+                return positions[key], 'partial'
     
-    return ''
+    return None, None
 
-def parse_price(price_value: str) -> float:
-    """Parse price from string"""
-    if not price_value or not price_value.strip():
-        return 0.0
+def mapped_column_plan(column_names: List[str],
+                       column_mapping: Dict[str, str]) -> Tuple[Dict[str, Tuple[Optional[int], Optional[str]]], List[str]]:
+    """Bind fields to the columns named in an explicit mapping, return the plan and names not in the header"""
+    positions: Dict[str, int] = {}
+    for index, key in enumerate(column_names):
+        positions[key] = index
     
-    price_str = str(price_value).strip()
-    # Remove currency symbols, spaces, and commas used as thousands separator
-    price_str = re.sub(r'[₽$€\s]', '', price_str)
-    # Replace comma with dot for decimal (but be careful with thousands separator)
-    if price_str.count(',') == 1 and price_str.count('.') == 0:
-        # Single comma, likely decimal separator
-        price_str = price_str.replace(',', '.')
-    elif ',' in price_str and '.' in price_str:
-        # Both comma and dot, comma is thousands separator
-        price_str = price_str.replace(',', '')
-    
-    try:
-        return float(price_str)
-    except (ValueError, TypeError):
-        return 0.0
+    plan: Dict[str, Tuple[Optional[int], Optional[str]]] = {field: (None, None) for field in FIELD_ALIASES}
+    missing = []
+    for field, column in column_mapping.items():
+        if column in positions:
+            plan[field] = (positions[column], 'mapping')
+        else:
+            missing.append(column)
+    return plan, missing
 
-def process_image_path(photo_path: str) -> str:
-    """Process image path from file"""
-    if not photo_path or not photo_path.strip():
-        return '/img/dc9855aa-d3ba-40f6-91a6-c00afab470de.jpg'
-    
-    photo_path = photo_path.strip()
-    
-    # If it's a URL, return as is
-    if photo_path.startswith(('http://', 'https://')):
-        return photo_path
+def integrity_request_options(body_data: Dict[str, Any]) -> Optional[Dict[str, bool]]:
+    """IntegrityIndex options of a request, None when it keeps the defaults"""
+    options = {
+        'stable_ids': bool(body_data.get('stableIds')),
+        'drop_duplicates': bool(body_data.get('dropDuplicates'))
+    }
+    return options if any(options.values()) else None
+
+def normalize_column_mapping(mapping: Any) -> Optional[Dict[str, str]]:
+    """Validate a field -> column mapping, dialog field names become product fields"""
+    if mapping is None:
+        return None
+    if not isinstance(mapping, dict):
+        raise ValueError('columnMapping должен быть объектом {поле: колонка}')
+    normalized = {}
+    for field, column in mapping.items():
+        field = MAPPING_FIELD_NAMES.get(field, field)
+        if field not in FIELD_ALIASES:
+            raise ValueError(f'Неизвестное поле в columnMapping: {field}')
+        if column:
+            normalized[field] = str(column)
+    return normalized
+
+def describe_column_plan(column_names: List[str],
+                         column_plan: Dict[str, Tuple[Optional[int], Optional[str]]]) -> Dict[str, Any]:
+    return {
+        field: {'column': column_names[index], 'index': index, 'match': match}
+        if index is not None else None
+        for field, (index, match) in column_plan.items()
+    }
+
+def preview_catalog(file_data: str, offset: int) -> Dict[str, Any]:
+    """Columns, first rows and auto-detected bindings from a bounded prefix of the file
     
-    # If it's a relative path, keep it
-    if photo_path.startswith('/'):
-        return photo_path
+    Decodes the encoding sample first and reads further, doubling the
+    prefix, only until PREVIEW_ROWS complete data rows are found.
+    """
+    reader = io.BufferedReader(Base64Reader(file_data, offset), DECODE_CHUNK_SIZE)
+    data = reader.read(ENCODING_SAMPLE_SIZE)
+    detection = detect_encoding(data)
+    candidates = candidate_encodings(detection['encoding'])
     
-    # If it's just a filename, assume it's in images folder
-    if '.' in photo_path:
-        return f'/images/{photo_path}'
+    attempt = 0
+    exhausted = len(data) < ENCODING_SAMPLE_SIZE
+    while True:
+        for attempt, (encoding, errors) in enumerate(candidates, 1):
+            try:
+                # The prefix may end inside a multibyte character, final only at the file end
+                text = codecs.getincrementaldecoder(encoding)(errors).decode(data, exhausted)
+                break
+            except UnicodeDecodeError:
+                if attempt == len(candidates):
+                    raise
+        
+        builder = CatalogBuilder(text[:SNIFF_SIZE])
+        try:
+            rows, _, _ = split_complete_records(text, builder.delimiter, exhausted)
+        except csv.Error as e:
+            raise builder.parse_error(e)
+        rows = [row for row in rows if row != []]
+        if len(rows) > PREVIEW_ROWS or exhausted or len(data) >= PREVIEW_MAX_BYTES:
+            break
+        more = reader.read(len(data))
+        exhausted = len(more) < len(data)
+        data += more
     
-    # Default fallback
-    return '/img/dc9855aa-d3ba-40f6-91a6-c00afab470de.jpg'
\ No newline at end of file
+    if not rows:
+        raise CatalogParseError('Файл пустой или не содержит данных', {
+            'column_names': [],
+            'rows_count': 0,
+            'delimiter': builder.delimiter
+        })
+    column_names = rows[0]
+    return {
+        'columns': column_names,
+        'sample_rows': rows[1:PREVIEW_ROWS + 1],
+        'delimiter': builder.delimiter,
+        'column_plan': describe_column_plan(column_names, resolve_column_plan(column_names)),
+        'debug_info': {
+            'detected_columns': column_names,
+            'bytes_read': len(data),
+            'encoding': encoding_report(detection, encoding, errors, attempt)
+        }
+    }
+
+def get_plan_value(row: List[str], binding: Tuple[Optional[int], Optional[str]]) -> str:
+    """Get raw cell from row by the column index resolved for a field"""
+    index = binding[0]
+    if index is None or index >= len(row):
+        return ''
+    return row[index]
@@ -0,0 +1,159 @@
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+# Parsed catalog as stored in the cache:
+# {'products_json': str, 'categories': list, 'total_products': int, 'debug_info': dict}
+CacheEntry = Dict[str, Any]
+
+
+class ParseCache:
+    """Base class for content-addressed storage of parsed catalogs"""
+    
+    name = 'none'
+    
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key: str) -> Optional[CacheEntry]:
+        entry = self._load(key)
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+    
+    def set(self, key: str, entry: CacheEntry) -> None:
+        if entry_size(entry) <= self.max_bytes:
+            self._store(key, entry)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {'backend': self.name, 'hits': self.hits, 'misses': self.misses}
+    
+    def _load(self, key: str) -> Optional[CacheEntry]:
+        return None
+    
+    def _store(self, key: str, entry: CacheEntry) -> None:
+        pass
+
+
+class MemoryParseCache(ParseCache):
+    """In-process LRU, survives between invocations of a warm function instance"""
+    
+    name = 'memory'
+    
+    def __init__(self, max_bytes: int):
+        super().__init__(max_bytes)
+        self._entries: 'OrderedDict[str, CacheEntry]' = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+    
+    def _load(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+    
+    def _store(self, key: str, entry: CacheEntry) -> None:
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= entry_size(previous)
+            self._entries[key] = entry
+            self._size += entry_size(entry)
+            
+            # Evict least recently used entries until the budget fits
+            while self._size > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= entry_size(evicted)
+
+
+class DiskParseCache(ParseCache):
+    """Local-disk cache, one file per key, evicted by last access time"""
+    
+    name = 'disk'
+    
+    def __init__(self, max_bytes: int, directory: str):
+        super().__init__(max_bytes)
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.cache')
+    
+    def _load(self, key: str) -> Optional[CacheEntry]:
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.loads(f.readline())
+                entry['products_json'] = f.read()
+        except (OSError, ValueError):
+            return None
+        
+        # Mark as recently used for eviction, the entry is still valid if another
+        # instance evicted the file after it was read
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+    
+    def _store(self, key: str, entry: CacheEntry) -> None:
+        meta = {k: v for k, v in entry.items() if k != 'products_json'}
+        
+        # Write to a temp file first so readers never see a partial entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(meta, ensure_ascii=False))
+            f.write('\n')
+            f.write(entry['products_json'])
+        os.replace(tmp_path, self._path(key))
+        
+        self._evict()
+    
+    def _evict(self) -> None:
+        files = []
+        for file_name in os.listdir(self.directory):
+            if not file_name.endswith('.cache'):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, file_name))
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, file_name))
+        
+        total = sum(size for _, size, _ in files)
+        for _, size, file_name in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, file_name))
+            except OSError:
+                continue
+            total -= size
+
+
+def entry_size(entry: CacheEntry) -> int:
+    """Approximate entry size, dominated by the serialized products"""
+    return len(entry['products_json']) + 1024
+
+
+def create_parse_cache() -> ParseCache:
+    """Build the cache backend configured through environment variables"""
+    backend = os.environ.get('PARSE_CACHE_BACKEND', 'memory')
+    max_bytes = int(os.environ.get('PARSE_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+    
+    if backend == 'memory':
+        return MemoryParseCache(max_bytes)
+    if backend == 'disk':
+        directory = os.environ.get(
+            'PARSE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'catalog-parser-cache')
+        )
+        return DiskParseCache(max_bytes, directory)
+    return ParseCache(0)
@@ -0,0 +1,93 @@
+import functools
+from types import ModuleType
+from typing import List, Optional, Tuple
+
+# Special offer values that only mark a product and carry no price
+OFFER_MARKERS = ('', 'Новинка!!!')
+# Rows in one pricing batch, and the smallest batch worth moving to numpy
+PRICE_BATCH_SIZE = 4096
+VECTOR_MIN_ROWS = 64
+
+# Price columns of a batch: recommended, dealer, special, offer price,
+# offer active, discount value, discount active
+PriceColumns = Tuple[List[float], List[float], List[float], List[float], List[bool], List[float], List[bool]]
+
+
+@functools.lru_cache(maxsize=None)
+def load_numpy() -> Optional[ModuleType]:
+    """numpy, imported with the first batch big enough to need it, None when not installed
+    
+    The import takes longer than parsing a small file, so cold starts that
+    only price a few rows do not pay for it.
+    """
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def is_offer_active(special_offer: str) -> bool:
+    """Offer cell that holds a price or promo text, not just a novelty mark"""
+    return bool(special_offer) and special_offer.strip() not in OFFER_MARKERS
+
+
+def compute_price(recommended: float, dealer: float, special: float, offer: float, offer_active: bool,
+                  discount: float, discount_active: bool) -> Tuple[float, float, bool]:
+    """Final price, base price and special pricing flag of one row
+    
+    Precedence: special price, then offer, then discount (percentage up to
+    100, fixed price above), then dealer or recommended price. An offer
+    that is not a number keeps the dealer or recommended price.
+    """
+    has_special_pricing = bool(offer_active or discount_active or special > 0)
+    base_price = dealer or recommended
+    
+    if special > 0:
+        final_price = special
+    elif offer_active:
+        final_price = offer or base_price
+    elif discount_active and discount > 0:
+        if discount > 100:  # Assume it's a fixed price
+            final_price = discount
+        else:  # It's a percentage
+            final_price = base_price * (1 - discount / 100)
+    else:
+        final_price = base_price
+    
+    return final_price, base_price, has_special_pricing
+
+
+def compute_prices(columns: PriceColumns) -> Tuple[List[float], List[float], List[bool]]:
+    """compute_price over a whole batch, with numpy masks when it is installed
+    
+    Results are plain Python floats and bools, unrounded, identical to the
+    scalar path: numpy float64 arithmetic gives the same values, so callers
+    keep rounding with round() as before.
+    """
+    np = load_numpy() if len(columns[0]) >= VECTOR_MIN_ROWS else None
+    if np is None:
+        rows = [compute_price(*row) for row in zip(*columns)]
+        return [row[0] for row in rows], [row[1] for row in rows], [row[2] for row in rows]
+    
+    recommended, dealer, special, offer, discount = (
+        np.array(column, dtype=np.float64) for column in columns[:4] + columns[5:6]
+    )
+    offer_active = np.array(columns[4], dtype=bool)
+    discount_active = np.array(columns[6], dtype=bool)
+    
+    # `x or y` on floats: NaN is truthy, only zeros fall through
+    base_price = np.where(dealer != 0, dealer, recommended)
+    offer = np.where(offer != 0, offer, base_price)
+    
+    with np.errstate(invalid='ignore', over='ignore'):
+        use_special = special > 0
+        discounted = np.where(discount > 100, discount, base_price * (1 - discount / 100))
+        final_price = np.select(
+            [use_special, offer_active, discount_active & (discount > 0)],
+            [special, offer, discounted],
+            base_price
+        )
+    has_special_pricing = offer_active | discount_active | use_special
+    
+    return final_price.tolist(), base_price.tolist(), has_special_pricing.tolist()
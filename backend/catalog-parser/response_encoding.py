@@ -0,0 +1,129 @@
+import base64
+import functools
+import json
+from types import ModuleType
+from typing import Any, Dict, List, Optional, Tuple
+
+JSON_MEDIA_TYPE = 'application/json'
+# One array per product field, repeated strings replaced by dictionary indexes
+COLUMNAR_MEDIA_TYPE = 'application/vnd.catalog.columnar+json'
+
+# Smaller bodies are not worth compressing
+COMPRESS_MIN_BYTES = 1024
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 5
+
+# Columns sent as indexes into a list of distinct values
+INTERNED_FIELDS = ('brand', 'category', 'unit', 'image')
+# Product fields the columnar format leaves out: description is brand and
+# name joined by a space, inStock is always true
+COLUMNAR_FIELDS = (
+    'id', 'name', 'article', 'brand', 'category', 'price', 'basePrice', 'recommendedPrice', 'unit',
+    'package', 'barcode', 'image', 'hasSpecialPricing', 'specialOffer', 'discountPercent', 'specialPrice'
+)
+
+# json.dumps builds a new encoder whenever it gets options, this one is reused
+JSON_ENCODER = json.JSONEncoder(ensure_ascii=False)
+
+
+@functools.lru_cache(maxsize=None)
+def load_brotli() -> Optional[ModuleType]:
+    """brotli, imported once a client asks for it, None when not installed"""
+    try:
+        import brotli
+    except ImportError:  # optional, gzip covers every browser
+        return None
+    return brotli
+
+
+def parse_qualities(header: Optional[str]) -> Dict[str, float]:
+    """Values of an Accept or Accept-Encoding header with their q weights"""
+    qualities = {}
+    for item in (header or '').split(','):
+        value, _, params = item.partition(';')
+        value = value.strip().lower()
+        if not value:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, number = param.partition('=')
+            if name.strip() == 'q':
+                try:
+                    quality = float(number)
+                except ValueError:
+                    quality = 0.0
+        qualities[value] = quality
+    return qualities
+
+
+def negotiate(headers: Optional[Dict[str, str]]) -> Tuple[str, Optional[str]]:
+    """Pick the response media type and content encoding for request headers"""
+    headers = {name.lower(): value for name, value in (headers or {}).items()}
+    
+    accept = parse_qualities(headers.get('accept'))
+    # Only clients that name the columnar type get it, browsers send */*
+    media_type = JSON_MEDIA_TYPE
+    if 0 < accept.get(COLUMNAR_MEDIA_TYPE, 0) >= accept.get(JSON_MEDIA_TYPE, 0):
+        media_type = COLUMNAR_MEDIA_TYPE
+    
+    accept_encoding = parse_qualities(headers.get('accept-encoding'))
+    encodings = ['br', 'gzip'] if accept_encoding.get('br', 0) > 0 and load_brotli() is not None else ['gzip']
+    encoding = max(encodings, key=lambda name: accept_encoding.get(name, 0))
+    if accept_encoding.get(encoding, 0) <= 0:
+        encoding = None
+    return media_type, encoding
+
+
+def catalog_body(products_json: str, result: Dict[str, Any], media_type: str) -> str:
+    """Full catalog response body: success flag, products, then the other result keys
+    
+    debug_info goes last, attach_debug_info extends it without decoding the products.
+    """
+    if 'debug_info' in result:
+        result = dict(result)
+        result['debug_info'] = result.pop('debug_info')
+    if media_type == COLUMNAR_MEDIA_TYPE:
+        products = json.loads(''.join(['[', products_json, ']']))
+        return JSON_ENCODER.encode(dict({'success': True, 'format': 'columnar', 'products': columnar(products)}, **result))
+    
+    return ''.join([
+        '{"success": true, "products": [',
+        products_json,
+        '], ',
+        JSON_ENCODER.encode(result)[1:]
+    ])
+
+
+def columnar(products: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Turn product dicts into columns, interning the strings that repeat across products"""
+    columns = {}
+    dictionaries = {}
+    for field in COLUMNAR_FIELDS:
+        values = [product[field] for product in products]
+        if field in INTERNED_FIELDS:
+            positions: Dict[Any, int] = {}
+            columns[field] = [positions.setdefault(value, len(positions)) for value in values]
+            dictionaries[field] = list(positions)
+        else:
+            columns[field] = values
+    return {'count': len(products), 'columns': columns, 'dictionaries': dictionaries}
+
+
+def encode_response(response: Dict[str, Any], encoding: Optional[str]) -> Dict[str, Any]:
+    """Compress the body of a finished response when the client accepts it"""
+    headers = dict(response.get('headers') or {})
+    headers['Vary'] = 'Accept, Accept-Encoding'
+    
+    body = response.get('body') or ''
+    if encoding is None or response.get('isBase64Encoded') or len(body) < COMPRESS_MIN_BYTES:
+        return dict(response, headers=headers)
+    
+    data = body.encode('utf-8')
+    if encoding == 'br':
+        data = load_brotli().compress(data, quality=BROTLI_QUALITY)
+    else:
+        # Most invocations answer small or uncompressed bodies, gzip is imported on first use
+        import gzip
+        data = gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    headers['Content-Encoding'] = encoding
+    return dict(response, headers=headers, body=base64.b64encode(data).decode('ascii'), isBase64Encoded=True)
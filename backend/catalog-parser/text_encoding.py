@@ -0,0 +1,75 @@
+import codecs
+import time
+from typing import Any, Dict, List, Tuple
+
+# Bytes from the start of the file inspected to pick the encoding
+ENCODING_SAMPLE_SIZE = 64 * 1024
+
+BOMS = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16')
+]
+# Tried in order when the detected encoding fails later in the file
+FALLBACK_ENCODINGS = ['utf-8', 'cp1251']
+
+
+def detect_encoding(sample: bytes) -> Dict[str, Any]:
+    """Pick the encoding from a BOM or from a bounded prefix of the file
+    
+    Without a BOM, UTF-16 is recognized by zero bytes at every other
+    position, UTF-8 by the sample decoding cleanly (a multibyte sequence
+    cut by the sample end is fine), anything else is taken as cp1251.
+    """
+    started = time.perf_counter()
+    sample = sample[:ENCODING_SAMPLE_SIZE]
+    encoding, source = None, 'sample'
+    
+    for bom, bom_encoding in BOMS:
+        if sample.startswith(bom):
+            encoding, source = bom_encoding, 'bom'
+            break
+    
+    if encoding is None:
+        # Digits, separators and Latin letters in UTF-16 carry a zero byte,
+        # single-byte encodings practically never contain one
+        pairs = len(sample) // 2
+        if pairs and sample[1::2].count(0) > pairs * 0.1:
+            encoding = 'utf-16-le'
+        elif pairs and sample[0::2].count(0) > pairs * 0.1:
+            encoding = 'utf-16-be'
+    
+    if encoding is None:
+        try:
+            codecs.getincrementaldecoder('utf-8')('strict').decode(sample, False)
+            encoding = 'utf-8'
+        except UnicodeDecodeError:
+            encoding = 'cp1251'
+    
+    return {
+        'encoding': encoding,
+        'source': source,
+        'sample_bytes': len(sample),
+        'detect_ms': round((time.perf_counter() - started) * 1000, 3)
+    }
+
+
+def candidate_encodings(encoding: str) -> List[Tuple[str, str]]:
+    """Detected encoding first, then strict fallbacks, then lossy UTF-8"""
+    candidates = [(encoding, 'strict')]
+    candidates += [(fallback, 'strict') for fallback in FALLBACK_ENCODINGS if fallback != encoding]
+    candidates.append(('utf-8', 'ignore'))
+    return candidates
+
+
+def encoding_report(detection: Dict[str, Any], encoding: str, errors: str, attempts: int) -> Dict[str, Any]:
+    """debug_info entry: what was detected and what the file was decoded with"""
+    return {
+        'encoding': encoding,
+        'errors': errors,
+        'detected': detection['encoding'],
+        'source': detection['source'],
+        'sample_bytes': detection['sample_bytes'],
+        'detect_ms': detection['detect_ms'],
+        'attempts': attempts
+    }
@@ -0,0 +1,115 @@
+import json
+import hashlib
+import time
+from typing import Dict, Any, Optional
+
+from search_index import SORT_ORDERS, CatalogIndex, create_index_store
+
+# Built indexes keyed by catalog id, kept while the instance is warm
+INDEXES = create_index_store()
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    '''
+    Business: Поиск и фильтрация товаров по загруженному каталогу
+    Args: event - dict с httpMethod, body с action (load/search) или queryStringParameters для поиска
+          context - объект с request_id, function_name
+    Returns: JSON с найденными товарами, фасетами категорий и пагинацией
+    '''
+    method: str = event.get('httpMethod', 'POST')
+    
+    # Handle CORS OPTIONS request
+    if method == 'OPTIONS':
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+                'Access-Control-Allow-Headers': 'Content-Type, X-User-Id, X-Auth-Token, X-Session-Id',
+                'Access-Control-Max-Age': '86400'
+            },
+            'body': '',
+            'isBase64Encoded': False
+        }
+    
+    try:
+        if method == 'GET':
+            params = dict(event.get('queryStringParameters') or {}, action='search')
+        elif method == 'POST':
+            params = json.loads(event.get('body') or '{}')
+        else:
+            return json_response(405, {'success': False, 'error': 'Method not allowed'})
+        
+        action = params.get('action', 'search')
+        if action == 'load':
+            return load_catalog(params)
+        if action == 'search':
+            return search_catalog(params)
+        return json_response(400, {'success': False, 'error': f'Неизвестное действие: {action}'})
+    except (TypeError, ValueError) as e:
+        return json_response(400, {'success': False, 'error': f'Некорректный запрос: {str(e)}'})
+    except Exception as e:
+        return json_response(500, {
+            'success': False,
+            'error': f'Внутренняя ошибка сервера: {str(e)}',
+            'request_id': context.request_id
+        })
+
+def load_catalog(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Index products returned by catalog-parser, id is the hash of their content"""
+    products = params.get('products')
+    if not isinstance(products, list):
+        return json_response(400, {'success': False, 'error': 'No products provided'})
+    
+    started = time.perf_counter()
+    catalog_id = hashlib.sha256(json.dumps(products, ensure_ascii=False).encode('utf-8')).hexdigest()
+    index = INDEXES.get(catalog_id)
+    if index is None:
+        index = CatalogIndex(products)
+        INDEXES.set(catalog_id, index)
+    
+    return json_response(200, {
+        'success': True,
+        'catalogId': catalog_id,
+        'index': index.stats(),
+        'took_ms': round((time.perf_counter() - started) * 1000, 3)
+    })
+
+def search_catalog(params: Dict[str, Any]) -> Dict[str, Any]:
+    """One page of products matching the query, category and price range"""
+    index = INDEXES.get(params.get('catalogId') or '')
+    if index is None:
+        # Cold instance or evicted catalog, the client sends the products again
+        return json_response(404, {'success': False, 'error': 'Каталог не загружен', 'reload': True})
+    
+    sort = params.get('sort') or 'relevance'
+    if sort not in SORT_ORDERS:
+        return json_response(400, {'success': False, 'error': f'Неизвестная сортировка: {sort}'})
+    
+    started = time.perf_counter()
+    result = index.search(
+        query=str(params.get('query') or ''),
+        category=params.get('category') if params.get('category') not in (None, '', 'all') else None,
+        min_price=optional_float(params.get('minPrice')),
+        max_price=optional_float(params.get('maxPrice')),
+        sort=sort,
+        page=int(params.get('page') or 1),
+        page_size=int(params.get('pageSize') or 24)
+    )
+    result['took_ms'] = round((time.perf_counter() - started) * 1000, 3)
+    return json_response(200, dict({'success': True}, **result))
+
+def optional_float(value: Any) -> Optional[float]:
+    if value is None or value == '':
+        return None
+    return float(value)
+
+def json_response(status_code: int, body: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'statusCode': status_code,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': json.dumps(body, ensure_ascii=False),
+        'isBase64Encoded': False
+    }
@@ -0,0 +1,312 @@
+import bisect
+import itertools
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+TOKEN_RE = re.compile(r'[0-9a-zа-я]+')
+CYRILLIC_RE = re.compile(r'[а-я]')
+NONZERO_BYTE_RE = re.compile(rb'[^\x00]')
+
+# Russian inflection endings, longest first, cut from words to match word forms
+RUSSIAN_ENDINGS = sorted([
+    'ями', 'ами', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ией', 'иям', 'иях',
+    'ые', 'ие', 'ая', 'яя', 'ое', 'ее', 'ый', 'ий', 'ой', 'ей', 'ых', 'их', 'ов', 'ев',
+    'ам', 'ям', 'ах', 'ях', 'ом', 'ем', 'ую', 'юю', 'ия', 'ью',
+    'а', 'я', 'ы', 'и', 'о', 'е', 'у', 'ю', 'ь', 'й'
+], key=len, reverse=True)
+# Shortest stem left after cutting an ending
+MIN_STEM_LENGTH = 3
+
+SORT_ORDERS = ('relevance', 'price_asc', 'price_desc')
+MAX_PAGE_SIZE = 100
+
+# Terms with this many products keep their bitset between queries
+MASK_CACHE_MIN_POSTINGS = 64
+# Query prefixes whose term unions are kept, for search-as-you-type
+PREFIX_CACHE_SIZE = 1024
+# Products per price block of the price range bitsets
+PRICE_BLOCK = 512
+# Results up to this size are price-sorted directly, larger ones walk the price order
+SORT_EXPAND_LIMIT = 4096
+
+
+def normalize_text(text: str) -> str:
+    return text.lower().replace('ё', 'е')
+
+
+def stem(token: str) -> str:
+    """Cut a Russian inflection ending, Latin words and numbers stay as they are"""
+    if not CYRILLIC_RE.search(token):
+        return token
+    for ending in RUSSIAN_ENDINGS:
+        if token.endswith(ending) and len(token) - len(ending) >= MIN_STEM_LENGTH:
+            return token[:-len(ending)]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Stemmed search terms of a product field or a query"""
+    return [stem(token) for token in TOKEN_RE.findall(normalize_text(text))]
+
+
+def compact_code(code: str) -> str:
+    """Article or barcode with punctuation dropped: 'SKU-001' -> 'sku001'"""
+    return ''.join(TOKEN_RE.findall(normalize_text(code)))
+
+
+def positions_mask(positions: Iterable[int], size: int) -> int:
+    """Bitset of positions as a Python int, bit i set for product i"""
+    bits = bytearray((size + 7) // 8)
+    for position in positions:
+        bits[position >> 3] |= 1 << (position & 7)
+    return int.from_bytes(bits, 'little')
+
+
+def iter_mask(mask: int, size: int) -> Iterator[int]:
+    """Set positions of a bitset in ascending order"""
+    data = mask.to_bytes((size + 7) // 8, 'little')
+    for match in NONZERO_BYTE_RE.finditer(data):
+        offset = match.start()
+        byte = data[offset]
+        for bit in range(8):
+            if byte >> bit & 1:
+                yield offset * 8 + bit
+
+
+class CatalogIndex:
+    """In-memory search indexes over the products of one parsed catalog
+    
+    Products are addressed by their position in the uploaded list. Query
+    words, categories and price ranges resolve to bitsets (Python ints), so
+    intersections, totals and facet counts are a few big-int operations
+    instead of per-product loops. Only the requested page is expanded back
+    to products.
+    """
+    
+    def __init__(self, products: List[Dict[str, Any]]):
+        self.products = products
+        self.size = len(products)
+        self.prices: List[float] = [float(product.get('price') or 0) for product in products]
+        
+        postings: Dict[str, List[int]] = {}
+        self.codes: Dict[str, List[int]] = {}
+        categories: Dict[str, List[int]] = {}
+        for position, product in enumerate(products):
+            terms: Set[str] = set()
+            for field in ('name', 'brand', 'article'):
+                terms.update(tokenize(str(product.get(field) or '')))
+            
+            for field in ('article', 'barcode'):
+                code = compact_code(str(product.get(field) or ''))
+                if code:
+                    terms.add(code)
+                    self.codes.setdefault(code, []).append(position)
+            
+            for term in terms:
+                postings.setdefault(term, []).append(position)
+            categories.setdefault(str(product.get('category') or ''), []).append(position)
+        
+        self.postings = postings
+        # Sorted vocabulary for prefix lookups of the word being typed
+        self.terms = sorted(postings)
+        self.all_mask = (1 << self.size) - 1
+        self.category_masks = {name: positions_mask(positions, self.size) for name, positions in categories.items()}
+        self.category_counts = {name: len(positions) for name, positions in categories.items()}
+        
+        # Positions ordered by price, with bitsets of every PRICE_BLOCK-th prefix
+        # of that order, so a price range is two masks plus its ragged edges
+        self.price_order = sorted(range(self.size), key=self.prices.__getitem__)
+        self.sorted_prices = [self.prices[position] for position in self.price_order]
+        self.price_prefix_masks = [0]
+        bits = bytearray((self.size + 7) // 8)
+        for index, position in enumerate(self.price_order, 1):
+            bits[position >> 3] |= 1 << (position & 7)
+            if index % PRICE_BLOCK == 0:
+                self.price_prefix_masks.append(int.from_bytes(bits, 'little'))
+        
+        self._term_masks: Dict[str, int] = {}
+        self._prefix_masks: 'OrderedDict[str, int]' = OrderedDict()
+    
+    def term_mask(self, term: str) -> int:
+        positions = self.postings.get(term)
+        if not positions:
+            return 0
+        if len(positions) < MASK_CACHE_MIN_POSTINGS:
+            return positions_mask(positions, self.size)
+        mask = self._term_masks.get(term)
+        if mask is None:
+            mask = self._term_masks[term] = positions_mask(positions, self.size)
+        return mask
+    
+    def prefix_mask(self, prefix: str) -> int:
+        """Union of all terms starting with prefix, cached for repeated keystrokes"""
+        mask = self._prefix_masks.get(prefix)
+        if mask is not None:
+            self._prefix_masks.move_to_end(prefix)
+            return mask
+        
+        start = bisect.bisect_left(self.terms, prefix)
+        end = bisect.bisect_left(self.terms, prefix + '\uffff', start)
+        rare: List[int] = []
+        mask = 0
+        for term in self.terms[start:end]:
+            positions = self.postings[term]
+            if len(positions) < MASK_CACHE_MIN_POSTINGS:
+                rare.extend(positions)
+            else:
+                mask |= self.term_mask(term)
+        if rare:
+            mask |= positions_mask(rare, self.size)
+        
+        self._prefix_masks[prefix] = mask
+        while len(self._prefix_masks) > PREFIX_CACHE_SIZE:
+            self._prefix_masks.popitem(last=False)
+        return mask
+    
+    def match(self, query: str) -> Optional[int]:
+        """Bitset of products matching every query word, None for an empty query
+        
+        All words but the last must match a term exactly (after stemming),
+        the last one is a prefix, since it is usually still being typed.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return None
+        
+        code = compact_code(query)
+        if len(tokens) > 1 and code in self.codes:
+            # Article or barcode typed with separators: 'SKU-001'
+            return positions_mask(self.codes[code], self.size)
+        
+        mask = self.prefix_mask(tokens[-1])
+        for token in tokens[:-1]:
+            if not mask:
+                break
+            mask &= self.term_mask(token)
+        return mask
+    
+    def price_bounds(self, min_price: Optional[float], max_price: Optional[float]) -> Tuple[int, int]:
+        """Slice of the price order holding prices within the range"""
+        start = 0 if min_price is None else bisect.bisect_left(self.sorted_prices, min_price)
+        end = self.size if max_price is None else bisect.bisect_right(self.sorted_prices, max_price)
+        return start, max(start, end)
+    
+    def price_mask(self, start: int, end: int) -> int:
+        if start >= end:
+            return 0
+        
+        # Whole blocks from the prefix masks, the partial blocks at both ends by position
+        first_block = -(-start // PRICE_BLOCK)
+        last_block = end // PRICE_BLOCK
+        if first_block >= last_block:
+            return positions_mask(self.price_order[start:end], self.size)
+        mask = self.price_prefix_masks[last_block] & ~self.price_prefix_masks[first_block]
+        edges = self.price_order[start:first_block * PRICE_BLOCK] + self.price_order[last_block * PRICE_BLOCK:end]
+        if edges:
+            mask |= positions_mask(edges, self.size)
+        return mask
+    
+    def search(self, query: str = '', category: Optional[str] = None, min_price: Optional[float] = None,
+               max_price: Optional[float] = None, sort: str = 'relevance', page: int = 1,
+               page_size: int = 24) -> Dict[str, Any]:
+        mask = self.match(query)
+        price_bounds = self.price_bounds(min_price, max_price)
+        if min_price is not None or max_price is not None:
+            price_mask = self.price_mask(*price_bounds)
+            mask = price_mask if mask is None else mask & price_mask
+        
+        # Category facets count every category, before the category filter
+        if mask is None:
+            facets = self.category_counts
+            mask = self.all_mask
+        else:
+            facets = {name: (mask & category_mask).bit_count() for name, category_mask in self.category_masks.items()}
+        
+        if category:
+            mask &= self.category_masks.get(category, 0)
+        
+        total = mask.bit_count()
+        page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+        page = max(1, page)
+        start = (page - 1) * page_size
+        positions = self.page_positions(mask, total, query, sort, price_bounds, start, start + page_size)
+        return {
+            'items': [self.products[position] for position in positions],
+            'total': total,
+            'page': page,
+            'pageSize': page_size,
+            'facets': {
+                'categories': [
+                    {'name': name, 'count': count}
+                    for name, count in sorted(facets.items(), key=lambda item: (-item[1], item[0]))
+                    if count
+                ]
+            }
+        }
+    
+    def page_positions(self, mask: int, total: int, query: str, sort: str, price_bounds: Tuple[int, int],
+                       start: int, end: int) -> List[int]:
+        """Expand one page of a result bitset in the requested order"""
+        if start >= total:
+            return []
+        
+        if sort in ('price_asc', 'price_desc'):
+            if total <= SORT_EXPAND_LIMIT:
+                ordered = sorted(iter_mask(mask, self.size), key=lambda position: (self.prices[position], position))
+                if sort == 'price_desc':
+                    ordered.reverse()
+                return ordered[start:end]
+            
+            # Broad result: walk the price order within the price range, keeping bitset members
+            data = mask.to_bytes((self.size + 7) // 8, 'little')
+            order = self.price_order[price_bounds[0]:price_bounds[1]]
+            if sort == 'price_desc':
+                order.reverse()
+            hits = (position for position in order if data[position >> 3] >> (position & 7) & 1)
+            return list(itertools.islice(hits, start, end))
+        
+        # Relevance: exact article or barcode hits first, then catalog order
+        exact = [position for position in self.codes.get(compact_code(query), []) if mask >> position & 1] \
+            if query else []
+        if exact:
+            mask &= ~positions_mask(exact, self.size)
+        rest = itertools.islice(iter_mask(mask, self.size), max(0, start - len(exact)), max(0, end - len(exact)))
+        return (exact[start:end] + list(rest))[:end - start]
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'total_products': self.size,
+            'terms': len(self.terms),
+            'codes': len(self.codes),
+            'categories': len(self.category_masks)
+        }
+
+
+class CatalogIndexStore:
+    """In-process LRU of built indexes, lives as long as the warm instance"""
+    
+    def __init__(self, max_catalogs: int):
+        self.max_catalogs = max_catalogs
+        self._indexes: 'OrderedDict[str, CatalogIndex]' = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, catalog_id: str) -> Optional[CatalogIndex]:
+        with self._lock:
+            index = self._indexes.get(catalog_id)
+            if index is not None:
+                self._indexes.move_to_end(catalog_id)
+            return index
+    
+    def set(self, catalog_id: str, index: CatalogIndex) -> None:
+        with self._lock:
+            self._indexes[catalog_id] = index
+            self._indexes.move_to_end(catalog_id)
+            while len(self._indexes) > self.max_catalogs:
+                self._indexes.popitem(last=False)
+
+
+def create_index_store() -> CatalogIndexStore:
+    return CatalogIndexStore(int(os.environ.get('CATALOG_SEARCH_LIMIT', '4')))
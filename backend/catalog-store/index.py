@@ -0,0 +1,86 @@
+import json
+import time
+from typing import Dict, Any, Optional
+
+from catalog_store import SORT_ORDERS, StoreUnavailable, default_catalog_store
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    '''
+    Business: Постраничная выдача товаров из сохраненного каталога
+    Args: event - dict с httpMethod, queryStringParameters или body с фильтрами (category, brand, barcode, article, query, minPrice, maxPrice, sort, page, pageSize)
+          context - объект с request_id, function_name
+    Returns: JSON со страницей товаров, общим числом и категориями
+    '''
+    method: str = event.get('httpMethod', 'GET')
+    
+    # Handle CORS OPTIONS request
+    if method == 'OPTIONS':
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+                'Access-Control-Allow-Headers': 'Content-Type, X-User-Id, X-Auth-Token, X-Session-Id',
+                'Access-Control-Max-Age': '86400'
+            },
+            'body': '',
+            'isBase64Encoded': False
+        }
+    
+    try:
+        if method == 'GET':
+            params = event.get('queryStringParameters') or {}
+        elif method == 'POST':
+            params = json.loads(event.get('body') or '{}')
+        else:
+            return json_response(405, {'success': False, 'error': 'Method not allowed'})
+        return query_products(params)
+    except StoreUnavailable as e:
+        return json_response(e.status_code, {'success': False, 'error': str(e)})
+    except (TypeError, ValueError) as e:
+        return json_response(400, {'success': False, 'error': f'Некорректный запрос: {str(e)}'})
+    except Exception as e:
+        return json_response(500, {
+            'success': False,
+            'error': f'Внутренняя ошибка сервера: {str(e)}',
+            'request_id': context.request_id
+        })
+
+def query_products(params: Dict[str, Any]) -> Dict[str, Any]:
+    """One page of stored products matching the filters"""
+    sort = params.get('sort') or 'default'
+    if sort not in SORT_ORDERS:
+        return json_response(400, {'success': False, 'error': f'Неизвестная сортировка: {sort}'})
+    
+    started = time.perf_counter()
+    # Same database catalog-parser writes to with persist: true
+    result = default_catalog_store().query(
+        category=params.get('category') if params.get('category') not in (None, '', 'all') else None,
+        brand=params.get('brand') or None,
+        barcode=params.get('barcode') or None,
+        article=params.get('article') or None,
+        min_price=optional_float(params.get('minPrice')),
+        max_price=optional_float(params.get('maxPrice')),
+        query=str(params.get('query') or ''),
+        sort=sort,
+        page=int(params.get('page') or 1),
+        page_size=int(params.get('pageSize') or 24)
+    )
+    result['took_ms'] = round((time.perf_counter() - started) * 1000, 3)
+    return json_response(200, dict({'success': True}, **result))
+
+def optional_float(value: Any) -> Optional[float]:
+    if value is None or value == '':
+        return None
+    return float(value)
+
+def json_response(status_code: int, body: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        'statusCode': status_code,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': json.dumps(body, ensure_ascii=False),
+        'isBase64Encoded': False
+    }
@@ -0,0 +1,117 @@
+import hashlib
+from typing import Any, Dict, List, Optional, Tuple
+
+# GTIN lengths: EAN-8, UPC-A, EAN-13, GTIN-14
+BARCODE_LENGTHS = frozenset((8, 12, 13, 14))
+# Check digit tables: digits at odd positions left of the check digit count
+# 3 times, the translation maps them to 3 * digit mod 10 in one pass
+TRIPLE_DIGITS = str.maketrans('0123456789', '0369258147')
+DIGIT_VALUES = {str(digit): digit for digit in range(10)}
+# Conflicts kept as examples in debug_info
+INTEGRITY_SAMPLES = 50
+# Stable ids start with it, row ids are item_<n>
+STABLE_ID_PREFIX = 'p_'
+
+
+def barcode_problem(barcode: str) -> Optional[str]:
+    """Why a barcode is not a valid EAN/UPC code, None when it is
+    
+    Excel turns long codes into '4.60678E+12', those are reported as format
+    problems along with letters and other stray characters.
+    """
+    if not (barcode.isdigit() and barcode.isascii()):
+        return 'format'
+    if len(barcode) not in BARCODE_LENGTHS:
+        return 'length'
+    weighted = barcode[-2::-2].translate(TRIPLE_DIGITS) + barcode[-3::-2]
+    if -sum(map(DIGIT_VALUES.__getitem__, weighted)) % 10 != DIGIT_VALUES[barcode[-1]]:
+        return 'checksum'
+    return None
+
+
+def stable_id(key: str) -> str:
+    """Product id from its article or barcode, the same in every upload of the catalog"""
+    return STABLE_ID_PREFIX + hashlib.blake2b(key.encode('utf-8'), digest_size=8).hexdigest()
+
+
+class IntegrityIndex:
+    """Duplicate articles and barcodes and invalid barcodes of one import, in one pass
+    
+    Products are indexed by their casefolded article, or by the barcode when
+    they have no article, the same key the catalog store upserts them by. A
+    later product with an indexed key is a duplicate of that row. A new
+    product whose barcode another product already has is reported as a
+    duplicate barcode but stays a product of its own. Rows are the file
+    lines (sheet rows) records start on, as the parser counts them, so blank
+    lines and quoted line breaks do not shift them.
+    """
+    
+    def __init__(self, stable_ids: bool = False, drop_duplicates: bool = False):
+        self.stable_ids = stable_ids
+        self.drop_duplicates = drop_duplicates
+        # Product key -> [first row, occurrences], barcode -> its first row
+        self.products: Dict[str, List[int]] = {}
+        self.barcodes: Dict[str, int] = {}
+        self.duplicate_articles = 0
+        self.duplicate_barcodes = 0
+        self.invalid_barcodes = 0
+        self.dropped = 0
+        self.samples: List[Dict[str, Any]] = []
+    
+    def check(self, row: int, article: str, barcode: str) -> Tuple[bool, Optional[str]]:
+        """Index one product, return whether to keep it and its stable id (None for row ids)"""
+        if barcode:
+            problem = barcode_problem(barcode)
+            if problem is not None:
+                self.invalid_barcodes += 1
+                # The common conflict in bad files, not built at all once the samples are full
+                if len(self.samples) < INTEGRITY_SAMPLES:
+                    self.samples.append({'type': 'invalid_barcode', 'value': barcode, 'row': row, 'reason': problem})
+        
+        article_key = article.casefold()
+        key = article_key or (f'barcode:{barcode}' if barcode else '')
+        if not key:
+            # Nothing to match the product by, it keeps its row id
+            return True, None
+        
+        entry = self.products.get(key)
+        if entry is not None:
+            if article_key:
+                self.duplicate_articles += 1
+                self._sample({'type': 'duplicate_article', 'value': article, 'row': row, 'first_row': entry[0]})
+            else:
+                self.duplicate_barcodes += 1
+                self._sample({'type': 'duplicate_barcode', 'value': barcode, 'row': row, 'first_row': entry[0]})
+        else:
+            entry = self.products[key] = [row, 0]
+            first_row = self.barcodes.get(barcode) if barcode else None
+            if first_row is not None:
+                # Another product has the barcode, a conflict to report, not a repeated product
+                self.duplicate_barcodes += 1
+                self._sample({'type': 'duplicate_barcode', 'value': barcode, 'row': row, 'first_row': first_row})
+        if barcode:
+            self.barcodes.setdefault(barcode, row)
+        
+        entry[1] += 1
+        if entry[1] > 1 and self.drop_duplicates:
+            self.dropped += 1
+            return False, None
+        if not self.stable_ids:
+            return True, None
+        # Duplicates share the id of the first product, their occurrence number tells them apart
+        product_id = stable_id(key)
+        return True, product_id if entry[1] == 1 else f'{product_id}_{entry[1]}'
+    
+    def _sample(self, conflict: Dict[str, Any]) -> None:
+        if len(self.samples) < INTEGRITY_SAMPLES:
+            self.samples.append(conflict)
+    
+    def report(self) -> Dict[str, Any]:
+        return {
+            'duplicate_articles': self.duplicate_articles,
+            'duplicate_barcodes': self.duplicate_barcodes,
+            'invalid_barcodes': self.invalid_barcodes,
+            'dropped': self.dropped,
+            'ids': 'stable' if self.stable_ids else 'row',
+            'conflicts': self.samples
+        }
@@ -1,9 +1,51 @@
 import json
-import base64
-from typing import Dict, Any, List, Optional
+import binascii
+from typing import Dict, Any, List, Optional, Iterator, Tuple
 import csv
-from io import StringIO, BytesIO
+import io
+import itertools
 import re
+import shutil
+import tempfile
+import time
+
+from catalog_core import (
+    DECODE_CHUNK_SIZE, Base64Reader, PriceErrorLog, ProductRecord, make_record, open_text_stream, price_records
+)
+from catalog_delta import build_delta, create_snapshot_store
+from catalog_integrity import IntegrityIndex
+from instrumentation import (
+    PROFILE_MODES, PROFILE_TOP, add_time, attach_debug_info, count, instrumented, log_timings, run_profiled, stage
+)
+from pricing import PRICE_BATCH_SIZE
+from response_encoding import JSON_ENCODER, JSON_MEDIA_TYPE, catalog_body, encode_response, negotiate
+from text_encoding import ENCODING_SAMPLE_SIZE, candidate_encodings, detect_encoding, encoding_report
+
+# Workbook bytes kept in memory before spilling to a temp file
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+NON_BASE64_RE = re.compile(r'[^A-Za-z0-9+/=]')
+# Zip local file header, real Excel workbooks are zip archives. Checked here
+# so the xlsx reader (zipfile, expat) is imported only for workbooks
+XLSX_SIGNATURE = b'PK\x03\x04'
+
+# Header cells each product field is read from, a later one when the earlier cell is empty
+FIELD_COLUMNS: Dict[str, Tuple[str, ...]] = {
+    'name': ('Наименование ', 'Наименование'),
+    'article': ('Артикул',),
+    'brand': ('Бренд',),
+    'unit': ('Ед. (единицы измерения)',),
+    'recommended_price': ('Цена (Рекомендуемая)',),
+    'dealer_price': ('Цена дилер (по которой идет рассчет)',),
+    'special_offer': ('Акция!!!',),
+    'discount_percent': ('% скидки',),
+    'special_price': ('Специальная цена!!!',),
+    'package': ('Упаковка (сколько единиц товара в большой коробке/средней коробки/малой коробки)',),
+    'barcode': ('Штрих-код',),
+    'photo': ('Фото',)
+}
+
+# Per-product row hashes of recent catalogs, for delta responses
+SNAPSHOTS = create_snapshot_store()
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
@@ -21,7 +63,7 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             'headers': {
                 'Access-Control-Allow-Origin': '*',
                 'Access-Control-Allow-Methods': 'POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-User-Id, X-Auth-Token, X-Session-Id',
+                'Access-Control-Allow-Headers': 'Content-Type, Accept, X-User-Id, X-Auth-Token, X-Session-Id',
                 'Access-Control-Max-Age': '86400'
             },
             'body': ''
@@ -36,149 +78,26 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     
     try:
         body_data = json.loads(event.get('body', '{}'))
-        file_data = body_data.get('fileData', '')
-        filename = body_data.get('filename', '')
+        media_type, content_encoding = negotiate(event.get('headers'))
+        profile = body_data.get('profile')
         
-        if not file_data:
-            return {
-                'statusCode': 400,
-                'headers': {'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'No file data provided'})
-            }
-        
-        # Decode base64 file
-        file_bytes = base64.b64decode(file_data.split(',')[-1])
-        
-        # Try to parse as CSV first (simpler approach)
-        try:
-            # Try different encodings
-            content = None
-            for encoding in ['utf-8', 'cp1251', 'windows-1251']:
-                try:
-                    content = file_bytes.decode(encoding)
-                    break
-                except UnicodeDecodeError:
-                    continue
-            
-            if not content:
-                content = file_bytes.decode('utf-8', errors='ignore')
-            
-            # Parse CSV
-            csv_reader = csv.DictReader(StringIO(content), delimiter='\t')
-            rows = list(csv_reader)
-            
-        except Exception:
-            return {
-                'statusCode': 400,
-                'headers': {'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Could not parse file. Please ensure it\'s a valid Excel/CSV file.'})
-            }
-        
-        # Process products based on your column structure
-        products = []
-        categories = set()
-        
-        for idx, row in enumerate(rows):
-            if not row or not any(row.values()):
-                continue
-                
-            # Map your specific columns
-            article = clean_text(row.get('Артикул', ''))
-            brand = clean_text(row.get('Бренд', ''))
-            name = clean_text(row.get('Наименование ', '') or row.get('Наименование', ''))
-            unit = clean_text(row.get('Ед. (единицы измерения)', ''))
-            recommended_price = parse_price(row.get('Цена (Рекомендуемая)', 0))
-            dealer_price = parse_price(row.get('Цена дилер (по которой идет рассчет)', 0))
-            special_offer = clean_text(row.get('Акция!!!', ''))
-            discount_percent = clean_text(row.get('% скидки', ''))
-            special_price = parse_price(row.get('Специальная цена!!!', ''))
-            package = clean_text(row.get('Упаковка (сколько единиц товара в большой коробке/средней коробки/малой коробки)', ''))
-            barcode = clean_text(row.get('Штрих-код', ''))
-            photo = clean_text(row.get('Фото', ''))
-            
-            if not name:
-                continue
-            
-            # Determine final price logic
-            has_special_pricing = bool(
-                (special_offer and special_offer not in ['', 'Новинка!!!']) or
-                discount_percent or
-                special_price > 0
-            )
-            
-            # Calculate prices
-            if special_price > 0:
-                final_price = special_price
-                base_price = dealer_price or recommended_price
-            elif special_offer and special_offer not in ['', 'Новинка!!!']:
-                final_price = parse_price(special_offer)
-                base_price = dealer_price or recommended_price
-            elif discount_percent:
-                discount_val = parse_price(discount_percent)
-                if discount_val > 0:
-                    if discount_val > 100:  # Assume it's a price, not percentage
-                        final_price = discount_val
-                    else:  # It's a percentage
-                        base = dealer_price or recommended_price
-                        final_price = base * (1 - discount_val / 100)
-                    base_price = dealer_price or recommended_price
-                else:
-                    final_price = dealer_price or recommended_price
-                    base_price = final_price
+        with instrumented() as timings:
+            if profile in PROFILE_MODES:
+                response, profile_report = run_profiled(
+                    profile, int(body_data.get('profileTop') or PROFILE_TOP),
+                    lambda: process_request(body_data, context, media_type)
+                )
             else:
-                final_price = dealer_price or recommended_price
-                base_price = final_price
-            
-            # Determine category from brand
-            category = brand if brand else 'Канцтовары'
-            categories.add(category)
+                response, profile_report = process_request(body_data, context, media_type), None
             
-            # Process image
-            image_url = process_image_path(photo)
-            
-            product = {
-                'id': f"item_{idx}",
-                'name': name,
-                'article': article,
-                'brand': brand,
-                'category': category,
-                'price': round(final_price, 2),
-                'basePrice': round(base_price, 2),
-                'recommendedPrice': round(recommended_price, 2),
-                'unit': unit,
-                'package': package,
-                'barcode': barcode,
-                'image': image_url,
-                'inStock': True,
-                'hasSpecialPricing': has_special_pricing,
-                'specialOffer': special_offer,
-                'discountPercent': discount_percent,
-                'specialPrice': special_price if special_price > 0 else None,
-                'description': f"{brand} {name}".strip()
-            }
-            
-            products.append(product)
-        
-        categories_list = sorted(list(categories))
-        
-        result = {
-            'success': True,
-            'products': products,
-            'categories': categories_list,
-            'total_products': len(products),
-            'filename': filename,
-            'processed_at': context.request_id,
-            'message': f'Обработано {len(products)} товаров из {len(categories_list)} категорий'
-        }
-        
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps(result, ensure_ascii=False)
-        }
+            # Opt-in: stage timings (and the profile) in debug_info of the response
+            if body_data.get('timings') or profile_report is not None:
+                response = attach_debug_info(response, timings=timings.report(), profile=profile_report)
+            with stage('compress'):
+                response = encode_response(response, content_encoding)
+            count('response_bytes', len(response['body']))
+        log_timings(timings.report(), context)
+        return response
         
     except Exception as e:
         return {
@@ -191,46 +110,249 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
             }, ensure_ascii=False)
         }
 
-def clean_text(value) -> str:
-    """Clean text value"""
-    if not value or str(value).strip() in ['nan', 'None', '']:
-        return ''
-    return str(value).strip()
-
-def parse_price(price_value) -> float:
-    """Parse price from various formats"""
-    if not price_value or str(price_value).strip() in ['', 'nan', 'None']:
-        return 0.0
+def process_request(body_data: Dict[str, Any], context: Any, media_type: str) -> Dict[str, Any]:
+    """Parse the uploaded workbook or text export into an uncompressed response"""
+    file_data = body_data.get('fileData', '')
+    filename = body_data.get('filename', '')
     
-    price_str = str(price_value).strip()
-    # Remove currency symbols and spaces
-    price_str = re.sub(r'[₽$€\s,]', '', price_str)
-    # Replace comma with dot for decimal
-    price_str = price_str.replace(',', '.')
+    if not file_data:
+        return {
+            'statusCode': 400,
+            'headers': {'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'No file data provided'})
+        }
     
+    # Base64 payload starts after the last comma of the data URL
+    offset = file_data.rfind(',') + 1
+    if NON_BASE64_RE.search(file_data, offset):
+        file_data = NON_BASE64_RE.sub('', file_data[offset:])
+        offset = 0
+    count('input_bytes', (len(file_data) - offset) * 3 // 4)
+    
+    previous_fingerprint = body_data.get('previousFingerprint')
+    delta_requested = bool(body_data.get('delta') or previous_fingerprint)
+    # Ids from article/barcode instead of row position, repeated products left out
+    integrity_options = {
+        'stable_ids': bool(body_data.get('stableIds')),
+        'drop_duplicates': bool(body_data.get('dropDuplicates'))
+    }
+    
+    if is_xlsx(binascii.a2b_base64(file_data[offset:offset + 8])):
+        import zipfile
+        
+        try:
+            return parse_xlsx_catalog(file_data, offset, filename, context, delta_requested,
+                                      previous_fingerprint, media_type, integrity_options)
+        except zipfile.BadZipFile:
+            # Not a readable workbook, fall back to tab-separated text
+            pass
+    
+    # Decode once with the detected encoding, restart the stream only if it fails midway
+    with stage('detect_encoding'):
+        sample = io.BufferedReader(Base64Reader(file_data, offset), DECODE_CHUNK_SIZE).read(ENCODING_SAMPLE_SIZE)
+        detection = detect_encoding(sample)
+    candidates = candidate_encodings(detection['encoding'])
+    for attempt, (encoding, errors) in enumerate(candidates, 1):
+        debug_info = {'encoding': encoding_report(detection, encoding, errors, attempt)}
+        try:
+            return parse_text_catalog(file_data, offset, encoding, errors, filename, context,
+                                      delta_requested, previous_fingerprint, debug_info, media_type,
+                                      integrity_options)
+        except UnicodeDecodeError:
+            if attempt < len(candidates):
+                continue
+            raise
+
+def parse_text_catalog(file_data: str, offset: int, encoding: str, errors: str,
+                       filename: str, context: Any, delta_requested: bool = False,
+                       previous_fingerprint: Optional[str] = None,
+                       debug_info: Optional[Dict[str, Any]] = None,
+                       media_type: str = JSON_MEDIA_TYPE,
+                       integrity_options: Optional[Dict[str, bool]] = None) -> Dict[str, Any]:
+    """Run the streaming pipeline: base64 -> text -> rows -> products -> JSON"""
+    text_stream = open_text_stream(file_data, offset, encoding, errors)
+    
+    # Parse CSV
     try:
-        return float(price_str)
-    except (ValueError, TypeError):
-        return 0.0
+        csv_reader = csv.reader(text_stream, delimiter='\t')
+        column_names = next(csv_reader, [])
+        rows = numbered_rows(csv_reader)
+        first_row = next(rows, None)
+    except csv.Error:
+        return {
+            'statusCode': 400,
+            'headers': {'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'error': 'Could not parse file. Please ensure it\'s a valid Excel/CSV file.'})
+        }
+    
+    rows = itertools.chain([first_row], rows) if first_row is not None else iter([])
+    return parse_catalog(column_names, rows, filename, context, delta_requested, previous_fingerprint,
+                         debug_info, media_type, integrity_options)
+
+def parse_xlsx_catalog(file_data: str, offset: int, filename: str, context: Any,
+                       delta_requested: bool = False, previous_fingerprint: Optional[str] = None,
+                       media_type: str = JSON_MEDIA_TYPE,
+                       integrity_options: Optional[Dict[str, bool]] = None) -> Dict[str, Any]:
+    """Read the first worksheet of an .xlsx workbook, streaming its XML"""
+    from xlsx_reader import iter_xlsx_rows
+    
+    # zipfile needs random access, large workbooks spill to disk instead of memory
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as payload:
+        with stage('base64_decode'):
+            shutil.copyfileobj(Base64Reader(file_data, offset), payload, DECODE_CHUNK_SIZE)
+            payload.seek(0)
+        
+        rows = iter_xlsx_rows(payload)
+        _, column_names = next(rows, (0, []))
+        return parse_catalog(column_names, rows, filename, context, delta_requested, previous_fingerprint,
+                             media_type=media_type, integrity_options=integrity_options)
+
+def numbered_rows(csv_reader: Any) -> Iterator[Tuple[int, List[str]]]:
+    """Non-blank rows with the file line they start on, quoted line breaks included"""
+    line = csv_reader.line_num
+    for row in csv_reader:
+        start, line = line + 1, csv_reader.line_num
+        if row != []:
+            yield start, row
 
-def process_image_path(photo_path: str) -> str:
-    """Process image path from Excel"""
-    if not photo_path or photo_path.strip() == '':
-        return '/img/dc9855aa-d3ba-40f6-91a6-c00afab470de.jpg'
+def parse_catalog(column_names: List[str], rows: Iterator[Tuple[int, List[str]]], filename: str, context: Any,
+                  delta_requested: bool, previous_fingerprint: Optional[str],
+                  debug_info: Optional[Dict[str, Any]] = None,
+                  media_type: str = JSON_MEDIA_TYPE,
+                  integrity_options: Optional[Dict[str, bool]] = None) -> Dict[str, Any]:
+    """Map rows to products and serialize them one by one, in the negotiated media type"""
+    columns = resolve_columns(column_names)
+    integrity = IntegrityIndex(**(integrity_options or {}))
+    categories = set()
+    product_parts = []
+    total_products = 0
+    price_errors = PriceErrorLog()
+    # Reading rows, mapping and pricing all happen while the loop pulls records
+    started = time.perf_counter()
+    serialize_seconds = 0.0
+    for record in iter_products(rows, columns, categories, integrity):
+        price_errors.add(record)
+        if total_products:
+            product_parts.append(', ')
+        serialize_started = time.perf_counter()
+        product_parts.append(record.to_json())
+        serialize_seconds += time.perf_counter() - serialize_started
+        total_products += 1
+    add_time('parse.serialize', serialize_seconds)
+    add_time('parse', time.perf_counter() - started)
+    count('products', total_products)
     
-    photo_path = photo_path.strip()
+    products_json = ''.join(product_parts)
+    del product_parts
+    categories_list = sorted(list(categories))
     
-    # If it's already a URL, return as is
-    if photo_path.startswith(('http://', 'https://')):
-        return photo_path
+    result = {
+        'categories': categories_list,
+        'total_products': total_products,
+        'filename': filename,
+        'processed_at': context.request_id,
+        'message': f'Обработано {total_products} товаров из {len(categories_list)} категорий'
+    }
+    # Price cells that are not numbers, priced as 0, and repeated or invalid articles and barcodes
+    result['debug_info'] = dict(debug_info or {}, price_errors=price_errors.report(), integrity=integrity.report())
     
-    # If it's a relative path, make it absolute
-    if photo_path.startswith('/'):
-        return photo_path
+    # Delta mode: send only what changed since the catalog the client has
+    if delta_requested:
+        delta = build_delta(products_json, previous_fingerprint, SNAPSHOTS)
+        result['fingerprint'] = delta.pop('fingerprint')
+        result['delta'] = delta
+        
+        if delta['base_found']:
+            return {
+                'statusCode': 200,
+                'headers': {
+                    'Content-Type': 'application/json',
+                    'Access-Control-Allow-Origin': '*'
+                },
+                'body': JSON_ENCODER.encode(dict({'success': True}, **result))
+            }
     
-    # If it's just a filename, assume it's in images folder
-    if '.' in photo_path:
-        return f'/images/{photo_path}'
+    with stage('render'):
+        body = catalog_body(products_json, result, media_type)
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Content-Type': media_type,
+            'Access-Control-Allow-Origin': '*'
+        },
+        'body': body
+    }
+
+def resolve_columns(column_names: List[str]) -> Dict[str, Tuple[int, ...]]:
+    """Bind every product field to the indexes of its header cells once per file"""
+    # Duplicate headers read the last value, like csv.DictReader
+    positions: Dict[str, int] = {}
+    for index, column_name in enumerate(column_names):
+        positions[column_name] = index
+    return {
+        field: tuple(positions[name] for name in names if name in positions)
+        for field, names in FIELD_COLUMNS.items()
+    }
+
+def is_xlsx(head: bytes) -> bool:
+    """Check zip local file header signature at the start of the file"""
+    return head.startswith(XLSX_SIGNATURE)
+
+def get_value(row: List[str], indexes: Tuple[int, ...]) -> Optional[str]:
+    """Get the first non-empty raw cell of a field, None when every cell is missing or empty"""
+    for index in indexes:
+        if index < len(row) and row[index]:
+            return row[index]
+    return None
+
+def iter_products(rows: Iterator[Tuple[int, List[str]]], columns: Dict[str, Tuple[int, ...]],
+                  categories: set, integrity: IntegrityIndex) -> Iterator[ProductRecord]:
+    """Map (line, row) pairs to product records based on your column structure"""
+    batch: List[ProductRecord] = []
+    for idx, (line, row) in enumerate(rows):
+        if not row or not any(row):
+            continue
+        
+        # Map your specific columns
+        record = make_record(
+            idx,
+            name=get_value(row, columns['name']),
+            article=get_value(row, columns['article']),
+            brand=get_value(row, columns['brand']),
+            unit=get_value(row, columns['unit']),
+            recommended_price=get_value(row, columns['recommended_price']),
+            dealer_price=get_value(row, columns['dealer_price']),
+            special_offer=get_value(row, columns['special_offer']),
+            discount_percent=get_value(row, columns['discount_percent']),
+            special_price=get_value(row, columns['special_price']),
+            package=get_value(row, columns['package']),
+            barcode=get_value(row, columns['barcode']),
+            photo=get_value(row, columns['photo'])
+        )
+        if record is None:
+            continue
+        
+        record.line = line
+        batch.append(record)
+        if len(batch) >= PRICE_BATCH_SIZE:
+            yield from finish_batch(batch, categories, integrity)
+            batch = []
     
-    # Default fallback
-    return '/img/dc9855aa-d3ba-40f6-91a6-c00afab470de.jpg'
\ No newline at end of file
+    yield from finish_batch(batch, categories, integrity)
+
+def finish_batch(batch: List[ProductRecord], categories: set,
+                 integrity: IntegrityIndex) -> Iterator[ProductRecord]:
+    """Check, then price a batch of records together and collect their categories"""
+    with stage('parse.integrity'):
+        check = integrity.check
+        kept = []
+        for record in batch:
+            keep, record.product_id = check(record.line, record.article, record.barcode)
+            if keep:
+                kept.append(record)
+        batch = kept
+    with stage('parse.pricing'):
+        price_records(batch)
+    for record in batch:
+        categories.add(record.category)
+        yield record
@@ -0,0 +1,168 @@
+import contextvars
+import io
+import json
+import os
+import resource
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+# One structured log line per invocation unless turned off
+TIMING_LOG = os.environ.get('CATALOG_TIMING_LOG', '1') != '0'
+PROFILE_MODES = ('cpu', 'memory')
+PROFILE_TOP = 20
+# debug_info of a response body as json.dumps writes it, decoded from there on
+DEBUG_INFO_KEY = '"debug_info": '
+JSON_DECODER = json.JSONDecoder()
+
+_current: 'contextvars.ContextVar[Optional[Instrumentation]]' = contextvars.ContextVar('instrumentation', default=None)
+
+
+class Instrumentation:
+    """Named stage timers and counters of one invocation"""
+    
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, List[float]] = {}
+        self.counters: Dict[str, int] = {}
+    
+    def add(self, name: str, seconds: float, calls: int = 1) -> None:
+        stage = self.stages.setdefault(name, [0.0, 0])
+        stage[0] += seconds
+        stage[1] += calls
+    
+    def count(self, name: str, value: int) -> None:
+        self.counters[name] = self.counters.get(name, 0) + value
+    
+    def report(self) -> Dict[str, Any]:
+        return {
+            'total_ms': round((time.perf_counter() - self.started) * 1000, 3),
+            'stages': {
+                name: {'ms': round(seconds * 1000, 3), 'calls': calls}
+                for name, (seconds, calls) in self.stages.items()
+            },
+            'counters': dict(self.counters),
+            # Peak of the whole instance, warm instances carry earlier invocations
+            'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        }
+
+
+@contextmanager
+def instrumented() -> Iterator[Instrumentation]:
+    """Make a fresh Instrumentation current for the code inside the block"""
+    instrumentation = Instrumentation()
+    token = _current.set(instrumentation)
+    try:
+        yield instrumentation
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a block under the given stage name, calls add up"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        instrumentation = _current.get()
+        if instrumentation is not None:
+            instrumentation.add(name, time.perf_counter() - started)
+
+
+def add_time(name: str, seconds: float, calls: int = 1) -> None:
+    instrumentation = _current.get()
+    if instrumentation is not None:
+        instrumentation.add(name, seconds, calls)
+
+
+def count(name: str, value: int) -> None:
+    instrumentation = _current.get()
+    if instrumentation is not None:
+        instrumentation.count(name, value)
+
+
+def log_timings(report: Dict[str, Any], context: Any) -> None:
+    """Print the report as one JSON line, picked up by the function logs"""
+    if TIMING_LOG:
+        print(json.dumps(dict({
+            'event': 'timings',
+            'function': getattr(context, 'function_name', None),
+            'request_id': getattr(context, 'request_id', None)
+        }, **report), ensure_ascii=False))
+
+
+def attach_debug_info(response: Dict[str, Any], **entries: Any) -> Dict[str, Any]:
+    """Add entries to debug_info of a JSON response body, None entries are left out
+    
+    Catalog bodies end with debug_info, only that tail is decoded and
+    re-encoded so the product list is not serialized a second time. Other
+    bodies are small and go through a full round trip.
+    """
+    if not response.get('body') or response.get('isBase64Encoded'):
+        return response
+    body = response['body']
+    entries = {name: value for name, value in entries.items() if value is not None}
+    
+    start = body.rfind(DEBUG_INFO_KEY)
+    if start != -1:
+        try:
+            debug_info, end = JSON_DECODER.raw_decode(body, start + len(DEBUG_INFO_KEY))
+        except ValueError:
+            debug_info, end = None, start
+        # A top-level key when only the closing brace of the body follows it
+        if isinstance(debug_info, dict) and body[end:] == '}':
+            debug_info.update(entries)
+            return dict(response, body=''.join([body[:start], DEBUG_INFO_KEY,
+                                                json.dumps(debug_info, ensure_ascii=False), '}']))
+    
+    decoded = json.loads(body)
+    decoded.setdefault('debug_info', {}).update(entries)
+    return dict(response, body=json.dumps(decoded, ensure_ascii=False))
+
+
+def run_profiled(mode: str, top: int, call: Callable[[], Any]) -> Any:
+    """Call under cProfile ('cpu') or tracemalloc ('memory'), return (result, top entries)"""
+    # Profilers are only needed on request, not on every cold start
+    if mode == 'cpu':
+        import cProfile
+        import pstats
+        
+        profiler = cProfile.Profile()
+        result = profiler.runcall(call)
+        stats = pstats.Stats(profiler, stream=io.StringIO())
+        # Hottest by time spent in the function itself, wrappers would top a cumulative sort
+        entries = []
+        for (filename, line, function), (_, calls, own, cumulative, _) in sorted(
+                stats.stats.items(), key=lambda item: item[1][2], reverse=True)[:top]:
+            entries.append({
+                'function': f'{os.path.basename(filename)}:{line}({function})',
+                'calls': calls,
+                'own_ms': round(own * 1000, 3),
+                'cumulative_ms': round(cumulative * 1000, 3)
+            })
+        return result, {'mode': mode, 'top': entries}
+    
+    import tracemalloc
+    
+    tracing = tracemalloc.is_tracing()
+    if not tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.take_snapshot()
+    try:
+        result = call()
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+    entries = [
+        {
+            'location': f'{os.path.basename(diff.traceback[0].filename)}:{diff.traceback[0].lineno}',
+            'size_kb': round(diff.size_diff / 1024, 1),
+            'blocks': diff.count_diff
+        }
+        for diff in after.compare_to(before, 'lineno')[:top]
+    ]
+    return result, {'mode': mode, 'peak_mb': round(peak / 1024 / 1024, 2), 'top': entries}
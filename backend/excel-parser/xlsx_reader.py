@@ -0,0 +1,182 @@
+import functools
+import posixpath
+import zipfile
+from typing import BinaryIO, Dict, Iterator, List, Tuple
+from xml.etree import ElementTree
+from xml.parsers import expat
+
+MAIN_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+REL_NS = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+PACKAGE_REL_NS = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+# Expat reports namespaced tags as 'uri name'
+CELL_TAG = f'{MAIN_NS[1:-1]} c'
+VALUE_TAG = f'{MAIN_NS[1:-1]} v'
+TEXT_TAG = f'{MAIN_NS[1:-1]} t'
+ROW_TAG = f'{MAIN_NS[1:-1]} row'
+
+XML_CHUNK_SIZE = 64 * 1024
+
+def iter_xlsx_rows(file: BinaryIO) -> Iterator[Tuple[int, List[str]]]:
+    """Yield (sheet row number, cells as strings) of the first worksheet, header first"""
+    with zipfile.ZipFile(file) as archive:
+        shared_strings = read_shared_strings(archive)
+        sheet_path = first_sheet_path(archive)
+        with archive.open(sheet_path) as sheet:
+            yield from iter_sheet_rows(sheet, shared_strings)
+
+
+def read_shared_strings(archive: zipfile.ZipFile) -> List[str]:
+    """Stream sharedStrings.xml, keeping only the decoded strings"""
+    try:
+        source = archive.open('xl/sharedStrings.xml')
+    except KeyError:
+        return []
+    
+    strings = []
+    with source:
+        for _, elem in ElementTree.iterparse(source, events=('end',)):
+            if elem.tag == f'{MAIN_NS}si':
+                strings.append(shared_string_text(elem))
+                elem.clear()
+    return strings
+
+
+def shared_string_text(si: ElementTree.Element) -> str:
+    """Plain or rich text of a shared string, phonetic hints are skipped"""
+    parts = []
+    for child in si:
+        if child.tag == f'{MAIN_NS}t':
+            parts.append(child.text or '')
+        elif child.tag == f'{MAIN_NS}r':
+            parts.extend(node.text or '' for node in child.iter(f'{MAIN_NS}t'))
+    return ''.join(parts)
+
+
+def first_sheet_path(archive: zipfile.ZipFile) -> str:
+    """Resolve the first sheet of the workbook through its relationship id"""
+    try:
+        workbook = ElementTree.fromstring(archive.read('xl/workbook.xml'))
+        relations = ElementTree.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+    except KeyError:
+        return 'xl/worksheets/sheet1.xml'
+    
+    sheet = workbook.find(f'{MAIN_NS}sheets/{MAIN_NS}sheet')
+    if sheet is None:
+        return 'xl/worksheets/sheet1.xml'
+    
+    relation_id = sheet.get(f'{REL_NS}id')
+    for relation in relations.iter(f'{PACKAGE_REL_NS}Relationship'):
+        if relation.get('Id') == relation_id:
+            target = relation.get('Target', '')
+            if target.startswith('/'):
+                return target.lstrip('/')
+            return posixpath.normpath(posixpath.join('xl', target))
+    return 'xl/worksheets/sheet1.xml'
+
+
+def iter_sheet_rows(sheet: BinaryIO, shared_strings: List[str]) -> Iterator[Tuple[int, List[str]]]:
+    """Stream sheet XML row by row without building element trees"""
+    parser = SheetRowParser(shared_strings)
+    while True:
+        chunk = sheet.read(XML_CHUNK_SIZE)
+        parser.feed(chunk, final=not chunk)
+        yield from parser.completed_rows
+        parser.completed_rows.clear()
+        if not chunk:
+            break
+
+
+class SheetRowParser:
+    """Expat callbacks collecting finished rows between feeds"""
+    
+    def __init__(self, shared_strings: List[str]):
+        self.shared_strings = shared_strings
+        self.completed_rows: List[Tuple[int, List[str]]] = []
+        self._row: Dict[int, str] = {}
+        # Empty rows are left out of the XML, the r attribute keeps the numbering
+        self._row_number = 0
+        self._position = 0
+        self._cell_type = 'n'
+        self._text: List[str] = []
+        self._in_value = False
+        
+        self._parser = expat.ParserCreate(namespace_separator=' ')
+        self._parser.buffer_text = True
+        self._parser.StartElementHandler = self._start
+        self._parser.EndElementHandler = self._end
+        self._parser.CharacterDataHandler = self._data
+    
+    def feed(self, chunk: bytes, final: bool = False) -> None:
+        try:
+            self._parser.Parse(chunk, final)
+        except expat.ExpatError as e:
+            raise ElementTree.ParseError(str(e))
+    
+    def _start(self, name: str, attrs: Dict[str, str]) -> None:
+        if name == CELL_TAG:
+            ref = attrs.get('r')
+            if ref:
+                self._position = column_index(ref)
+            self._cell_type = attrs.get('t', 'n')
+            self._text = []
+        elif name == VALUE_TAG or name == TEXT_TAG:
+            self._in_value = True
+        elif name == ROW_TAG:
+            ref = attrs.get('r')
+            self._row_number = int(ref) if ref and ref.isdigit() else self._row_number + 1
+    
+    def _data(self, data: str) -> None:
+        if self._in_value:
+            self._text.append(data)
+    
+    def _end(self, name: str) -> None:
+        if name == VALUE_TAG or name == TEXT_TAG:
+            self._in_value = False
+        elif name == CELL_TAG:
+            self._row[self._position] = cell_value(self._cell_type, ''.join(self._text), self.shared_strings)
+            self._position += 1
+        elif name == ROW_TAG:
+            self._position = 0
+            if self._row:
+                row = [''] * (max(self._row) + 1)
+                for index, value in self._row.items():
+                    row[index] = value
+                self.completed_rows.append((self._row_number, row))
+                self._row = {}
+
+
+def column_index(ref: str) -> int:
+    """Convert cell reference like 'AB12' to zero-based column index"""
+    return letters_index(ref.rstrip('0123456789'))
+
+
+@functools.lru_cache(maxsize=1024)
+def letters_index(letters: str) -> int:
+    index = 0
+    for char in letters.upper():
+        index = index * 26 + ord(char) - 64
+    return max(index - 1, 0)
+
+
+def cell_value(cell_type: str, value: str, shared_strings: List[str]) -> str:
+    if cell_type == 's':
+        index = int(value) if value else -1
+        return shared_strings[index] if 0 <= index < len(shared_strings) else ''
+    if cell_type == 'b':
+        return 'TRUE' if value == '1' else 'FALSE'
+    if cell_type == 'n' and value:
+        return format_number(value)
+    # Inline strings, formula strings and errors are kept as written
+    return value
+
+
+def format_number(value: str) -> str:
+    """Render numeric cell like Excel shows it: no '.0' and no exponent for codes"""
+    try:
+        number = float(value)
+    except ValueError:
+        return value
+    if number.is_integer() and abs(number) < 1e16:
+        return str(int(number))
+    return repr(number)
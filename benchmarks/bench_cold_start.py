@@ -0,0 +1,97 @@
+"""Cold start versus warm invocation cost of the parser handlers
+
+Every sample runs in a fresh interpreter, the way a new function instance
+starts: time to import index.py, the first handler call, then the median
+of --warm further calls with the same small upload. The heavy optional
+modules loaded by then are listed, they should stay out of a cold start
+that does not need them. Caching is bypassed so every call parses.
+
+    python benchmarks/bench_cold_start.py --rows 100 --samples 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+FUNCTIONS = ['catalog-parser', 'excel-parser']
+# Imported lazily by the handlers, only when a request needs them
+LAZY_MODULES = ['numpy', 'brotli', 'gzip', 'zipfile', 'xml.parsers.expat', 'multiprocessing', 'cProfile',
+                'tracemalloc']
+
+
+def run_sample(function_name: str, rows: int, warm: int) -> dict:
+    started = time.perf_counter()
+    from common import FakeContext, load_handler_module, make_upload_event
+    from synthetic import generate_catalog
+    helpers_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    module = load_handler_module(function_name)
+    import_seconds = time.perf_counter() - started
+
+    delimiter = '\t' if function_name == 'excel-parser' else ','
+    event = make_upload_event(generate_catalog(rows, delimiter=delimiter), bypassCache=True)
+    latencies = []
+    for _ in range(warm + 1):
+        started = time.perf_counter()
+        response = module.handler(event, FakeContext())
+        latencies.append(time.perf_counter() - started)
+    if response['statusCode'] != 200:
+        raise SystemExit(f'{function_name} answered {response["statusCode"]}: {response["body"][:200]}')
+
+    return {
+        'function': function_name,
+        'rows': rows,
+        'helpers_ms': helpers_seconds * 1000,
+        'import_ms': import_seconds * 1000,
+        'first_call_ms': latencies[0] * 1000,
+        'warm_call_ms': statistics.median(latencies[1:]) * 1000,
+        'lazy_modules_loaded': [name for name in LAZY_MODULES if name in sys.modules]
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--function', nargs='+', default=FUNCTIONS, choices=FUNCTIONS)
+    parser.add_argument('--rows', type=int, default=100)
+    parser.add_argument('--samples', type=int, default=10, help='fresh interpreters per function')
+    parser.add_argument('--warm', type=int, default=5, help='warm calls per sample')
+    parser.add_argument('--sample', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.sample:
+        print(json.dumps(run_sample(**json.loads(args.sample))))
+        return
+
+    for function_name in args.function:
+        samples = []
+        for _ in range(args.samples):
+            sample = json.dumps({'function_name': function_name, 'rows': args.rows, 'warm': args.warm})
+            process = subprocess.run([sys.executable, __file__, '--sample', sample], capture_output=True, text=True)
+            if process.returncode != 0:
+                raise SystemExit(f'sample of {function_name} failed:\n{process.stderr}')
+            samples.append(json.loads(process.stdout))
+
+        def median(key: str) -> float:
+            return round(statistics.median(sample[key] for sample in samples), 1)
+
+        print(json.dumps({
+            'function': function_name,
+            'rows': args.rows,
+            'samples': len(samples),
+            'import_ms': median('import_ms'),
+            'first_call_ms': median('first_call_ms'),
+            'warm_call_ms': median('warm_call_ms'),
+            # What a cold instance adds on top of a warm call
+            'cold_start_ms': round(median('import_ms') + median('first_call_ms') - median('warm_call_ms'), 1),
+            'lazy_modules_loaded': samples[-1]['lazy_modules_loaded']
+        }))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Encoding detection cost and parse time of multi-megabyte catalogs per encoding
+
+Each catalog is rendered in utf-8, utf-8 with BOM and cp1251, parsed by the
+handler, and the encoding entry of debug_info is printed with the timing.
+All encodings must give the same products; attempts above 1 mean the
+detected encoding had to be abandoned and the stream restarted.
+
+    python benchmarks/bench_encoding.py --rows 50000 200000
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import FakeContext, load_handler_module, make_upload_event  # noqa: E402
+from synthetic import generate_catalog  # noqa: E402
+
+ENCODINGS = ['utf-8', 'utf-8-sig', 'cp1251']
+
+
+def measure(module, function_name: str, rows: int, encoding: str, repeat: int) -> dict:
+    delimiter = '\t' if function_name == 'excel-parser' else ','
+    raw = generate_catalog(rows, delimiter=delimiter, encoding=encoding)
+    event = make_upload_event(raw, bypassCache=True)
+
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = module.handler(event, FakeContext())
+        timings.append(time.perf_counter() - started)
+    body = json.loads(response['body'])
+
+    seconds = statistics.median(timings)
+    return {
+        'function': function_name,
+        'file_encoding': encoding,
+        'file_mb': round(len(raw) / 1024 / 1024, 1),
+        'rows': body['total_products'],
+        'seconds': round(seconds, 3),
+        'mb_per_sec': round(len(raw) / 1024 / 1024 / seconds, 1),
+        'encoding': body['debug_info']['encoding'],
+        'products_hash': hash(json.dumps(body['products'], ensure_ascii=False))
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[50_000, 200_000])
+    parser.add_argument('--function', nargs='+', default=['catalog-parser', 'excel-parser'])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    for function_name in args.function:
+        module = load_handler_module(function_name)
+        for rows in args.rows:
+            hashes = set()
+            for encoding in ENCODINGS:
+                result = measure(module, function_name, rows, encoding, args.repeat)
+                hashes.add(result.pop('products_hash'))
+                print(json.dumps(result))
+            if len(hashes) != 1:
+                raise SystemExit(f'{function_name}: products differ between encodings for {rows} rows')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Throughput and peak RSS of the streaming catalog export writers
+
+Products cycle through a pool built from synthetic catalog rows, so the
+source itself costs little time and holds little memory. 'naive' is what exporting looked like without the
+writers: the product list in memory, csv.writer into a StringIO, encoded
+and written at the end. The streaming modes write through catalog_export
+into a temporary file. Every mode runs in a fresh interpreter so
+ru_maxrss is not shared between them.
+
+    python benchmarks/bench_export.py --rows 100000 1000000
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'catalog-export'))
+
+from catalog_export import iter_export_rows, write_csv, write_xlsx  # noqa: E402
+from synthetic import iter_rows  # noqa: E402
+
+MODES = ('naive', 'stream_csv', 'stream_xlsx')
+POOL_SIZE = 10_000
+
+
+def max_rss_mb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def make_products(count: int) -> list:
+    catalog = iter_rows(count)
+    next(catalog)
+    products = []
+    for idx, row in enumerate(catalog):
+        dealer = float(row[5].replace(',', '.'))
+        products.append({
+            'id': f'item_{idx}', 'name': row[2], 'article': row[0], 'brand': row[1], 'category': row[1],
+            'price': dealer, 'basePrice': dealer, 'recommendedPrice': float(row[4]), 'unit': row[3],
+            'package': row[9], 'barcode': row[10], 'image': row[11], 'inStock': True,
+            'hasSpecialPricing': False, 'specialOffer': row[6], 'discountPercent': row[7],
+            'specialPrice': None, 'description': ''
+        })
+    return products
+
+
+def iter_products(rows: int):
+    # A small pool cycled through, so generating products costs next to nothing
+    pool = make_products(min(rows, POOL_SIZE))
+    for idx in range(rows):
+        yield pool[idx % len(pool)]
+
+
+def export_naive(rows: int, file) -> None:
+    products = list(iter_products(rows))
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows(iter_export_rows(products))
+    file.write(buffer.getvalue().encode('utf-8'))
+
+
+def measure(mode: str, rows: int) -> dict:
+    baseline_mb = max_rss_mb()
+    with tempfile.TemporaryFile() as file:
+        started = time.perf_counter()
+        if mode == 'naive':
+            export_naive(rows, file)
+        elif mode == 'stream_csv':
+            write_csv(iter_export_rows(iter_products(rows)), file)
+        else:
+            write_xlsx(iter_export_rows(iter_products(rows)), file)
+        elapsed = time.perf_counter() - started
+        size = file.tell()
+    return {
+        'mode': mode,
+        'rows': rows,
+        'seconds': round(elapsed, 2),
+        'rows_per_sec': round(rows / elapsed),
+        'output_mb': round(size / 1024 / 1024, 1),
+        'rss_mb': round(max_rss_mb() - baseline_mb, 1)
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000])
+    parser.add_argument('--mode', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(measure(args.mode[0], args.rows[0])))
+        return
+
+    for rows in args.rows:
+        for mode in args.mode:
+            output = subprocess.run(
+                [sys.executable, __file__, '--worker', '--mode', mode, '--rows', str(rows)],
+                check=True, capture_output=True, text=True
+            ).stdout
+            print(output.strip())
+
+
+if __name__ == '__main__':
+    main()
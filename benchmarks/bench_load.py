@@ -0,0 +1,263 @@
+"""Concurrent load test of the backend handlers through the local HTTP server
+
+A mix of admin imports (synthetic uploads to catalog-parser with persist,
+tab-separated ones to excel-parser), catalog reads (catalog-store pages)
+and CORS preflights is replayed by --concurrency clients, each on its own
+keep-alive connection, until --requests have been sent. The server from
+local_server.py is started in-process on a free port with a temporary
+catalog store, so the test needs no network and no deployed functions;
+--url points it at a server started separately instead.
+
+One JSON line per request kind and one for the whole run: throughput,
+p50/p95/p99 latency as the client sees it, handler time inside the
+instance, error rate (5xx and broken connections) and the peak RSS an
+instance gained during a request. The exit status is 1 when the error rate
+is above --max-error-rate, so the test can gate a CI job.
+
+    python benchmarks/bench_load.py --concurrency 8 --instances 4 --requests 200 --rows 2000
+    python benchmarks/bench_load.py --mix catalog-parser=1 catalog-store=9 --concurrency 32
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import make_upload_event, percentile  # noqa: E402
+from local_server import LocalServer  # noqa: E402
+from synthetic import BRANDS, generate_catalog  # noqa: E402
+
+# Request kinds and their share of the requests by default
+DEFAULT_MIX = {'catalog-parser': 2, 'excel-parser': 1, 'catalog-store': 6, 'options': 1}
+# What a browser sends, compressed catalog responses included
+CLIENT_HEADERS = {'Accept': 'application/json', 'Accept-Encoding': 'gzip', 'Origin': 'http://localhost:5173'}
+
+Request = Tuple[str, str, Dict[str, str], bytes]
+
+
+def upload_requests(function_name: str, files: List[bytes], **extra: Any) -> List[Request]:
+    """POST requests of the synthetic files, bodies built once ahead of the run"""
+    requests = []
+    for index, raw in enumerate(files):
+        body = make_upload_event(raw, f'catalog-{index}.csv', **extra)['body'].encode('utf-8')
+        headers = dict(CLIENT_HEADERS, **{'Content-Type': 'application/json'})
+        requests.append(('POST', f'/{function_name}', headers, body))
+    return requests
+
+
+def request_makers(rows: int, files: int, seed: int) -> Dict[str, Callable[[random.Random], Request]]:
+    comma_files = [generate_catalog(rows, seed=seed + index) for index in range(files)]
+    # excel-parser reads tab-separated exports only
+    tab_files = [generate_catalog(rows, seed=seed + index, delimiter='\t') for index in range(files)]
+    imports = upload_requests('catalog-parser', comma_files, bypassCache=True, persist=True)
+    excel_imports = upload_requests('excel-parser', tab_files)
+
+    def catalog_page(rng: random.Random) -> Request:
+        params = {'page': rng.randint(1, 5), 'pageSize': 24}
+        if rng.random() < 0.5:
+            params['category'] = rng.choice(BRANDS)
+        if rng.random() < 0.3:
+            params['sort'] = 'price_asc'
+        return 'GET', '/catalog-store?' + urlencode(params), dict(CLIENT_HEADERS), b''
+
+    def preflight(rng: random.Random) -> Request:
+        return 'OPTIONS', '/catalog-parser', dict(CLIENT_HEADERS, **{
+            'Access-Control-Request-Method': 'POST',
+            'Access-Control-Request-Headers': 'Content-Type'
+        }), b''
+
+    return {
+        'catalog-parser': lambda rng: rng.choice(imports),
+        'excel-parser': lambda rng: rng.choice(excel_imports),
+        'catalog-store': catalog_page,
+        'options': preflight
+    }
+
+
+async def read_response(reader: asyncio.StreamReader) -> Tuple[int, Dict[str, str], bytes]:
+    head = await reader.readuntil(b'\r\n\r\n')
+    status_line, *header_lines = head.decode('latin-1').rstrip('\r\n').split('\r\n')
+    headers = {}
+    for line in header_lines:
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers.get('content-length') or 0))
+    return int(status_line.split(' ', 2)[1]), headers, body
+
+
+class Client:
+    """One keep-alive HTTP/1.1 connection, reopened after errors"""
+
+    def __init__(self, host: str, port: int, timeout: float):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.connection: Optional[Tuple[asyncio.StreamReader, asyncio.StreamWriter]] = None
+
+    async def send(self, request: Request) -> Tuple[int, Dict[str, str], bytes]:
+        method, target, headers, body = request
+        if self.connection is None:
+            self.connection = await asyncio.open_connection(self.host, self.port, limit=1024 * 1024)
+        reader, writer = self.connection
+        lines = [f'{method} {target} HTTP/1.1', f'Host: {self.host}:{self.port}', f'Content-Length: {len(body)}']
+        lines.extend(f'{name}: {value}' for name, value in headers.items())
+        try:
+            writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+            await writer.drain()
+            status, response_headers, content = await asyncio.wait_for(read_response(reader), self.timeout)
+        except BaseException:
+            self.close()
+            raise
+        if response_headers.get('connection') == 'close':
+            self.close()
+        return status, response_headers, content
+
+    def close(self) -> None:
+        if self.connection is not None:
+            self.connection[1].close()
+            self.connection = None
+
+
+def check_response(kind: str, status: int, headers: Dict[str, str]) -> Optional[str]:
+    """Why an answer is an error: server errors and preflights without CORS headers"""
+    if status >= 500:
+        return f'status {status}'
+    if kind == 'options' and (status != 200 or headers.get('access-control-allow-origin') != '*'):
+        return 'preflight without CORS headers'
+    return None
+
+
+async def run_load(url: str, makers: Dict[str, Callable[[random.Random], Request]], mix: Dict[str, int],
+                   requests: int, concurrency: int, timeout: float, seed: int) -> Tuple[List[Dict[str, Any]], float]:
+    target = urlsplit(url)
+    rng = random.Random(seed)
+    kinds = rng.choices(list(mix), weights=list(mix.values()), k=requests)
+    queue = [(kind, makers[kind](rng)) for kind in kinds]
+    queue.reverse()
+    results = []
+
+    async def worker() -> None:
+        client = Client(target.hostname, target.port, timeout)
+        while queue:
+            kind, request = queue.pop()
+            started = time.perf_counter()
+            try:
+                status, headers, content = await client.send(request)
+                error = check_response(kind, status, headers)
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+                status, headers, content, error = 0, {}, b'', type(e).__name__
+            results.append({
+                'kind': kind,
+                'status': status,
+                'seconds': time.perf_counter() - started,
+                'error': error,
+                'response_bytes': len(content),
+                'handler_ms': float(headers.get('x-handler-ms') or 0),
+                'rss_gain_kb': max(0, int(headers.get('x-peak-rss-kb') or 0) - int(headers.get('x-rss-base-kb') or 0))
+            })
+        client.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return results, time.perf_counter() - started
+
+
+def summarize(label: str, results: List[Dict[str, Any]], wall_seconds: float) -> Dict[str, Any]:
+    latencies = [result['seconds'] * 1000 for result in results]
+    statuses: Dict[str, int] = {}
+    for result in results:
+        statuses[str(result['status'])] = statuses.get(str(result['status']), 0) + 1
+    errors = [result['error'] for result in results if result['error']]
+    rss_gains = [result['rss_gain_kb'] / 1024 for result in results]
+    return {
+        'kind': label,
+        'requests': len(results),
+        'requests_per_sec': round(len(results) / wall_seconds, 2),
+        'p50_ms': round(percentile(latencies, 0.5), 1),
+        'p95_ms': round(percentile(latencies, 0.95), 1),
+        'p99_ms': round(percentile(latencies, 0.99), 1),
+        'max_ms': round(max(latencies), 1),
+        'handler_p50_ms': round(percentile([result['handler_ms'] for result in results], 0.5), 1),
+        'error_rate': round(len(errors) / len(results), 4),
+        'errors': sorted(set(errors))[:5],
+        'statuses': statuses,
+        'rss_gain_p50_mb': round(percentile(rss_gains, 0.5), 1),
+        'rss_gain_max_mb': round(max(rss_gains), 1),
+        'response_kb_avg': round(sum(result['response_bytes'] for result in results) / len(results) / 1024, 1)
+    }
+
+
+def parse_mix(values: Optional[List[str]]) -> Dict[str, int]:
+    if not values:
+        return dict(DEFAULT_MIX)
+    mix = {}
+    for value in values:
+        kind, _, weight = value.partition('=')
+        if kind not in DEFAULT_MIX:
+            raise SystemExit(f'unknown request kind {kind}, expected one of {", ".join(DEFAULT_MIX)}')
+        mix[kind] = int(weight or 1)
+    return mix
+
+
+async def main_async(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    mix = parse_mix(args.mix)
+    makers = request_makers(args.rows, args.files, args.seed)
+    server = None
+    url = args.url
+    if url is None:
+        server = LocalServer(instances=args.instances)
+        url = await server.start()
+    try:
+        if mix.get('catalog-store'):
+            # Reads of an empty store would measure nothing, import one catalog first
+            await run_load(url, makers, {'catalog-parser': 1}, 1, 1, args.timeout, args.seed)
+        results, wall_seconds = await run_load(url, makers, mix, args.requests, args.concurrency,
+                                               args.timeout, args.seed)
+    finally:
+        if server is not None:
+            await server.close()
+
+    lines = [summarize(kind, [result for result in results if result['kind'] == kind], wall_seconds)
+             for kind in mix if any(result['kind'] == kind for result in results)]
+    lines.append(summarize('total', results, wall_seconds))
+    return lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='base URL of a running local_server.py, one is started by default')
+    parser.add_argument('--instances', type=int, default=4, help='handler processes of the started server')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--rows', type=int, default=2000, help='rows per synthetic upload')
+    parser.add_argument('--files', type=int, default=4, help='distinct synthetic files per parser')
+    parser.add_argument('--mix', nargs='+', metavar='KIND=WEIGHT',
+                        help=f'request kinds and weights, {" ".join(f"{k}={v}" for k, v in DEFAULT_MIX.items())} by default')
+    parser.add_argument('--timeout', type=float, default=300, help='seconds per request')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    print(json.dumps({'url': args.url or 'local', 'instances': args.instances, 'concurrency': args.concurrency,
+                      'requests': args.requests, 'rows': args.rows, 'cpu_count': os.cpu_count()}), flush=True)
+    with tempfile.TemporaryDirectory() as directory:
+        # Spawned instances inherit the environment, keep their stores out of the shared temp dirs
+        for name, path in (('CATALOG_STORE_PATH', 'catalog.sqlite3'), ('IMPORT_JOB_DIR', 'jobs'),
+                           ('CHUNKED_UPLOAD_DIR', 'uploads'), ('CATALOG_EXPORT_DIR', 'exports')):
+            os.environ.setdefault(name, os.path.join(directory, path))
+        lines = asyncio.run(main_async(args))
+    for line in lines:
+        print(json.dumps(line, ensure_ascii=False))
+    if lines[-1]['error_rate'] > args.max_error_rate:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
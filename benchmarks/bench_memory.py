@@ -0,0 +1,74 @@
+"""Peak RSS of the parser handlers on synthetic catalogs of growing size
+
+Every measurement runs in a fresh interpreter so ru_maxrss is not shared
+between sizes. The event is built before the baseline is taken, so the
+reported delta is the memory the handler itself needs on top of the request.
+
+    python benchmarks/bench_memory.py --rows 10000 100000 1000000
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import FakeContext, load_handler_module, make_upload_event  # noqa: E402
+from synthetic import generate_catalog  # noqa: E402
+
+
+def max_rss_mb() -> float:
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def measure(function_name: str, rows: int) -> dict:
+    module = load_handler_module(function_name)
+    delimiter = '\t' if function_name == 'excel-parser' else ','
+    event = make_upload_event(generate_catalog(rows, delimiter=delimiter))
+    request_mb = len(event['body']) / 1024 / 1024
+    baseline_mb = max_rss_mb()
+
+    started = time.perf_counter()
+    response = module.handler(event, FakeContext())
+    elapsed = time.perf_counter() - started
+
+    peak_mb = max_rss_mb()
+    return {
+        'function': function_name,
+        'rows': rows,
+        'status': response['statusCode'],
+        'request_mb': round(request_mb, 1),
+        'response_mb': round(len(response['body']) / 1024 / 1024, 1),
+        'baseline_rss_mb': round(baseline_mb, 1),
+        'peak_rss_mb': round(peak_mb, 1),
+        'handler_rss_mb': round(peak_mb - baseline_mb, 1),
+        'seconds': round(elapsed, 2)
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--function', nargs='+', default=['catalog-parser', 'excel-parser'])
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(measure(args.function[0], args.rows[0])))
+        return
+
+    for function_name in args.function:
+        for rows in args.rows:
+            output = subprocess.run(
+                [sys.executable, __file__, '--worker', '--function', function_name, '--rows', str(rows)],
+                check=True, capture_output=True, text=True
+            ).stdout
+            print(output.strip())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Serial vs process-pool throughput of catalog-parser on one synthetic catalog
+
+The serial run is the default streaming parse. Parallel runs send
+parallelWorkers in the request, the pool is warmed up once before timing so
+process start-up is not counted, the same way a warm instance reuses it.
+Every parallel response is checked against the serial one.
+
+    python benchmarks/bench_parallel.py --rows 1000000 --workers 1 2 4 8
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import FakeContext, load_handler_module, make_upload_event  # noqa: E402
+from synthetic import generate_catalog  # noqa: E402
+
+
+def run(module, event: dict) -> tuple:
+    started = time.perf_counter()
+    response = module.handler(event, FakeContext())
+    elapsed = time.perf_counter() - started
+    body = json.loads(response['body'])
+    body.pop('cache', None)
+    body['debug_info'].pop('parallel', None)
+    body['debug_info'].pop('encoding', None)
+    return elapsed, body
+
+
+def measure(module, raw: bytes, workers: int, repeat: int, expected: dict = None) -> dict:
+    extra = {'bypassCache': True}
+    if workers:
+        extra['parallelWorkers'] = workers
+    event = make_upload_event(raw, **extra)
+    if workers:
+        run(module, event)
+
+    timings = []
+    for _ in range(repeat):
+        elapsed, body = run(module, event)
+        timings.append(elapsed)
+        if expected is not None and body != expected:
+            raise SystemExit(f'parallel output with {workers} workers differs from serial')
+
+    seconds = statistics.median(timings)
+    return {
+        'mode': f'parallel-{workers}' if workers else 'serial',
+        'rows': body['total_products'],
+        'seconds': round(seconds, 3),
+        'rows_per_sec': round(body['total_products'] / seconds),
+        'body': body
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    module = load_handler_module('catalog-parser')
+    raw = generate_catalog(args.rows)
+    print(json.dumps({'rows': args.rows, 'file_mb': round(len(raw) / 1024 / 1024, 1), 'cpu_count': os.cpu_count()}))
+
+    serial = measure(module, raw, 0, args.repeat)
+    expected = serial.pop('body')
+    print(json.dumps(dict(serial, speedup=1.0)))
+    for workers in args.workers:
+        result = measure(module, raw, workers, args.repeat, expected)
+        result.pop('body')
+        result['speedup'] = round(serial['seconds'] / result['seconds'], 2)
+        print(json.dumps(result))
+
+    for pool in module.PARSE_POOLS.values():
+        pool.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""Throughput of the single-pass price tokenizer against the regex-per-cell parser it replaced
+
+Millions of price cells are drawn from the shapes supplier price lists
+actually contain: plain numbers, ru and en grouping, currency signs and
+suffixes, percent signs, NBSP, empty cells and text. Both parsers run over
+the same cells; the report gives cells per second and how each parser
+treats cells that are not prices (the old one silently returns 0.0).
+
+    python benchmarks/bench_price_parse.py --cells 2000000
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'catalog-parser'))
+
+import catalog_core  # noqa: E402
+
+LEGACY_NOISE_RE = re.compile(r'[₽$€\s]')
+
+
+def legacy_parse_price(price_value):
+    """parse_price as it was before the tokenizer, kept for comparison"""
+    price_str = catalog_core.clean_text(price_value)
+    if not price_str:
+        return 0.0
+    price_str = LEGACY_NOISE_RE.sub('', price_str)
+    if price_str.count(',') == 1 and price_str.count('.') == 0:
+        price_str = price_str.replace(',', '.')
+    elif ',' in price_str:
+        price_str = price_str.replace(',', '')
+    try:
+        return float(price_str)
+    except (ValueError, TypeError):
+        return 0.0
+
+
+def random_cell(rng: random.Random) -> str:
+    value = rng.uniform(1, 250000)
+    roll = rng.random()
+    if roll < 0.45:
+        return str(round(value, rng.choice([0, 2])))
+    if roll < 0.6:
+        return f'{value:,.2f}'.replace(',', ' ').replace('.', ',')
+    if roll < 0.68:
+        return f'{value:,.2f}'.replace(',', ' ').replace('.', ',') + ' ₽'
+    if roll < 0.74:
+        return f'{value:,.2f}'.replace(',', '#').replace('.', ',').replace('#', '.')
+    if roll < 0.8:
+        return f'{value:,.2f}'
+    if roll < 0.85:
+        return f'${value:.2f}'
+    if roll < 0.88:
+        return f'{int(value)} руб.'
+    if roll < 0.92:
+        return f'{rng.choice([5, 10, 15, 25])}%'
+    if roll < 0.97:
+        return rng.choice(['', 'nan', ' '])
+    return rng.choice(['по запросу', 'договорная', '—', '12-15', 'N/A'])
+
+
+def measure(name: str, parse, cells: list) -> dict:
+    started = time.perf_counter()
+    results = [parse(cell) for cell in cells]
+    seconds = time.perf_counter() - started
+    return {
+        'parser': name,
+        'cells': len(cells),
+        'seconds': round(seconds, 3),
+        'cells_per_sec': round(len(cells) / seconds),
+        'failed_cells': sum(1 for result in results if result is None)
+    }, results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--cells', type=int, default=2_000_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    distinct = [random_cell(rng) for _ in range(min(args.cells, 200_000))]
+    cells = [distinct[i % len(distinct)] for i in range(args.cells)]
+    plain = [cell for cell in cells if cell.replace('.', '', 1).isdecimal()]
+    decorated = [cell for cell in cells if not cell.replace('.', '', 1).isdecimal()]
+
+    for shape, shape_cells in (('all', cells), ('plain', plain), ('decorated', decorated)):
+        legacy, legacy_results = measure('regex', legacy_parse_price, shape_cells)
+        tokenizer, results = measure('tokenizer', catalog_core.try_parse_price, shape_cells)
+        legacy['shape'] = tokenizer['shape'] = shape
+        legacy['speedup'] = 1.0
+        tokenizer['speedup'] = round(legacy['seconds'] / tokenizer['seconds'], 2)
+        # Cells the old parser read as a different number or silently as 0.0
+        tokenizer['changed_values'] = sum(
+            1 for old, new in zip(legacy_results, results) if new is not None and abs(old - new) > 1e-9
+        )
+        print(json.dumps(legacy))
+        print(json.dumps(tokenizer))
+
+
+if __name__ == '__main__':
+    main()
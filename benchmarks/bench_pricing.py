@@ -0,0 +1,68 @@
+"""Throughput of the columnar pricing engine against the scalar rules
+
+Both paths are timed on realistic batches. That they agree row for row is
+checked by tests/test_pricing.py.
+
+    python benchmarks/bench_pricing.py --rows 1000000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'catalog-parser'))
+
+import pricing  # noqa: E402
+
+def measure(rows: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    batch = pricing.PRICE_BATCH_SIZE
+    batches = []
+    for _ in range(max(1, rows // batch)):
+        recommended = [float(rng.randint(10, 5000)) for _ in range(batch)]
+        batches.append((
+            recommended,
+            [round(price * rng.uniform(0.6, 0.9), 2) for price in recommended],
+            [round(price * 0.7, 2) if rng.random() < 0.05 else 0.0 for price in recommended],
+            [0.0] * batch,
+            [rng.random() < 0.02 for _ in range(batch)],
+            [float(rng.choice([5, 10, 15, 20])) if rng.random() < 0.05 else 0.0 for _ in range(batch)],
+            [rng.random() < 0.05 for _ in range(batch)]
+        ))
+
+    started = time.perf_counter()
+    for columns in batches:
+        [pricing.compute_price(*row) for row in zip(*columns)]
+    scalar = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for columns in batches:
+        pricing.compute_prices(columns)
+    vectorized = time.perf_counter() - started
+
+    total = len(batches) * batch
+    return {
+        'rows': total,
+        'numpy': pricing.load_numpy() is not None,
+        'scalar_rows_per_sec': round(total / scalar),
+        'vectorized_rows_per_sec': round(total / vectorized),
+        'speedup': round(scalar / vectorized, 2)
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if pricing.load_numpy() is None:
+        raise SystemExit('numpy is not installed, compute_prices only runs the scalar path')
+
+    print(json.dumps(measure(args.rows, args.seed)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Latency of pricing large orders with the cart-quote handler
+
+Products come from catalog-parser output for a synthetic catalog, stored
+in a temporary catalog store. The first quote builds the price table,
+the rest reuse it. Each order has --lines random lines, a tenth of them
+by barcode, and is timed through the handler --quotes times.
+
+    python benchmarks/bench_quote.py --rows 100000 --lines 1000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import FakeContext, load_handler_module, make_upload_event  # noqa: E402
+from synthetic import generate_catalog  # noqa: E402
+
+
+def make_order(products: list, lines: int, rng: random.Random) -> dict:
+    items = []
+    for product in rng.sample(products, lines):
+        key = 'barcode' if rng.random() < 0.1 else 'article'
+        items.append({key: product[key], 'quantity': rng.randint(1, 100)})
+    return {'items': items, 'dealerDiscount': rng.choice([0, 5, 10, 15])}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--lines', type=int, default=1000)
+    parser.add_argument('--quotes', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ['CATALOG_STORE_PATH'] = os.path.join(directory, 'catalog.sqlite3')
+        parser_module = load_handler_module('catalog-parser')
+        response = parser_module.handler(make_upload_event(generate_catalog(args.rows), persist=True), FakeContext())
+        print(json.dumps(dict(json.loads(response['body'])['stored'], load='persist', rows=args.rows)))
+        from catalog_store import default_catalog_store
+        store = default_catalog_store()
+        products = [{'article': row[0], 'barcode': row[1]} for row in store.price_rows()]
+
+        module = load_handler_module('cart-quote')
+        rng = random.Random(args.seed)
+        timings = []
+        for attempt in range(args.quotes + 1):
+            event = {'httpMethod': 'POST', 'body': json.dumps(make_order(products, args.lines, rng))}
+            started = time.perf_counter()
+            response = module.handler(event, FakeContext())
+            elapsed = (time.perf_counter() - started) * 1000
+            body = json.loads(response['body'])
+            if attempt == 0:
+                print(json.dumps({
+                    'quote': 'first', 'lines': args.lines, 'ms': round(elapsed, 3),
+                    'table_build_ms': module.TABLES.get().build_ms, 'missing': len(body['missing'])
+                }))
+            else:
+                timings.append(elapsed)
+        timings.sort()
+        print(json.dumps({
+            'quote': 'warm',
+            'lines': args.lines,
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(timings[int(len(timings) * 0.95) - 1], 3),
+            'last_total': body['totals']['total']
+        }))
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
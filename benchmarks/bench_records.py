@@ -0,0 +1,79 @@
+"""Per-product memory and allocations: product dicts versus ProductRecord
+
+Rows of a synthetic catalog are mapped twice: once to the 18-key product
+dicts the parsers used to build for every row, once to slotted
+ProductRecord objects. tracemalloc reports the bytes and memory blocks
+still held per product, and the peak bytes per product while building.
+
+    python benchmarks/bench_records.py --rows 100000
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'catalog-parser'))
+
+from synthetic import generate_catalog  # noqa: E402
+
+import catalog_core  # noqa: E402
+
+
+def read_rows(rows: int) -> list:
+    return list(csv.reader(io.StringIO(generate_catalog(rows).decode('utf-8'))))[1:]
+
+
+def build_records(rows: list) -> list:
+    records = []
+    for idx, row in enumerate(rows):
+        records.append(catalog_core.make_record(
+            idx, name=row[2], article=row[0], brand=row[1], unit=row[3], recommended_price=row[4],
+            dealer_price=row[5], special_offer=row[6], discount_percent=row[7], special_price=row[8],
+            package=row[9], barcode=row[10], photo=row[11]
+        ))
+    catalog_core.price_records(records)
+    return records
+
+
+def build_dicts(rows: list) -> list:
+    return [record.to_dict() for record in build_records(rows)]
+
+
+def measure(label: str, build, rows: list) -> dict:
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    products = build(rows)
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stats = after.compare_to(before, 'filename')
+    held_bytes = sum(stat.size_diff for stat in stats)
+    held_blocks = sum(stat.count_diff for stat in stats)
+    count = len(products)
+    return {
+        'shape': label,
+        'products': count,
+        'bytes_per_product': round(held_bytes / count),
+        'blocks_per_product': round(held_blocks / count, 1),
+        'peak_bytes_per_product': round(peak / count)
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    args = parser.parse_args()
+
+    rows = read_rows(args.rows)
+    print(json.dumps(measure('dict', build_dicts, rows)))
+    print(json.dumps(measure('ProductRecord', build_records, rows)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""Serialization time and payload size of catalog-parser responses per encoding
+
+A synthetic catalog is parsed once, then the same parsed result is rendered
+as the default JSON body and as the columnar variant, each uncompressed,
+gzip and brotli (skipped when the brotli module is not installed). Time
+covers building the body string and compressing it; the parse itself is
+served from the warm cache and not counted.
+
+    python benchmarks/bench_response.py --rows 10000 100000
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import FakeContext, load_handler_module, make_upload_event  # noqa: E402
+from synthetic import generate_catalog  # noqa: E402
+
+COLUMNAR = 'application/vnd.catalog.columnar+json'
+MODES = [
+    ('json', 'application/json', None),
+    ('json+gzip', 'application/json', 'gzip'),
+    ('json+br', 'application/json', 'br'),
+    ('columnar', COLUMNAR, None),
+    ('columnar+gzip', COLUMNAR, 'gzip'),
+    ('columnar+br', COLUMNAR, 'br')
+]
+
+
+def measure(module, event: dict, mode: str, accept: str, accept_encoding, repeat: int) -> dict:
+    event = dict(event, headers={'Accept': accept, 'Accept-Encoding': accept_encoding or 'identity'})
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = module.handler(event, FakeContext())
+        timings.append(time.perf_counter() - started)
+    assert response['statusCode'] == 200, response['body'][:200]
+    assert response['headers'].get('Content-Encoding') == accept_encoding, response['headers']
+    return {
+        'mode': mode,
+        'ms': round(statistics.median(timings) * 1000, 1),
+        'body_bytes': len(response['body']),
+        # What goes over the wire once the gateway decodes base64 bodies
+        'wire_bytes': len(response['body']) * 3 // 4 if response.get('isBase64Encoded') else len(response['body'].encode('utf-8'))
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    module = load_handler_module('catalog-parser')
+    brotli_available = module.negotiate({'Accept-Encoding': 'br'})[1] == 'br'
+    for rows in args.rows:
+        event = make_upload_event(generate_catalog(rows))
+        # Warm the parse cache so only rendering is timed
+        module.handler(event, FakeContext())
+        print(json.dumps({'rows': rows, 'brotli': brotli_available}))
+        for mode, accept, accept_encoding in MODES:
+            if accept_encoding == 'br' and not brotli_available:
+                continue
+            print(json.dumps(measure(module, event, mode, accept, accept_encoding, args.repeat)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""Index build time and query throughput of catalog-search on a parsed catalog
+
+The synthetic catalog goes through catalog-parser first, so the search
+function indexes exactly what the browser would send it. Queries mix
+typed prefixes, multi-word Russian queries, articles, barcodes, category
+and price filters; every query is answered through the handler.
+
+    python benchmarks/bench_search.py --rows 100000 --queries 5000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import FakeContext, load_handler_module, make_upload_event  # noqa: E402
+from synthetic import BRANDS, COLORS, ITEMS, generate_catalog  # noqa: E402
+
+
+def make_queries(products: list, count: int, seed: int) -> list:
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        product = rng.choice(products)
+        roll = rng.random()
+        if roll < 0.3:
+            word = rng.choice(ITEMS).split()[0]
+            query = {'query': word[:rng.randint(2, len(word))]}
+        elif roll < 0.5:
+            query = {'query': f'{rng.choice(ITEMS).split()[0]} {rng.choice(COLORS)}'}
+        elif roll < 0.6:
+            query = {'query': product['article']}
+        elif roll < 0.7:
+            query = {'query': product['barcode']}
+        elif roll < 0.85:
+            query = {'query': rng.choice(ITEMS).split()[0].lower(), 'category': rng.choice(BRANDS)}
+        else:
+            low = rng.randint(10, 3000)
+            query = {'minPrice': low, 'maxPrice': low + rng.randint(10, 500), 'sort': 'price_asc'}
+        queries.append(dict(query, action='search'))
+    return queries
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--queries', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    catalog_parser = load_handler_module('catalog-parser')
+    search = load_handler_module('catalog-search')
+    parsed = json.loads(catalog_parser.handler(make_upload_event(generate_catalog(args.rows)), FakeContext())['body'])
+    products = parsed['products']
+
+    load_event = {'httpMethod': 'POST', 'body': json.dumps({'action': 'load', 'products': products})}
+    started = time.perf_counter()
+    loaded = json.loads(search.handler(load_event, FakeContext())['body'])
+    load_seconds = time.perf_counter() - started
+    print(json.dumps({'products': len(products), 'load_seconds': round(load_seconds, 2), 'index': loaded['index']}))
+
+    queries = make_queries(products, args.queries, args.seed)
+    events = [
+        {'httpMethod': 'POST', 'body': json.dumps(dict(query, catalogId=loaded['catalogId']))}
+        for query in queries
+    ]
+
+    search_ms = []
+    totals = []
+    started = time.perf_counter()
+    for event in events:
+        body = json.loads(search.handler(event, FakeContext())['body'])
+        search_ms.append(body['took_ms'])
+        totals.append(body['total'])
+    elapsed = time.perf_counter() - started
+
+    search_ms.sort()
+    print(json.dumps({
+        'queries': len(events),
+        'queries_per_sec': round(len(events) / elapsed),
+        'search_ms_p50': search_ms[len(search_ms) // 2],
+        'search_ms_p95': search_ms[int(len(search_ms) * 0.95)],
+        'search_ms_max': search_ms[-1],
+        'median_hits': statistics.median(totals)
+    }))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Bulk upsert throughput and query latency of the SQLite catalog store
+
+Products come from catalog-parser output for a synthetic catalog. The
+first load inserts every row, the second upserts the same articles again
+(all updates). Queries run the shapes the catalog page sends, each timed
+--queries times, reported as p50/p95 in milliseconds.
+
+    python benchmarks/bench_store.py --rows 100000
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import FakeContext, load_handler_module, make_upload_event  # noqa: E402
+from synthetic import BRANDS, generate_catalog  # noqa: E402
+
+
+def parse_products(rows: int) -> list:
+    module = load_handler_module('catalog-parser')
+    response = module.handler(make_upload_event(generate_catalog(rows)), FakeContext())
+    return json.loads(response['body'])['products']
+
+
+def query_shapes(rng: random.Random) -> dict:
+    return {
+        'first_page': lambda: {},
+        'category_price_sorted': lambda: {'category': rng.choice(BRANDS), 'sort': 'price_asc'},
+        'price_range_deep_page': lambda: {'min_price': 100.0, 'max_price': 1000.0, 'page': rng.randint(1, 50)},
+        'brand_and_name': lambda: {'brand': rng.choice(BRANDS), 'query': 'Блокнот'},
+        'barcode_lookup': lambda: {'barcode': f'460{rng.randint(0, 10 ** 10 - 1):010d}'}
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    products = parse_products(args.rows)
+    from catalog_store import CatalogStore
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = CatalogStore(os.path.join(directory, 'catalog.sqlite3'))
+        for label in ('insert', 'update'):
+            started = time.perf_counter()
+            stats = store.upsert(products)
+            elapsed = time.perf_counter() - started
+            print(json.dumps(dict(stats, load=label, rows=len(products), rows_per_sec=round(len(products) / elapsed))))
+
+        rng = random.Random(args.seed)
+        for name, make_params in query_shapes(rng).items():
+            timings = []
+            for _ in range(args.queries):
+                params = make_params()
+                started = time.perf_counter()
+                result = store.query(**params)
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            print(json.dumps({
+                'query': name,
+                'p50_ms': round(statistics.median(timings), 3),
+                'p95_ms': round(timings[int(len(timings) * 0.95) - 1], 3),
+                'last_total': result['total']
+            }))
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
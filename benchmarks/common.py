@@ -0,0 +1,51 @@
+"""Helpers shared by the local benchmarks of the backend functions"""
+import base64
+import importlib.util
+import json
+import os
+import sys
+from types import ModuleType
+from typing import Any, Dict
+
+# Handlers print a timing line per invocation, benchmarks print their own results
+os.environ.setdefault('CATALOG_TIMING_LOG', '0')
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+
+
+class FakeContext:
+    """Minimal stand-in for the cloud function context object"""
+
+    def __init__(self, request_id: str = 'bench-request', function_name: str = 'bench'):
+        self.request_id = request_id
+        self.function_name = function_name
+
+
+def load_handler_module(function_name: str) -> ModuleType:
+    """Import backend/<function_name>/index.py under a unique module name"""
+    function_dir = os.path.join(BACKEND_DIR, function_name)
+    if function_dir not in sys.path:
+        sys.path.insert(0, function_dir)
+    module_name = function_name.replace('-', '_') + '_index'
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(function_dir, 'index.py'))
+    module = importlib.util.module_from_spec(spec)
+    # Registered so process pool workers can unpickle functions of the module
+    sys.modules[module_name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def make_upload_event(file_bytes: bytes, filename: str = 'catalog.csv', **extra: Any) -> Dict[str, Any]:
+    """Build a POST event the same way AdminPanel uploads a file"""
+    body = {
+        'fileData': 'data:text/csv;base64,' + base64.b64encode(file_bytes).decode('ascii'),
+        'filename': filename
+    }
+    body.update(extra)
+    return {'httpMethod': 'POST', 'headers': {}, 'body': json.dumps(body)}
+
+
+def percentile(values: list, share: float) -> float:
+    """Nearest-rank percentile, exact for the handful of calls a case makes"""
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, round(share * len(ordered) + 0.5) - 1))]
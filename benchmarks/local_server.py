@@ -0,0 +1,258 @@
+"""Local HTTP server calling the backend handlers with the cloud platform event format
+
+Every backend/<function>/index.py is mounted at /<function>. Requests become
+the event the platform passes to handler(event, context): httpMethod,
+headers, queryStringParameters, text body (base64 with isBase64Encoded
+when it is not UTF-8), requestContext with a request id. OPTIONS goes to
+the handler like any other method, so CORS answers are the handlers' own.
+Base64 response bodies, which catalog-export and compressed catalogs send,
+are decoded before they go out.
+
+Handlers run in --instances spawned processes, each one a warm instance
+that takes one request at a time like on the platform. Every response
+carries the instance measurements as headers: X-Handler-Ms, X-Instance-Pid,
+X-Rss-Base-Kb (RSS before the call) and X-Peak-Rss-Kb (peak RSS during it,
+Linux only, the high-water mark is reset before every call).
+
+    python benchmarks/local_server.py --port 8000 --instances 4
+    curl -X OPTIONS -i http://127.0.0.1:8000/catalog-parser
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import BACKEND_DIR, FakeContext, load_handler_module  # noqa: E402
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           411: 'Length Required', 413: 'Payload Too Large', 500: 'Internal Server Error', 502: 'Bad Gateway'}
+# Request headers block, larger ones are answered with 400
+MAX_HEADER_BYTES = 64 * 1024
+
+_handlers: Dict[str, Any] = {}
+
+
+def backend_functions() -> List[str]:
+    return sorted(name for name in os.listdir(BACKEND_DIR)
+                  if os.path.isfile(os.path.join(BACKEND_DIR, name, 'index.py')))
+
+
+def start_instance(function_names: List[str]) -> None:
+    """Process pool initializer: import every handler once, like a warm instance"""
+    for function_name in function_names:
+        _handlers[function_name] = load_handler_module(function_name).handler
+
+
+def memory_kb() -> Tuple[int, int]:
+    """Current and peak RSS of this process in kilobytes, zeros where /proc is missing"""
+    try:
+        with open('/proc/self/status') as status:
+            values = dict(line.split(':', 1) for line in status if line.startswith(('VmRSS', 'VmHWM')))
+        return int(values['VmRSS'].split()[0]), int(values['VmHWM'].split()[0])
+    except (OSError, KeyError):
+        return 0, 0
+
+
+def reset_peak_memory() -> None:
+    try:
+        # '5' resets VmHWM to the current RSS, Linux 4.0+
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+    except OSError:
+        pass
+
+
+def instance_pid() -> int:
+    return os.getpid()
+
+
+def invoke(function_name: str, event: Dict[str, Any], request_id: str) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    """Call one handler inside an instance, return its response and the instance measurements"""
+    reset_peak_memory()
+    base_kb, _ = memory_kb()
+    started = time.perf_counter()
+    try:
+        response = _handlers[function_name](event, FakeContext(request_id, function_name))
+    except Exception as e:
+        # The platform answers 502 when the handler itself raises
+        response = {'statusCode': 502, 'headers': {'Content-Type': 'text/plain'},
+                    'body': f'{type(e).__name__}: {e}', 'isBase64Encoded': False}
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    _, peak_kb = memory_kb()
+    return response, {
+        'handler_ms': round(elapsed_ms, 3),
+        'pid': os.getpid(),
+        'rss_base_kb': base_kb,
+        'peak_rss_kb': peak_kb
+    }
+
+
+def platform_event(method: str, target: str, headers: Dict[str, str], body: bytes,
+                   request_id: str) -> Dict[str, Any]:
+    """Event of an HTTP request the way the platform hands it to handler(event, context)"""
+    url = urlsplit(target)
+    query = parse_qs(url.query, keep_blank_values=True)
+    try:
+        text, is_base64 = body.decode('utf-8'), False
+    except UnicodeDecodeError:
+        text, is_base64 = base64.b64encode(body).decode('ascii'), True
+    return {
+        'httpMethod': method,
+        'headers': headers,
+        'multiValueHeaders': {name: [value] for name, value in headers.items()},
+        'queryStringParameters': {name: values[-1] for name, values in query.items()},
+        'multiValueQueryStringParameters': query,
+        'requestContext': {
+            'identity': {'sourceIp': '127.0.0.1', 'userAgent': headers.get('User-Agent', '')},
+            'httpMethod': method,
+            'requestId': request_id,
+            'requestTime': time.strftime('%d/%b/%Y:%H:%M:%S +0000', time.gmtime()),
+            'requestTimeEpoch': int(time.time())
+        },
+        'url': url.path,
+        'path': url.path,
+        'params': {},
+        'pathParams': {},
+        'body': text,
+        'isBase64Encoded': is_base64
+    }
+
+
+class LocalServer:
+    """asyncio HTTP/1.1 front of the handler instances, keep-alive, Content-Length bodies only"""
+
+    def __init__(self, function_names: Optional[List[str]] = None, instances: int = 4,
+                 max_body_bytes: int = 0):
+        self.function_names = function_names or backend_functions()
+        self.instances = instances
+        self.max_body_bytes = max_body_bytes
+        self.pool = ProcessPoolExecutor(instances, mp_context=get_context('spawn'),
+                                        initializer=start_instance, initargs=(self.function_names,))
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        """Start every instance, then listen, returns the base URL"""
+        loop = asyncio.get_running_loop()
+        # Instances are spawned on demand, ask for as many pids at once as there are instances
+        await asyncio.gather(*[loop.run_in_executor(self.pool, instance_pid) for _ in range(self.instances)])
+        self.server = await asyncio.start_server(self.handle_connection, host, port, limit=MAX_HEADER_BYTES)
+        host, port = self.server.sockets[0].getsockname()[:2]
+        return f'http://{host}:{port}'
+
+    async def close(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        self.pool.shutdown()
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            keep_alive = True
+            while keep_alive:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except asyncio.IncompleteReadError:
+                    break
+                except asyncio.LimitOverrunError:
+                    await self.send(writer, 400, {}, b'Request headers too large', False)
+                    break
+                keep_alive = await self.handle_request(head, reader, writer)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def handle_request(self, head: bytes, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> bool:
+        """Answer one request, returns whether the connection stays open"""
+        request_line, *header_lines = head.decode('latin-1').rstrip('\r\n').split('\r\n')
+        method, target, version = request_line.split(' ', 2)
+        headers = {}
+        for line in header_lines:
+            name, _, value = line.partition(':')
+            # Header names arrive in the canonical Title-Case, the way the platform passes them
+            headers['-'.join(part.capitalize() for part in name.strip().split('-'))] = value.strip()
+        keep_alive = headers.get('Connection', '').lower() != 'close' and version == 'HTTP/1.1'
+
+        if 'chunked' in headers.get('Transfer-Encoding', '').lower():
+            await self.send(writer, 411, {}, b'Chunked bodies are not supported', False)
+            return False
+        length = int(headers.get('Content-Length') or 0)
+        if self.max_body_bytes and length > self.max_body_bytes:
+            await self.send(writer, 413, {}, b'Request body too large', False)
+            return False
+        body = await reader.readexactly(length) if length else b''
+
+        function_name = unquote(urlsplit(target).path).strip('/').split('/', 1)[0]
+        if function_name not in self.function_names:
+            await self.send(writer, 404, {}, f'Unknown function: {function_name}'.encode('utf-8'), keep_alive)
+            return keep_alive
+
+        request_id = str(uuid.uuid4())
+        event = platform_event(method, target, headers, body, request_id)
+        response, metrics = await asyncio.get_running_loop().run_in_executor(
+            self.pool, invoke, function_name, event, request_id
+        )
+
+        content = response.get('body') or ''
+        if response.get('isBase64Encoded'):
+            content = base64.b64decode(content)
+        elif not isinstance(content, bytes):
+            content = content.encode('utf-8')
+        response_headers = dict(response.get('headers') or {}, **{
+            'X-Request-Id': request_id,
+            'X-Handler-Ms': str(metrics['handler_ms']),
+            'X-Instance-Pid': str(metrics['pid']),
+            'X-Rss-Base-Kb': str(metrics['rss_base_kb']),
+            'X-Peak-Rss-Kb': str(metrics['peak_rss_kb'])
+        })
+        await self.send(writer, int(response.get('statusCode') or 200), response_headers, content, keep_alive)
+        return keep_alive
+
+    async def send(self, writer: asyncio.StreamWriter, status: int, headers: Dict[str, str],
+                   content: bytes, keep_alive: bool) -> None:
+        headers = dict({'Access-Control-Allow-Origin': '*'}, **headers)
+        headers['Content-Length'] = str(len(content))
+        headers['Connection'] = 'keep-alive' if keep_alive else 'close'
+        lines = [f'HTTP/1.1 {status} {REASONS.get(status, "Unknown")}']
+        lines.extend(f'{name}: {value}' for name, value in headers.items())
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1', 'replace') + content)
+        await writer.drain()
+
+
+async def serve(args: argparse.Namespace) -> None:
+    server = LocalServer(args.function, args.instances, int(args.max_body_mb * 1024 * 1024))
+    url = await server.start(args.host, args.port)
+    print(json.dumps({'listening': url, 'functions': server.function_names, 'instances': args.instances}), flush=True)
+    try:
+        await server.server.serve_forever()
+    finally:
+        await server.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--function', nargs='+', choices=backend_functions(),
+                        help='functions to mount, every backend function by default')
+    parser.add_argument('--instances', type=int, default=4, help='handler processes, one request at a time each')
+    parser.add_argument('--max-body-mb', type=float, default=0, help='answer 413 above this size, 0 for no limit')
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
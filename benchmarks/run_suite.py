@@ -0,0 +1,166 @@
+"""Throughput suite of both parser handlers over a matrix of synthetic catalogs
+
+Every case (function, rows, encoding, delimiter, price format) runs in a
+fresh interpreter, so peak RSS belongs to that case alone. The handler is
+called with bypassCache and timings, first once cold, then --repeat more
+times; latency percentiles, rows/sec and the stage breakdown of the last
+call are reported. Results go to benchmarks/results/<time>.json together
+with the commit and interpreter they were measured on, and two result
+files can be compared case by case.
+
+    python benchmarks/run_suite.py --rows 1000 10000 100000
+    python benchmarks/run_suite.py --rows 1000000 --function catalog-parser --encodings utf-8 --delimiters comma
+    python benchmarks/run_suite.py --compare benchmarks/results/a.json benchmarks/results/b.json
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from common import FakeContext, load_handler_module, make_upload_event, percentile  # noqa: E402
+from synthetic import DELIMITERS, PRICE_FORMATS, generate_catalog  # noqa: E402
+
+FUNCTIONS = ['catalog-parser', 'excel-parser']
+# excel-parser reads tab-separated exports only
+FUNCTION_DELIMITERS = {'catalog-parser': ['comma', 'tab'], 'excel-parser': ['tab']}
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+CASE_KEYS = ('function', 'rows', 'encoding', 'delimiter', 'prices')
+
+
+def run_case(function_name: str, rows: int, encoding: str, delimiter: str, prices: str, repeat: int) -> dict:
+    module = load_handler_module(function_name)
+    raw = generate_catalog(rows, delimiter=DELIMITERS[delimiter], encoding=encoding, prices=prices)
+    event = make_upload_event(raw, bypassCache=True, timings=True)
+
+    latencies = []
+    for _ in range(repeat + 1):
+        started = time.perf_counter()
+        response = module.handler(event, FakeContext())
+        latencies.append(time.perf_counter() - started)
+    body = json.loads(response['body'])
+    if response['statusCode'] != 200:
+        raise SystemExit(f'{function_name} answered {response["statusCode"]}: {body.get("error")}')
+
+    cold, warm = latencies[0], latencies[1:]
+    p50 = percentile(warm, 0.5)
+    return {
+        'function': function_name,
+        'rows': rows,
+        'encoding': encoding,
+        'delimiter': delimiter,
+        'prices': prices,
+        'file_mb': round(len(raw) / 1024 / 1024, 2),
+        'products': body['total_products'],
+        'price_errors': body['debug_info'].get('price_errors', {}).get('cells'),
+        'calls': len(warm),
+        'first_ms': round(cold * 1000, 1),
+        'p50_ms': round(p50 * 1000, 1),
+        'p95_ms': round(percentile(warm, 0.95) * 1000, 1),
+        'max_ms': round(max(warm) * 1000, 1),
+        'rows_per_sec': round(rows / p50),
+        # ru_maxrss is reported in kilobytes on Linux
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'stages_ms': {name: stage['ms'] for name, stage in body['debug_info']['timings']['stages'].items()}
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return ''
+
+
+def environment() -> dict:
+    try:
+        import numpy
+        numpy_version = numpy.__version__
+    except ImportError:
+        numpy_version = None
+    return {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': numpy_version
+    }
+
+
+def case_key(case: dict) -> tuple:
+    return tuple(case[key] for key in CASE_KEYS)
+
+
+def compare(base_path: str, new_path: str) -> None:
+    """Print rows/sec, p50 and peak RSS ratios of the cases both files have"""
+    with open(base_path) as base_file, open(new_path) as new_file:
+        base = {case_key(case): case for case in json.load(base_file)['cases']}
+        new = json.load(new_file)['cases']
+    for case in new:
+        before = base.get(case_key(case))
+        if before is None:
+            continue
+        print(json.dumps(dict(
+            {key: case[key] for key in CASE_KEYS},
+            rows_per_sec=case['rows_per_sec'],
+            rows_per_sec_ratio=round(case['rows_per_sec'] / before['rows_per_sec'], 2),
+            p50_ratio=round(case['p50_ms'] / before['p50_ms'], 2),
+            peak_rss_ratio=round(case['peak_rss_mb'] / before['peak_rss_mb'], 2)
+        )))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--function', nargs='+', default=FUNCTIONS, choices=FUNCTIONS)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10_000, 100_000])
+    parser.add_argument('--encodings', nargs='+', default=['utf-8', 'cp1251'])
+    parser.add_argument('--delimiters', nargs='+', default=sorted(DELIMITERS), choices=sorted(DELIMITERS))
+    parser.add_argument('--prices', nargs='+', default=list(PRICE_FORMATS), choices=PRICE_FORMATS)
+    parser.add_argument('--repeat', type=int, default=5, help='warm calls per case')
+    parser.add_argument('--row-budget', type=int, default=500_000,
+                        help='fewer warm calls for large catalogs, at least one')
+    parser.add_argument('--output', help='results file, benchmarks/results/<time>.json by default')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'NEW'))
+    parser.add_argument('--case', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    if args.case:
+        print(json.dumps(run_case(**json.loads(args.case))))
+        return
+
+    cases = []
+    for function_name, rows, encoding, delimiter, prices in itertools.product(
+            args.function, args.rows, args.encodings, args.delimiters, args.prices):
+        if delimiter not in FUNCTION_DELIMITERS[function_name]:
+            continue
+        case = {
+            'function_name': function_name, 'rows': rows, 'encoding': encoding, 'delimiter': delimiter,
+            'prices': prices, 'repeat': max(1, min(args.repeat, args.row_budget // rows))
+        }
+        process = subprocess.run([sys.executable, __file__, '--case', json.dumps(case)],
+                                 capture_output=True, text=True)
+        if process.returncode != 0:
+            raise SystemExit(f'case {json.dumps(case)} failed:\n{process.stderr}')
+        cases.append(json.loads(process.stdout))
+        print(json.dumps({key: value for key, value in cases[-1].items() if key != 'stages_ms'}))
+
+    output_path = args.output or os.path.join(RESULTS_DIR, time.strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'w') as output_file:
+        json.dump({'environment': environment(), 'cases': cases}, output_file, ensure_ascii=False, indent=2)
+    print(json.dumps({'saved': output_path}))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+"""Synthetic supplier price lists with the same headers as public/test-catalog.csv
+
+Also a command line generator for files to feed the handlers by hand:
+
+    python benchmarks/synthetic.py --rows 100000 --encoding cp1251 --delimiter tab --prices mixed -o catalog.csv
+"""
+import argparse
+import csv
+import io
+import random
+import sys
+from typing import Callable, Iterator, List
+
+HEADERS = [
+    'Артикул', 'Бренд', 'Наименование', 'Ед. (единицы измерения)',
+    'Цена (Рекомендуемая)', 'Цена дилер (по которой идет рассчет)',
+    'Акция!!!', '% скидки', 'Специальная цена!!!',
+    'Упаковка (сколько единиц товара в большой коробке/средней коробки/малой коробки)',
+    'Штрих-код', 'Фото'
+]
+
+BRANDS = ['Hatber', 'Brauberg', 'Erich Krause', 'Office Space', 'Стамм', 'Attache', 'Pilot', 'Berlingo']
+ITEMS = ['Ручка шариковая', 'Блокнот А5', 'Степлер №24/6', 'Карандаш НВ', 'Папка-регистратор',
+         'Тетрадь 48 л.', 'Маркер текстовый', 'Скрепки 28 мм', 'Клей-карандаш', 'Ластик']
+COLORS = ['синяя', 'черная', 'красная', 'зеленая', 'клетка', 'линейка']
+PROMO_TEXTS = ['Новинка!!!', 'Хит продаж', 'Распродажа', 'Акция до конца месяца']
+
+# 'plain' is what 1C exports: integers and decimal commas. 'mixed' adds the
+# grouping, currency and percent notations people type into spreadsheets
+PRICE_FORMATS = ('plain', 'mixed')
+DELIMITERS = {'comma': ',', 'tab': '\t'}
+
+
+def plain_price(value: float, rng: random.Random) -> str:
+    return f'{value:.2f}'.replace('.', ',')
+
+
+def mixed_price(value: float, rng: random.Random) -> str:
+    grouped = f'{value:,.2f}'
+    roll = rng.random()
+    if roll < 0.3:
+        return plain_price(value, rng)
+    if roll < 0.5:
+        return grouped.replace(',', '\u00a0').replace('.', ',')
+    if roll < 0.6:
+        return grouped.replace(',', ' ').replace('.', ',') + ' ₽'
+    if roll < 0.7:
+        return grouped.replace(',', '#').replace('.', ',').replace('#', '.')
+    if roll < 0.8:
+        return f'{value:.2f}'
+    if roll < 0.9:
+        return f'{round(value)} руб.'
+    return grouped
+
+
+def iter_rows(rows: int, seed: int = 0, prices: str = 'plain') -> Iterator[List[str]]:
+    """Yield header and data rows of a realistic catalog"""
+    rng = random.Random(seed)
+    # Separate generator, so 'plain' catalogs stay the same for a seed
+    format_rng = random.Random(seed + 1)
+    format_price: Callable[[float, random.Random], str] = mixed_price if prices == 'mixed' else plain_price
+    yield HEADERS
+    for idx in range(rows):
+        recommended = rng.randint(10, 5000)
+        dealer = round(recommended * rng.uniform(0.6, 0.9), 2)
+        promo = ''
+        discount = ''
+        special = ''
+        roll = rng.random()
+        if roll < 0.05:
+            special = format_price(dealer * 0.8, format_rng)
+        elif roll < 0.10:
+            discount = str(rng.choice([5, 10, 15, 20]))
+            if prices == 'mixed' and format_rng.random() < 0.5:
+                discount += '%'
+        elif roll < 0.12:
+            promo = 'Новинка!!!' if prices == 'plain' else format_rng.choice(PROMO_TEXTS)
+        yield [
+            f'SKU-{idx:07d}',
+            rng.choice(BRANDS),
+            f'{rng.choice(ITEMS)} {rng.choice(COLORS)} {idx}',
+            'шт',
+            str(recommended) if prices == 'plain' else format_price(recommended, format_rng),
+            format_price(dealer, format_rng),
+            promo,
+            discount,
+            special,
+            f'{rng.choice([10, 12, 24, 48])} шт',
+            f'460{rng.randint(0, 10 ** 10 - 1):010d}',
+            f'/images/item-{idx}.jpg' if rng.random() < 0.5 else ''
+        ]
+
+
+def generate_catalog(rows: int, seed: int = 0, delimiter: str = ',', encoding: str = 'utf-8',
+                     prices: str = 'plain') -> bytes:
+    """Render a synthetic catalog as encoded CSV/TSV bytes"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=delimiter, lineterminator='\n')
+    writer.writerows(iter_rows(rows, seed, prices))
+    text = buffer.getvalue()
+    try:
+        return text.encode(encoding)
+    except UnicodeEncodeError:
+        # cp1251 has no ruble sign, exports from such systems write 'р.'
+        return text.replace('₽', 'р.').encode(encoding)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--delimiter', choices=sorted(DELIMITERS), default='comma')
+    parser.add_argument('--encoding', default='utf-8', help='utf-8, utf-8-sig, cp1251, ...')
+    parser.add_argument('--prices', choices=PRICE_FORMATS, default='plain')
+    parser.add_argument('-o', '--output', help='file to write, stdout when omitted')
+    args = parser.parse_args()
+
+    data = generate_catalog(args.rows, args.seed, DELIMITERS[args.delimiter], args.encoding, args.prices)
+    if args.output:
+        with open(args.output, 'wb') as output:
+            output.write(data)
+    else:
+        sys.stdout.buffer.write(data)
+
+
+if __name__ == '__main__':
+    main()
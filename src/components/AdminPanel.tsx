@@ -27,8 +27,9 @@ const AdminPanel: React.FC<AdminPanelProps> = ({
   const [detectedColumns, setDetectedColumns] = useState<string[]>([]);
   const [fileToProcess, setFileToProcess] = useState<File | null>(null);
 
-  const processExcelFile = async () => {
-    if (!excelFile) return;
+  const processExcelFile = async (columnMapping?: Record<string, string>) => {
+    const file = columnMapping ? fileToProcess : excelFile;
+    if (!file) return;
     
     setIsProcessing(true);
     setProcessResult(null);
@@ -38,7 +39,7 @@ const AdminPanel: React.FC<AdminPanelProps> = ({
       const fileData = await new Promise<string>((resolve) => {
         const reader = new FileReader();
         reader.onload = () => resolve(reader.result as string);
-        reader.readAsDataURL(excelFile);
+        reader.readAsDataURL(file);
       });
       
       // Send to backend
@@ -49,7 +50,8 @@ const AdminPanel: React.FC<AdminPanelProps> = ({
         },
         body: JSON.stringify({
           fileData,
-          filename: excelFile.name
+          filename: file.name,
+          columnMapping
         })
       });
       
@@ -74,7 +76,7 @@ const AdminPanel: React.FC<AdminPanelProps> = ({
       } else if (result.debug_info && result.debug_info.detected_columns) {
         // Show column mapping dialog if columns detected but parsing failed
         setDetectedColumns(result.debug_info.detected_columns);
-        setFileToProcess(excelFile);
+        setFileToProcess(file);
         setShowColumnMapping(true);
         setProcessResult({ 
           success: false, 
@@ -155,7 +157,7 @@ const AdminPanel: React.FC<AdminPanelProps> = ({
         {excelFile && (
           <div className="mt-6">
             <Button 
-              onClick={processExcelFile}
+              onClick={() => processExcelFile()}
               disabled={isProcessing}
               className="w-full bg-primary hover:bg-blue-700 disabled:bg-gray-300"
             >
@@ -195,9 +197,9 @@ const AdminPanel: React.FC<AdminPanelProps> = ({
       onClose={() => setShowColumnMapping(false)}
       detectedColumns={detectedColumns}
       onConfirm={(mapping) => {
-        console.log('Column mapping confirmed:', mapping);
-        // Here you could send the mapping to backend for custom processing
         setShowColumnMapping(false);
+        // Re-process the same file with the chosen columns
+        processExcelFile(mapping);
       }}
     />
   </>;
@@ -0,0 +1,9 @@
+"""Tests import the catalog-parser modules the way its handler does, from the function directory"""
+import os
+import sys
+
+os.environ.setdefault('CATALOG_TIMING_LOG', '0')
+
+CATALOG_PARSER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'catalog-parser')
+if CATALOG_PARSER_DIR not in sys.path:
+    sys.path.insert(0, CATALOG_PARSER_DIR)
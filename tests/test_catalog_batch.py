@@ -0,0 +1,52 @@
+import base64
+import json
+
+import index
+
+SUPPLIER_CSV = 'Артикул,Наименование,Цена дилер (по которой идет рассчет)\nA-1,Ручка,10\nA-1,Ручка,10\nA-2,Лампа,20\n'
+CUSTOM_CSV = 'Код поставщика,Товар,Опт\nB-1,Стол,300\n'
+
+
+class Context:
+    request_id = 'test-request'
+    function_name = 'catalog-parser'
+
+
+def batch_file(csv_text, **options):
+    return dict({
+        'fileData': 'data:text/csv;base64,' + base64.b64encode(csv_text.encode('utf-8')).decode('ascii'),
+        'filename': 'catalog.csv'
+    }, **options)
+
+
+def batch(*files, **extra):
+    body = dict({'files': list(files), 'bypassCache': True}, **extra)
+    response = index.handler({'httpMethod': 'POST', 'body': json.dumps(body)}, Context())
+    return response['statusCode'], json.loads(response['body'])
+
+
+def test_files_are_parsed_with_their_own_options():
+    mapping = {'article': 'Код поставщика', 'name': 'Товар', 'dealerPrice': 'Опт'}
+    status, body = batch(batch_file(SUPPLIER_CSV, stableIds=True, dropDuplicates=True),
+                         batch_file(CUSTOM_CSV, columnMapping=mapping))
+    
+    assert status == 200
+    assert [product['article'] for product in body['products']] == ['A-1', 'A-2', 'B-1']
+    assert body['products'][0]['id'].startswith('p_')
+    assert body['products'][2]['id'] == 'item_2'
+    # The duplicate row was dropped while parsing, not by the merge
+    assert body['files'][0]['duplicates'] == 0
+
+
+def test_invalid_mapping_fails_only_its_file():
+    status, body = batch(batch_file(SUPPLIER_CSV), batch_file(CUSTOM_CSV, columnMapping=['article']))
+    
+    assert status == 200
+    assert body['total_products'] == 2
+    assert not body['files'][1]['success']
+
+
+def test_small_batch_is_parsed_without_the_pool():
+    batch(batch_file(SUPPLIER_CSV), batch_file(CUSTOM_CSV), parallelWorkers=4)
+    
+    assert not index.PARSE_POOLS
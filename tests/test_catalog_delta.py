@@ -0,0 +1,45 @@
+import base64
+import json
+
+import index
+
+HEADER = 'Артикул,Наименование,Цена дилер (по которой идет рассчет)'
+ROWS = [f'A-{number},Ручка {number},{number}0' for number in range(1, 11)]
+
+
+class Context:
+    request_id = 'test-request'
+    function_name = 'catalog-parser'
+
+
+def upload(rows, **extra):
+    csv_text = '\n'.join([HEADER] + rows) + '\n'
+    body = dict({
+        'fileData': 'data:text/csv;base64,' + base64.b64encode(csv_text.encode('utf-8')).decode('ascii'),
+        'filename': 'catalog.csv',
+        'bypassCache': True
+    }, **extra)
+    response = index.handler({'httpMethod': 'POST', 'body': json.dumps(body)}, Context())
+    assert response['statusCode'] == 200
+    return json.loads(response['body'])
+
+
+def test_inserted_row_is_the_only_difference():
+    first = upload(ROWS, delta=True)
+    second = upload(['A-0,Новая ручка,5'] + ROWS, previousFingerprint=first['fingerprint'])
+    
+    delta = second['delta']
+    assert delta['base_found']
+    assert [entry['key'] for entry in delta['added']] == ['article:A-0']
+    assert delta['changed'] == []
+    assert delta['removed'] == []
+
+
+def test_changed_price_is_reported_by_field():
+    first = upload(ROWS, delta=True)
+    second = upload(ROWS[:-1] + ['A-10,Ручка 10,999'], previousFingerprint=first['fingerprint'])
+    
+    delta = second['delta']
+    assert delta['added'] == []
+    assert [entry['key'] for entry in delta['changed']] == ['article:A-10']
+    assert 'price' in delta['changed'][0]['fields']
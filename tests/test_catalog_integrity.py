@@ -0,0 +1,31 @@
+from catalog_integrity import IntegrityIndex, stable_id
+
+SHARED_BARCODE = '4006381333931'
+OTHER_BARCODE = '5901234123457'
+
+
+def test_shared_barcode_does_not_hide_a_new_article():
+    integrity = IntegrityIndex(stable_ids=True, drop_duplicates=True)
+    
+    first = integrity.check(2, 'A-1', SHARED_BARCODE)
+    # New article with a barcode already taken: a conflict, still a product of its own
+    second = integrity.check(3, 'A-2', SHARED_BARCODE)
+    # The article of that row is indexed, its repeat is the duplicate
+    repeat = integrity.check(4, 'a-2', OTHER_BARCODE)
+    
+    assert first == (True, stable_id('a-1'))
+    assert second == (True, stable_id('a-2'))
+    assert repeat == (False, None)
+    report = integrity.report()
+    assert (report['duplicate_barcodes'], report['duplicate_articles'], report['dropped']) == (1, 1, 1)
+    assert [(conflict['type'], conflict['row'], conflict['first_row']) for conflict in report['conflicts']] == [
+        ('duplicate_barcode', 3, 2), ('duplicate_article', 4, 3)
+    ]
+
+
+def test_products_without_article_are_matched_by_barcode():
+    integrity = IntegrityIndex(stable_ids=True)
+    
+    assert integrity.check(2, '', SHARED_BARCODE) == (True, stable_id(f'barcode:{SHARED_BARCODE}'))
+    assert integrity.check(3, '', SHARED_BARCODE) == (True, stable_id(f'barcode:{SHARED_BARCODE}') + '_2')
+    assert integrity.check(4, '', '') == (True, None)
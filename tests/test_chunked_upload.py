@@ -0,0 +1,60 @@
+import base64
+import json
+import os
+
+import pytest
+
+import index
+from chunked_upload import ChunkedUploadStore
+
+CSV_TEXT = 'Артикул,Наименование,Цена дилер (по которой идет рассчет)\nA-1,Ручка,10\n'
+MAPPED_CSV = 'Код поставщика,Товар,Опт\nB-1,Стол,300\nB-1,Стол,300\nB-2,Стул,150\n'
+MAPPING = {'article': 'Код поставщика', 'name': 'Товар', 'dealerPrice': 'Опт'}
+
+
+class Context:
+    request_id = 'test-request'
+    function_name = 'catalog-parser'
+
+
+def upload_action(action, **extra):
+    body = dict({'uploadAction': action, 'filename': 'catalog.csv'}, **extra)
+    response = index.handler({'httpMethod': 'POST', 'body': json.dumps(body)}, Context())
+    return json.loads(response['body'])
+
+
+def test_abandoned_upload_leaves_no_session_after_ttl(tmp_path, monkeypatch):
+    store = ChunkedUploadStore(str(tmp_path), 3600)
+    monkeypatch.setattr(index, 'UPLOADS', store)
+    monkeypatch.setattr(index, 'UPLOAD_SESSIONS', {})
+    
+    abandoned = upload_action('init')['uploadId']
+    upload_action('append', uploadId=abandoned, chunkIndex=0,
+                  chunkData=base64.b64encode(CSV_TEXT.encode('utf-8')).decode('ascii'))
+    assert abandoned in index.UPLOAD_SESSIONS
+    
+    expired = os.path.getmtime(os.path.join(str(tmp_path), abandoned)) - 2 * 3600
+    os.utime(os.path.join(str(tmp_path), abandoned), (expired, expired))
+    current = upload_action('init')['uploadId']
+    
+    assert list(index.UPLOAD_SESSIONS) == [current]
+    assert not os.path.exists(os.path.join(str(tmp_path), abandoned))
+
+
+@pytest.mark.parametrize('cold_start', [False, True])
+def test_upload_honors_column_mapping_and_id_options(tmp_path, monkeypatch, cold_start):
+    monkeypatch.setattr(index, 'UPLOADS', ChunkedUploadStore(str(tmp_path), 3600))
+    monkeypatch.setattr(index, 'UPLOAD_SESSIONS', {})
+    
+    upload_id = upload_action('init', columnMapping=MAPPING, stableIds=True, dropDuplicates=True)['uploadId']
+    data = MAPPED_CSV.encode('utf-8')
+    for chunk_index, chunk in enumerate((data[:40], data[40:])):
+        upload_action('append', uploadId=upload_id, chunkIndex=chunk_index,
+                      chunkData=base64.b64encode(chunk).decode('ascii'))
+    if cold_start:
+        index.UPLOAD_SESSIONS.clear()
+    body = upload_action('finalize', uploadId=upload_id)
+    
+    assert [product['article'] for product in body['products']] == ['B-1', 'B-2']
+    assert all(product['id'].startswith('p_') for product in body['products'])
+
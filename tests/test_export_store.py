@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'catalog-export'))
+
+from export_store import ExportError, create_export_store  # noqa: E402
+
+
+def test_exports_are_staged_next_to_the_shared_catalog_store(tmp_path, monkeypatch):
+    monkeypatch.delenv('CATALOG_EXPORT_DIR', raising=False)
+    monkeypatch.setenv('CATALOG_STORE_PATH', str(tmp_path / 'catalog.sqlite3'))
+    
+    export_id = create_export_store().create()
+    with create_export_store().open_data(export_id) as file:
+        file.write(b'article;name\n')
+    meta = create_export_store().finish({'export_id': export_id, 'format': 'csv'})
+    
+    # A fresh instance sees the export another one wrote
+    assert create_export_store().read_part(create_export_store().load(export_id), 0) == b'article;name\n'
+    assert meta['parts'] == 1
+    assert os.path.isdir(tmp_path / 'catalog-exports' / export_id)
+
+
+def test_container_local_exports_are_refused(monkeypatch):
+    monkeypatch.delenv('CATALOG_EXPORT_DIR', raising=False)
+    monkeypatch.delenv('CATALOG_STORE_PATH', raising=False)
+    
+    with pytest.raises(ExportError) as error:
+        create_export_store()
+    assert error.value.status_code == 503
@@ -0,0 +1,52 @@
+import base64
+import json
+import time
+
+import index
+from import_jobs import ImportJobStore
+
+CSV_TEXT = 'Код поставщика,Товар,Опт\nB-1,Стол,300\nB-1,Стол,300\nB-2,Стул,150\n'
+MAPPING = {'article': 'Код поставщика', 'name': 'Товар', 'dealerPrice': 'Опт'}
+
+
+class Context:
+    request_id = 'test-request'
+    function_name = 'catalog-parser'
+
+
+def job_action(action, **extra):
+    body = dict({'jobAction': action}, **extra)
+    response = index.handler({'httpMethod': 'POST', 'body': json.dumps(body)}, Context())
+    return response['statusCode'], json.loads(response['body'])
+
+
+def wait_for_job(job_id):
+    for _ in range(200):
+        _, body = job_action('status', jobId=job_id)
+        if body['status'] in ('done', 'failed'):
+            return body
+        time.sleep(0.05)
+    raise AssertionError(f'job {job_id} did not finish')
+
+
+def test_job_honors_column_mapping_and_id_options(tmp_path, monkeypatch):
+    monkeypatch.setattr(index, 'JOBS', ImportJobStore(str(tmp_path), 3600, 100, 120))
+    
+    status, submitted = job_action('submit', filename='catalog.csv', bypassCache=True, columnMapping=MAPPING,
+                                   stableIds=True, dropDuplicates=True,
+                                   fileData=base64.b64encode(CSV_TEXT.encode('utf-8')).decode('ascii'))
+    assert status == 202
+    finished = wait_for_job(submitted['jobId'])
+    
+    assert finished['status'] == 'done'
+    assert finished['total_products'] == 2
+    _, page = job_action('status', jobId=submitted['jobId'], page=0)
+    assert [product['article'] for product in page['products']] == ['B-1', 'B-2']
+    assert all(product['id'].startswith('p_') for product in page['products'])
+
+
+def test_job_with_invalid_mapping_is_refused():
+    status, body = job_action('submit', fileData='QQ==', columnMapping='article')
+    
+    assert status == 400
+    assert not body['success']
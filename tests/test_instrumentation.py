@@ -0,0 +1,36 @@
+import json
+
+from instrumentation import attach_debug_info
+from response_encoding import catalog_body
+
+PRODUCTS_JSON = '{"id": "item_0", "name": "Ручка \\"debug_info\\": {}"}, {"id": "item_1", "name": "Лампа"}'
+
+
+def json_response(body):
+    return {'statusCode': 200, 'headers': {}, 'body': body, 'isBase64Encoded': False}
+
+
+def test_catalog_body_keeps_products_and_extends_debug_info():
+    result = {
+        'total_products': 2,
+        'debug_info': {'rows_count': 2},
+        'files': [{'filename': 'a.csv', 'debug_info': {'columns': []}}]
+    }
+    body = catalog_body(PRODUCTS_JSON, result, 'application/json')
+    
+    attached = attach_debug_info(json_response(body), timings={'total_ms': 1.5}, profile=None)['body']
+    
+    assert attached.startswith(body[:body.index('], ')])
+    decoded = json.loads(attached)
+    assert decoded['debug_info'] == {'rows_count': 2, 'timings': {'total_ms': 1.5}}
+    assert decoded['files'][0]['debug_info'] == {'columns': []}
+    assert [product['id'] for product in decoded['products']] == ['item_0', 'item_1']
+
+
+def test_body_without_trailing_debug_info_is_round_tripped():
+    body = json.dumps({'success': False, 'debug_info': {'stage': 'parse'}, 'error': 'Ошибка'}, ensure_ascii=False)
+    
+    attached = json.loads(attach_debug_info(json_response(body), timings={'total_ms': 2})['body'])
+    
+    assert attached['debug_info'] == {'stage': 'parse', 'timings': {'total_ms': 2}}
+    assert attached['error'] == 'Ошибка'
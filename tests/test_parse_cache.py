@@ -0,0 +1,19 @@
+import os
+
+from parse_cache import DiskParseCache
+
+ENTRY = {'products_json': '{"id": "item_0"}', 'categories': ['Канцтовары'], 'total_products': 1}
+
+
+def test_entry_evicted_after_read_is_still_a_hit(tmp_path, monkeypatch):
+    cache = DiskParseCache(1024 * 1024, str(tmp_path))
+    cache.set('key', ENTRY)
+    
+    def evicted(path):
+        # Another instance removed the file between the read and the touch
+        os.remove(path)
+        raise FileNotFoundError(path)
+    
+    monkeypatch.setattr(os, 'utime', evicted)
+    assert cache.get('key') == ENTRY
+    assert cache.stats()['hits'] == 1
@@ -0,0 +1,24 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'cart-quote'))
+
+from price_table import PriceTable  # noqa: E402
+
+ROWS = [
+    ('A-1', '', 'Ручка', 12.5, 12.5, False, 'коробка 1', True),
+    ('A-2', '', 'Лампа', 99.5, 120.0, True, '', True)
+]
+
+
+def test_regular_price_is_rounded_like_the_cart_without_discount():
+    quote = PriceTable(ROWS).quote([{'article': 'A-1', 'quantity': 2}, {'article': 'A-2'}], dealer_discount=0)
+    
+    assert [line['finalPrice'] for line in quote['lines']] == [13.0, 99.5]
+    assert quote['totals']['total'] == 125.5
+
+
+def test_discounted_price_is_rounded_half_up():
+    quote = PriceTable(ROWS).quote([{'article': 'A-1'}], dealer_discount=20)
+    
+    assert quote['lines'][0]['finalPrice'] == 10.0
@@ -0,0 +1,58 @@
+"""compute_prices against compute_price on the values that break naive vectorization
+
+Random batches mix ordinary prices with zeros and negative zero, NaN and
+infinities, discounts right at the 0 and 100 boundaries and inactive columns
+holding stale numbers. Every row must equal the scalar rules exactly, before
+rounding and after round(x, 2).
+"""
+import math
+import random
+
+import pytest
+
+import pricing
+
+pytest.importorskip('numpy')
+
+EDGE_VALUES = [0.0, -0.0, 0.005, 0.01, 1.0, 99.99, 100.0, 100.0001, 101.0, -5.0, 2.675, 1.005,
+               1e308, float('nan'), float('inf'), float('-inf')]
+CASES = 300
+
+
+def random_value(rng):
+    roll = rng.random()
+    if roll < 0.4:
+        return rng.choice(EDGE_VALUES)
+    if roll < 0.7:
+        return round(rng.uniform(0, 10000), rng.randint(0, 3))
+    return rng.uniform(-1e6, 1e6)
+
+
+def random_columns(rng, rows):
+    return (
+        [random_value(rng) for _ in range(rows)],
+        [random_value(rng) for _ in range(rows)],
+        [random_value(rng) for _ in range(rows)],
+        [random_value(rng) for _ in range(rows)],
+        [rng.random() < 0.3 for _ in range(rows)],
+        [random_value(rng) for _ in range(rows)],
+        [rng.random() < 0.3 for _ in range(rows)]
+    )
+
+
+def same(left, right):
+    if isinstance(left, float) and math.isnan(left):
+        return isinstance(right, float) and math.isnan(right)
+    # 0.0 == -0.0, but json.dumps tells them apart
+    return type(left) is type(right) and left == right and repr(left) == repr(right)
+
+
+@pytest.mark.parametrize('seed', range(4))
+def test_vectorized_prices_match_scalar_rules(seed):
+    rng = random.Random(seed)
+    for _ in range(CASES):
+        columns = random_columns(rng, rng.choice([pricing.VECTOR_MIN_ROWS, 100, 257]))
+        for row, actual in zip(zip(*columns), zip(*pricing.compute_prices(columns))):
+            expected = pricing.compute_price(*row)
+            assert all(map(same, expected, actual)), row
+            assert all(same(round(e, 2), round(a, 2)) for e, a in zip(expected[:2], actual[:2])), row